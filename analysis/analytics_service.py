@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Local Analytics Service
+Asyncio HTTP server answering metric queries and chart requests from panels held in memory
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from data_access import load_funding_tables, load_patent_tables
+from memo import LRUCache
+from metrics import build_panel
+from plotting import EXPORT_FORMATS, render_figure, set_output_mode
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Chart name -> (script, figure builder, dataset it is drawn from)
+CHARTS = {
+    'patent_comparison': ("patent-trends-analysis.py", 'build_comparison_figure', 'patents'),
+    'funding_analysis': ("funding-comparison.py", 'build_funding_analysis_figure', 'funding'),
+    'investment_strategy': ("funding-comparison.py", 'build_investment_strategy_figure', 'funding'),
+}
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+def number(value):
+    """JSON-safe float (NaN and infinities become null)"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def frame_json(frame):
+    """{country: {category: value}} from a country-indexed DataFrame"""
+    return {country: {column: number(value) for column, value in row.items()}
+            for country, row in frame.iterrows()}
+
+
+class AnalyticsService:
+    """The datasets and their panels, loaded once and queried from memory"""
+
+    def __init__(self, cache_size=256):
+        self.cache = LRUCache(cache_size)
+        # pyplot is not thread-safe, so charts render one at a time off the event loop
+        self.chart_executor = ThreadPoolExecutor(max_workers=1)
+        self.load()
+
+    def load(self):
+        """(Re)load the datasets and drop every cached result"""
+        self.us_data, self.china_data = load_patent_tables()
+        self.gov_data, self.private_data = load_funding_tables()
+        self.panels = {
+            'patents': build_panel(patents=(self.us_data, self.china_data)),
+            'funding': build_panel(funding=(self.gov_data, self.private_data)),
+        }
+        self.cache.clear()
+        return {'reloaded': True, 'years': {name: [int(panel.years[0]), int(panel.years[-1])]
+                                            for name, panel in self.panels.items()}}
+
+    def panel(self, dataset):
+        if dataset not in self.panels:
+            raise ValueError(f"Unknown dataset {dataset!r}; expected one of {sorted(self.panels)}")
+        return self.panels[dataset]
+
+    def totals(self, year=None):
+        """Patent counts for a year, and cumulative government, private and combined funding"""
+        funding = self.panels['funding']
+        year = int(year) if year else int(funding.years[-1])
+        patents = self.panels['patents']
+        values = funding.at_year(year)
+        combined = values['Government_Cumulative'] + values['Private']
+        return {
+            'year': year,
+            'patents': frame_json(patents.at_year(year)) if year in patents.year_pos else None,
+            'funding': {country: {'government_cumulative': number(values.at[country, 'Government_Cumulative']),
+                                  'private': number(values.at[country, 'Private']),
+                                  'combined': number(combined[country])}
+                        for country in funding.countries},
+        }
+
+    def cagr(self, start, end, dataset='patents', category=None):
+        """Compound annual growth between two years, per country and category"""
+        rates = self.panel(dataset).cagr(int(start), int(end))
+        if category:
+            rates = rates[[category]]
+        return {'dataset': dataset, 'start': int(start), 'end': int(end), 'cagr': frame_json(rates)}
+
+    def ratio(self, year, leader='China', follower='US', dataset='patents'):
+        """leader / follower per category for one year"""
+        ratios = self.panel(dataset).ratio(int(year), leader, follower)
+        return {'dataset': dataset, 'year': int(year), 'leader': leader, 'follower': follower,
+                'ratio': {category: number(value) for category, value in ratios.items()}}
+
+    def strategy(self, year=None):
+        """Government vs private share of each country's combined investment, in percent"""
+        funding = self.panels['funding']
+        year = int(year) if year else int(funding.years[-1])
+        values = funding.at_year(year)
+        combined = values['Government_Cumulative'] + values['Private']
+        split = values[['Government_Cumulative', 'Private']].div(combined, axis=0) * 100
+        return {'year': year, 'percent': frame_json(split.rename(columns={'Government_Cumulative': 'Government'}))}
+
+    def chart(self, name, format='png'):
+        """Render one of the suite's charts to bytes"""
+        if name not in CHARTS:
+            raise KeyError(name)
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {format!r}; expected one of {list(EXPORT_FORMATS)}")
+
+        from orchestrator import import_script
+        script, builder, dataset = CHARTS[name]
+        args = (self.us_data, self.china_data) if dataset == 'patents' else (self.gov_data, self.private_data)
+
+        return render_figure(getattr(import_script(script), builder), args, format)
+
+    def health(self):
+        return {'status': 'ok', 'cache': self.cache.stats()}
+
+    # Endpoint -> (handler, result is cacheable)
+    ROUTES = {
+        '/health': ('health', False),
+        '/reload': ('load', False),
+        '/totals': ('totals', True),
+        '/cagr': ('cagr', True),
+        '/ratio': ('ratio', True),
+        '/strategy': ('strategy', True),
+    }
+
+    async def dispatch(self, path, params):
+        """Answer one request: (status, content type, body bytes, cache status)"""
+        if path.startswith('/chart/'):
+            name = path[len('/chart/'):]
+            format = params.get('format', 'png')
+            key = ('chart', name, format)
+            body = self.cache.get(key)
+            if body is not None:
+                return 200, CONTENT_TYPES[EXPORT_FORMATS[format]['format']], body, 'hit'
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self.chart_executor, self.chart, name, format)
+            self.cache.put(key, body)
+            return 200, CONTENT_TYPES[EXPORT_FORMATS[format]['format']], body, 'miss'
+
+        if path not in self.ROUTES:
+            raise KeyError(path)
+        handler, cacheable = self.ROUTES[path]
+        key = (path, tuple(sorted(params.items())))
+        if cacheable:
+            body = self.cache.get(key)
+            if body is not None:
+                return 200, 'application/json', body, 'hit'
+
+        body = json.dumps(getattr(self, handler)(**params)).encode()
+        if cacheable:
+            self.cache.put(key, body)
+        return 200, 'application/json', body, 'miss' if cacheable else 'none'
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request per connection"""
+        start = time.perf_counter()
+        cache_status = 'none'
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # headers are not needed
+            if len(request_line) != 3:
+                raise ValueError("Malformed request line")
+            method, target, _ = request_line
+            if method != 'GET':
+                status, content_type, body = 405, 'application/json', json.dumps({'error': 'GET only'}).encode()
+            else:
+                url = urlsplit(target)
+                status, content_type, body, cache_status = await self.dispatch(url.path, dict(parse_qsl(url.query)))
+        except KeyError as e:
+            status, content_type, body = 404, 'application/json', json.dumps({'error': f"Not found: {e}"}).encode()
+        except (TypeError, ValueError) as e:
+            status, content_type, body = 400, 'application/json', json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            status, content_type, body = 500, 'application/json', json.dumps({'error': repr(e)}).encode()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"X-Cache: {cache_status}\r\n"
+                f"X-Elapsed-Ms: {elapsed_ms:.3f}\r\n"
+                "Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the HTTP server until cancelled"""
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"📡 Analytics service listening on http://{host}:{port}")
+    print("   /totals /cagr?start=&end= /ratio?year= /strategy /chart/<name>?format= /health /reload")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """Load the datasets once and serve queries locally"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=DEFAULT_HOST, help='bind address (default: localhost only)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--cache-size', type=int, default=256, help='results kept in the LRU cache')
+    args = parser.parse_args(argv)
+
+    set_output_mode('memory')
+    service = AnalyticsService(args.cache_size)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nAnalytics service stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Assignee Resolution
+Normalized-name index attributing patent assignees to countries: token trie for exact and prefix matches, n-gram blocking for fuzzy ones
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+ANALYSIS_DIR = Path(__file__).parent
+REFERENCE_PATH = ANALYSIS_DIR.parent / "data" / "reference" / "quantum-assignees.csv"
+INDEX_PATH = ANALYSIS_DIR.parent / "data" / ".cache" / "assignee_index.pkl"
+
+# Legal-form tokens dropped from names, and abbreviations expanded, before matching
+LEGAL_FORMS = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'llc', 'plc', 'lp', 'llp',
+    'gmbh', 'ag', 'sa', 'bv', 'nv', 'oy', 'ab', 'kk', 'kabushiki', 'kaisha', 'srl', 'spa', 'pty',
+    '有限公司', '股份有限公司', '有限责任公司', '集团',
+}
+TOKEN_ALIASES = {
+    'univ': 'university', 'intl': 'international', 'natl': 'national', 'inst': 'institute',
+    'tech': 'technology', 'technologies': 'technology', 'lab': 'laboratory', 'labs': 'laboratory',
+    'laboratories': 'laboratory', 'sci': 'science', 'sciences': 'science', 'acad': 'academy',
+    'dept': 'department', 'sys': 'systems', 'the': '', 'and': '', '&': '',
+}
+
+# Bumped when the pickled layout changes, so older index files are rebuilt
+INDEX_VERSION = 1
+
+NGRAM = 3
+FUZZY_THRESHOLD = 0.6
+
+# Postings read per fuzzy lookup, rarest n-grams first, so a lookup does
+# bounded work however large the index grows; the best-blocked candidates
+# are then scored exactly
+BLOCKING_BUDGET = 20_000
+CANDIDATES = 20
+
+# Assignees a multi-assignee field is split on; the first listed one is attributed
+ASSIGNEE_SEPARATORS = re.compile(r'\s*[;|]\s*')
+
+TOKEN = re.compile(r'[^\W_]+')
+CJK = re.compile(r'[㐀-鿿]')
+
+
+def normalize(name):
+    """Canonical token tuple of an organization name
+
+    NFKC-folded, lowercased, punctuation dropped, abbreviations expanded
+    and legal forms removed, so 'Intl. Business Machines Corp.' and
+    'International Business Machines Corporation' agree. CJK names, which
+    are not space-separated, are one token with their legal-form suffixes
+    stripped.
+    """
+    text = unicodedata.normalize('NFKC', str(name)).lower()
+    tokens = []
+    for token in TOKEN.findall(text):
+        if CJK.search(token):
+            for suffix in sorted((f for f in LEGAL_FORMS if CJK.search(f)), key=len, reverse=True):
+                if token.endswith(suffix) and len(token) > len(suffix):
+                    token = token[:-len(suffix)]
+                    break
+        token = TOKEN_ALIASES.get(token, token)
+        if token and token not in LEGAL_FORMS:
+            tokens.append(token)
+    return tuple(tokens)
+
+
+def ngrams(tokens):
+    """Character n-grams of a normalized name, padded so short names still have some"""
+    text = f" {' '.join(tokens)} "
+    return {text[i:i + NGRAM] for i in range(max(len(text) - NGRAM + 1, 1))}
+
+
+class Match:
+    """An assignee resolved to a reference organization"""
+
+    __slots__ = ('organization', 'country', 'method', 'score')
+
+    def __init__(self, organization=None, country=None, method=None, score=0.0):
+        self.organization = organization
+        self.country = country
+        self.method = method
+        self.score = score
+
+    def __repr__(self):
+        return f"Match({self.organization!r}, {self.country!r}, {self.method!r}, {self.score:.2f})"
+
+
+UNRESOLVED = Match()
+
+
+class AssigneeIndex:
+    """Reference organizations indexed by normalized name
+
+    Lookups try, in order: the exact normalized name; the longest
+    reference name the assignee's tokens start with (a token trie, e.g.
+    'ibm research zurich' -> 'ibm'); and the reference name sharing the most
+    character n-grams, if their Jaccard similarity reaches the threshold.
+    Each step costs O(name length) dictionary lookups plus at most
+    BLOCKING_BUDGET postings, independent of the number of organizations.
+
+    Organizations can be added at any time; resolved names are cached and
+    the cache entries that a new organization could change are dropped.
+    """
+
+    def __init__(self, threshold=FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self.organizations = []  # [(name, country)]
+        self.names = {}  # normalized name -> organization id
+        self.trie = {}  # token -> child node; None key marks an organization id
+        self.postings = {}  # n-gram -> [name id]
+        self.name_ids = []  # name id -> (organization id, normalized name)
+        self.rows = set()  # reference (name, country, aliases) already added
+        self.cache = {}  # normalized assignee -> Match
+        self.reference_digest = None
+        self.version = INDEX_VERSION
+
+    def __len__(self):
+        return len(self.organizations)
+
+    @property
+    def countries(self):
+        """Country labels the organizations resolve to"""
+        return sorted({country for _, country in self.organizations})
+
+    def add(self, name, country, aliases=()):
+        """Index one organization under its name and aliases"""
+        row = (name, country, tuple(aliases))
+        if row in self.rows:
+            return False
+        self.rows.add(row)
+        org = len(self.organizations)
+        self.organizations.append((name, country))
+
+        for variant in (name, *aliases):
+            tokens = normalize(variant)
+            if not tokens or tokens in self.names:
+                continue
+            self.names[tokens] = org
+
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[None] = org
+
+            grams = ngrams(tokens)
+            name_id = len(self.name_ids)
+            self.name_ids.append((org, tokens))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(name_id)
+
+        # Only prefix, fuzzy and failed lookups can be improved by a new organization
+        self.cache = {key: match for key, match in self.cache.items() if match.method == 'exact'}
+        return True
+
+    def prefix(self, tokens):
+        """Organization of the longest indexed name that tokens start with"""
+        node, found = self.trie, None
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+    def fuzzy(self, tokens):
+        """(organization, Jaccard score) of the most similar indexed name by n-grams"""
+        grams = ngrams(tokens)
+        shared = Counter()
+        budget = BLOCKING_BUDGET
+        for posting in sorted((self.postings[g] for g in grams if g in self.postings), key=len):
+            if budget <= 0:
+                break
+            shared.update(posting[:budget])
+            budget -= len(posting)
+
+        best, best_score = None, 0.0
+        for name_id, _ in shared.most_common(CANDIDATES):
+            org, name = self.name_ids[name_id]
+            other = ngrams(name)
+            score = len(grams & other) / len(grams | other)
+            if score > best_score:
+                best, best_score = org, score
+        return best, best_score
+
+    def resolve(self, assignee):
+        """Match for one assignee string (the first one, if several are listed)"""
+        if not isinstance(assignee, str) or not assignee.strip():
+            return UNRESOLVED
+        tokens = normalize(ASSIGNEE_SEPARATORS.split(assignee.strip())[0])
+        if not tokens:
+            return UNRESOLVED
+        if tokens in self.cache:
+            return self.cache[tokens]
+
+        if tokens in self.names:
+            match = self.match(self.names[tokens], 'exact', 1.0)
+        elif (org := self.prefix(tokens)) is not None:
+            match = self.match(org, 'prefix', 1.0)
+        else:
+            org, score = self.fuzzy(tokens)
+            match = self.match(org, 'fuzzy', score) if score >= self.threshold else UNRESOLVED
+        self.cache[tokens] = match
+        return match
+
+    def match(self, org, method, score):
+        name, country = self.organizations[org]
+        return Match(name, country, method, score)
+
+    def resolve_many(self, assignees):
+        """Matches for a column of assignees as a DataFrame (Organization, Country, Method, Score)
+
+        Each distinct string is resolved once, so the cost follows the
+        number of distinct assignees rather than records.
+        """
+        assignees = pd.Series(assignees)
+        codes, uniques = pd.factorize(assignees)
+        matches = [self.resolve(assignee) for assignee in uniques]
+        columns = {
+            'Organization': [m.organization for m in matches],
+            'Country': [m.country for m in matches],
+            'Method': [m.method for m in matches],
+            'Score': [m.score for m in matches],
+        }
+        table = pd.DataFrame(columns)
+        # factorize marks missing values with -1; they take the unresolved row appended last
+        table.loc[len(table)] = [None, None, None, 0.0]
+        return table.iloc[codes].set_index(assignees.index)
+
+    def sync(self, reference_path=REFERENCE_PATH):
+        """Add reference rows not indexed yet; returns how many were added"""
+        return sum(self.add(*row) for row in reference_rows(reference_path))
+
+    def save(self, path=INDEX_PATH):
+        """Write the index atomically, so a concurrent reader never sees a partial file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+
+def reference_rows(reference_path=REFERENCE_PATH):
+    """(organization, country, aliases) rows of the reference CSV; aliases are ';'-separated"""
+    reference = pd.read_csv(reference_path, dtype=str, keep_default_na=False)
+    return [(row.Organization, row.Country, tuple(a for a in ASSIGNEE_SEPARATORS.split(row.Aliases) if a))
+            for row in reference.itertuples(index=False)]
+
+
+def reference_digest(reference_path=REFERENCE_PATH):
+    return hashlib.blake2b(Path(reference_path).read_bytes(), digest_size=16).hexdigest()
+
+
+def load_index(path=INDEX_PATH, reference_path=REFERENCE_PATH):
+    """The persisted index, brought up to date with the reference table
+
+    Rows added to the reference table are indexed incrementally; if rows
+    were edited or removed the index is rebuilt.
+    """
+    try:
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        index = AssigneeIndex()
+    if getattr(index, 'version', None) != INDEX_VERSION:
+        index = AssigneeIndex()
+
+    digest = reference_digest(reference_path)
+    if index.reference_digest != digest:
+        if not index.rows <= set(reference_rows(reference_path)):
+            index = AssigneeIndex()
+        index.sync(reference_path)
+        index.reference_digest = digest
+        index.save(path)
+    return index
+
+
+def attribute(chunk, index):
+    """Country of each record's (first) assignee; NaN where it cannot be resolved"""
+    if 'Assignee' not in chunk:
+        return pd.Series(None, index=chunk.index, dtype='object')
+    return index.resolve_many(chunk['Assignee'])['Country']
+
+
+def main(argv=None):
+    """Build or update the index, and resolve assignee names against it"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help='assignee names to resolve')
+    parser.add_argument('--reference', type=Path, default=REFERENCE_PATH, help='organization reference CSV')
+    parser.add_argument('--index', type=Path, default=INDEX_PATH, help='persisted index file')
+    parser.add_argument('--rebuild', action='store_true', help='rebuild the index from scratch')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.rebuild:
+        args.index.unlink(missing_ok=True)
+    index = load_index(args.index, args.reference)
+    print(f"Assignee index: {len(index):,} organizations, {len(index.names):,} names "
+          f"({time.perf_counter() - start:.2f}s)")
+
+    for name in args.names:
+        match = index.resolve(name)
+        if match.method:
+            print(f"  {name} -> {match.organization} [{match.country}] ({match.method}, {match.score:.2f})")
+        else:
+            print(f"  {name} -> unresolved")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
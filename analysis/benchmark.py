@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Analysis Pipeline Benchmark
+Times load, metrics, plot construction and savefig on synthetic tables from 10^2 to 10^7 rows
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ANALYSIS_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = ANALYSIS_DIR / "benchmark_results.json"
+
+STAGES = ['load', 'metrics', 'plot', 'savefig']
+
+# Entry points with a --stats-only mode, for the startup benchmark
+STARTUP_SCRIPTS = ['patent-trends-analysis.py', 'funding-comparison.py', 'patent_trends.py']
+
+# Top-level packages whose import time is reported
+IMPORT_PACKAGES = ['numpy', 'pandas', 'pyarrow', 'matplotlib', 'matplotlib.pyplot', 'seaborn']
+
+
+def synthetic_dates(rows, rng, start='2014-01-01', end='2024-12-31'):
+    """Sorted record dates spread over the study period"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    offsets = np.sort(rng.integers(0, (end - start).days + 1, rows))
+    return start + pd.to_timedelta(offsets, unit='D')
+
+
+def synthetic_patents(rows, seed=0, source='USPTO/PatentsView'):
+    """A table with the columns of us-quantum-patents-2014-2024.csv at record scale"""
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(rows, rng)
+    categories = rng.integers(1, 20, size=(rows, 3))
+    return pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d'),
+        'Year': dates.year,
+        'Total_Patents': categories.sum(axis=1),
+        'Quantum_Computing': categories[:, 0],
+        'Quantum_Communications': categories[:, 1],
+        'Quantum_Sensing': categories[:, 2],
+        'Source': source,
+        'Notes': '',
+    })
+
+
+def synthetic_government(rows, seed=1):
+    """A table with the columns of government-investment-comparison.csv at record scale"""
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(rows, rng)
+    us = rng.integers(1, 100, rows)
+    china = rng.integers(1, 300, rows)
+    return pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d'),
+        'Year': dates.year,
+        'US_Government_Millions': us,
+        'China_Government_Millions': china,
+        'US_Cumulative_Millions': us.cumsum(),
+        'China_Cumulative_Millions': china.cumsum(),
+        'Key_Events': '',
+        'Sources': 'synthetic',
+    })
+
+
+def synthetic_private(rows, seed=2):
+    """A table with the columns of private-sector-funding.csv at record scale"""
+    rng = np.random.default_rng(seed)
+    dates = synthetic_dates(rows, rng)
+    us = rng.integers(1, 100, rows)
+    china = rng.integers(1, 20, rows)
+    total = us + china + rng.integers(1, 200, rows)
+    return pd.DataFrame({
+        'Date': dates.strftime('%Y-%m-%d'),
+        'Year': dates.year,
+        'US_Private_Millions': us,
+        'China_Private_Millions': china,
+        'Global_Private_Total': total,
+        'US_Share_Percent': us / total * 100,
+        'China_Share_Percent': china / total * 100,
+        'Key_Investments': '',
+        'Sources': 'synthetic',
+    })
+
+
+def run_size(rows, workdir):
+    """Benchmark every stage at one table size; run in a fresh process for a clean peak RSS"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from data_access import read_csv_typed
+    from orchestrator import import_script
+    from periods import resample
+
+    patents = import_script("patent-trends-analysis.py")
+    funding = import_script("funding-comparison.py")
+
+    workdir = Path(workdir)
+    files = {
+        'us_patents': synthetic_patents(rows, seed=0),
+        'china_patents': synthetic_patents(rows, seed=3, source='CNIPA/WIPO'),
+        'government_funding': synthetic_government(rows),
+        'private_funding': synthetic_private(rows),
+    }
+    for name, table in files.items():
+        table.to_csv(workdir / f"{name}.csv", index=False)
+    del files
+
+    timings = {}
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    start = time.perf_counter()
+    tables = {name: read_csv_typed(name, workdir / f"{name}.csv")
+              for name in ['us_patents', 'china_patents', 'government_funding', 'private_funding']}
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with quiet:
+        patents.calculate_growth_rates(tables['us_patents'], tables['china_patents'])
+        funding.calculate_funding_metrics(tables['government_funding'], tables['private_funding'])
+    timings['metrics'] = time.perf_counter() - start
+
+    # Charts are drawn from the annual aggregates, as the pipeline does
+    start = time.perf_counter()
+    yearly = {name: resample(table, 'Y') for name, table in tables.items()}
+    figures = [
+        patents.build_comparison_figure(yearly['us_patents'], yearly['china_patents']),
+        funding.build_funding_analysis_figure(yearly['government_funding'], yearly['private_funding']),
+        funding.build_investment_strategy_figure(yearly['government_funding'], yearly['private_funding']),
+    ]
+    timings['plot'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, fig in enumerate(figures):
+        fig.savefig(workdir / f"figure_{i}.png", dpi=300, bbox_inches='tight')
+        plt.close(fig)
+    timings['savefig'] = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    return {'rows': rows, 'seconds': timings, 'peak_rss_mb': round(peak_mb, 1)}
+
+
+def run_in_subprocess(rows):
+    """Run one size in a fresh interpreter and return its result record"""
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run([sys.executable, __file__, '--single', str(rows), '--workdir', workdir],
+                                capture_output=True, text=True, check=True, cwd=ANALYSIS_DIR)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_times(command):
+    """Cumulative import seconds per package for one interpreter run, from -X importtime"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *command], capture_output=True, text=True,
+                            check=True, cwd=ANALYSIS_DIR, env=dict(os.environ, MPLBACKEND='Agg'))
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        _, cumulative, package = line.split('|')
+        if package.strip() in IMPORT_PACKAGES:
+            times[package.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def wall_time(command, repeat):
+    """Median wall time of a fresh interpreter running command"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *command], capture_output=True, check=True,
+                       cwd=ANALYSIS_DIR, env=dict(os.environ, MPLBACKEND='Agg'))
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def run_startup(repeat=5):
+    """Startup cost of each --stats-only entry point, and of the plotting stack it now skips"""
+    results = []
+    for script in STARTUP_SCRIPTS:
+        command = [script, '--stats-only']
+        results.append({'script': script, 'seconds': wall_time(command, repeat), 'imports': import_times(command)})
+
+    # What every run paid before the plotting stack was imported lazily
+    plotting = import_times(['-c', 'import matplotlib.pyplot, seaborn'])
+    return {'repeat': repeat, 'scripts': results,
+            'plotting_stack_seconds': plotting.get('matplotlib.pyplot', 0.0) + plotting.get('seaborn', 0.0)}
+
+
+def print_startup(startup):
+    """Print stats-only wall times and their import breakdown"""
+    print(f"\n{'script':<28} {'wall':>8} {'imports':>8}  loaded packages")
+    for result in startup['scripts']:
+        imports = result['imports']
+        loaded = ", ".join(f"{package} {seconds:.3f}s" for package, seconds in imports.items())
+        print(f"{result['script']:<28} {result['seconds']:7.3f}s {sum(imports.values()):7.3f}s  {loaded}")
+    print(f"\nPlotting stack (matplotlib.pyplot + seaborn), loaded only for charts: "
+          f"{startup['plotting_stack_seconds']:.3f}s")
+
+
+def git_revision():
+    """Current commit, so results can be compared across versions"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=ANALYSIS_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Versions that affect the numbers"""
+    import matplotlib
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+
+def print_results(results):
+    """Print a table of stage timings per size"""
+    print(f"\n{'rows':>10} " + " ".join(f"{stage:>9}" for stage in STAGES) + f" {'peak RSS':>10}")
+    for result in results:
+        stages = " ".join(f"{result['seconds'][stage]:8.3f}s" for stage in STAGES)
+        print(f"{result['rows']:>10,} {stages} {result['peak_rss_mb']:>8.1f}MB")
+
+
+def compare(results, baseline_path, threshold):
+    """Print stage slowdowns against a previous run; returns True if any exceed threshold"""
+    baseline = {r['rows']: r for r in json.loads(Path(baseline_path).read_text())['results']}
+    regressed = False
+
+    print(f"\nCompared with {baseline_path} (threshold {threshold:.2f}x):")
+    for result in results:
+        previous = baseline.get(result['rows'])
+        if previous is None:
+            continue
+        for stage in STAGES:
+            ratio = result['seconds'][stage] / max(previous['seconds'][stage], 1e-9)
+            if ratio > threshold:
+                regressed = True
+                print(f"  ❌ {result['rows']:,} rows, {stage}: {ratio:.2f}x slower")
+    if not regressed:
+        print("  ✅ No stage regressed")
+    return regressed
+
+
+def main(argv=None):
+    """Run the benchmark across sizes and write machine-readable results"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--min-exp', type=int, default=2, help='smallest size as a power of ten')
+    parser.add_argument('--max-exp', type=int, default=5, help='largest size as a power of ten (up to 7)')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', type=Path, help='previous results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio counted as a regression')
+    parser.add_argument('--startup', action='store_true',
+                        help='measure --stats-only startup and import time instead of scale-up stages')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per startup measurement')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        print(json.dumps(run_size(args.single, args.workdir)))
+        return 0
+
+    if args.startup:
+        startup = run_startup(args.repeat)
+        print_startup(startup)
+        args.output.write_text(json.dumps({'environment': environment(), 'startup': startup}, indent=2))
+        print(f"\nResults written to: {args.output}")
+        return 0
+
+    results = []
+    for exp in range(args.min_exp, args.max_exp + 1):
+        print(f"Benchmarking 10^{exp} rows...")
+        results.append(run_in_subprocess(10 ** exp))
+
+    print_results(results)
+    args.output.write_text(json.dumps({'environment': environment(), 'results': results}, indent=2))
+    print(f"\nResults written to: {args.output}")
+
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
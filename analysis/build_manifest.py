@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Chart Build Manifest
+Records what each output figure was built from so unchanged figures are skipped
+"""
+
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+ANALYSIS_DIR = Path(__file__).parent
+MANIFEST_PATH = ANALYSIS_DIR / "visualizations" / ".build-manifest.json"
+
+
+def hash_inputs(inputs):
+    """Hash the data a figure is built from (DataFrames, Series or plain values)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for item in inputs:
+        if isinstance(item, (pd.DataFrame, pd.Series)):
+            labels = item.columns if isinstance(item, pd.DataFrame) else [item.name]
+            digest.update(repr(list(labels)).encode())
+            digest.update(pd.util.hash_pandas_object(item, index=True).to_numpy().tobytes())
+        else:
+            digest.update(repr(item).encode())
+    return digest.hexdigest()
+
+
+def hash_params(params):
+    """Hash plotting parameters (dpi, variant options, ...)"""
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """Hash of every analysis module, read once per process
+
+    A figure depends on more than the script that draws it (chart specs,
+    country styles, metrics), so any change to the analysis code counts.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(ANALYSIS_DIR.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def fingerprint(inputs, params):
+    """Everything a figure depends on, as one comparable record"""
+    return {
+        'data': hash_inputs(inputs),
+        'params': hash_params(params),
+        'code': code_version(),
+    }
+
+
+class BuildManifest:
+    """JSON record of the fingerprint each output was last built from"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def key(self, output):
+        output = Path(output).resolve()
+        try:
+            return str(output.relative_to(self.path.parent.resolve()))
+        except ValueError:
+            return str(output)
+
+    def is_fresh(self, output, record):
+        """True if output exists and was built from exactly this fingerprint"""
+        return Path(output).exists() and self.entries.get(self.key(output)) == record
+
+    def record(self, output, record):
+        self.entries[self.key(output)] = record
+
+    def save(self):
+        """Write the manifest atomically through a temporary file named per process"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+        tmp.replace(self.path)
+
+
+def as_outputs(output):
+    """One output path or several (e.g. the export formats of one figure) as a list"""
+    return list(output) if isinstance(output, (list, tuple)) else [output]
+
+
+def is_up_to_date(output, inputs, params, manifest_path=MANIFEST_PATH):
+    """Check an output (or all of several) against the manifest before re-rendering it"""
+    manifest = BuildManifest(manifest_path)
+    record = fingerprint(inputs, params)
+    return all(manifest.is_fresh(path, record) for path in as_outputs(output))
+
+
+def mark_built(output, inputs, params, manifest_path=MANIFEST_PATH):
+    """Record an output (or several) as built from these inputs, parameters and code"""
+    manifest = BuildManifest(manifest_path)
+    record = fingerprint(inputs, params)
+    for path in as_outputs(output):
+        manifest.record(path, record)
+    manifest.save()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Chart Specifications
+Declarative panel and figure specs compiled to matplotlib, with template figures reused across data variants
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from plotting import bar_countries, country_style, export_figure, plot_countries, plotted_countries, pyplot
+
+OUTPUT_DIR = Path(__file__).parent / "visualizations" / "variants"
+
+PATENT_CATEGORIES = ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']
+
+
+def short_label(category):
+    """'Quantum_Computing' -> 'Computing', 'Total_Patents' -> 'Total Patents'"""
+    return category.replace('Quantum_', '').replace('_', ' ')
+
+
+class PanelSpec:
+    """One axes of a chart: which panel values it shows and how it is styled and labelled
+
+    kind is 'line' (one line per country of `category` over the periods;
+    transform 'yoy' plots year-over-year growth in percent instead) or
+    'bar' (grouped bars per country of the `categories` in `year`, the
+    latest period by default; a tuple of categories is summed, e.g.
+    ('Government_Cumulative', 'Private')). Titles are templates over
+    {category}, {label} (the category without its 'Quantum_' prefix),
+    {year} and {names} (the countries drawn); legend entries also over
+    {country} and {name}. countries restricts the panel to some countries,
+    by default every country of the data is drawn. value_labels is the
+    offset above each bar, in data units, at which its height is written.
+    """
+
+    FIELDS = ['kind', 'category', 'categories', 'year', 'countries', 'transform', 'title', 'xlabel', 'ylabel',
+              'label', 'ticklabels', 'colors', 'style', 'title_style', 'legend_style', 'grid_style',
+              'value_labels', 'despine', 'hline']
+
+    def __init__(self, kind, title, xlabel, ylabel, category=None, categories=None, year=None, countries=None,
+                 transform=None, label='{name}', ticklabels=None, colors=None, style=None, title_style=None,
+                 legend_style=None, grid_style=None, value_labels=None, despine=False, hline=None):
+        self.kind = kind
+        self.category = category
+        self.categories = categories
+        self.year = year
+        self.countries = countries
+        self.transform = transform
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.label = label
+        self.ticklabels = ticklabels
+        self.colors = colors
+        self.style = style or {}
+        self.title_style = title_style or {}
+        self.legend_style = legend_style or {}
+        self.grid_style = grid_style or {'alpha': 0.3}
+        self.value_labels = value_labels
+        self.despine = despine
+        self.hline = hline
+
+    def variant(self, **changes):
+        """A copy of this spec with some fields replaced, e.g. spec.variant(category='Quantum_Sensing')"""
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        fields.update(changes)
+        return PanelSpec(**fields)
+
+    def text(self, template, panel, countries):
+        category = self.category or ''
+        year = panel.years[-1] if self.year is None else self.year
+        names = ', '.join(country_style(country, panel.country_pos[country])['name'] for country in countries)
+        return template.format(category=category, label=short_label(category), year=year, names=names)
+
+    def values(self, panel):
+        """(x, values, countries) to draw: values is an (x, country) array"""
+        countries = list(self.countries or panel.countries)
+        if self.kind == 'bar':
+            row = panel.values[panel.year_index(panel.years[-1] if self.year is None else self.year)]
+            row = row[[panel.country_pos[c] for c in countries]]  # (country, category)
+            columns = []
+            for category in self.categories:
+                parts = (category,) if isinstance(category, str) else category
+                columns.append(sum(row[:, panel.category_pos[part]] for part in parts))
+            return np.arange(len(self.categories)), np.array(columns), countries  # (category, country)
+        if self.transform == 'yoy':
+            growth = panel.yoy()[:, :, panel.category_pos[self.category]] * 100
+            return panel.years[1:], growth[1:, [panel.country_pos[c] for c in countries]], countries
+        return panel.years, panel.series(self.category, countries), countries
+
+    def drawn(self, panel):
+        """(position, country) of the series this panel draws from panel"""
+        _, values, countries = self.values(panel)
+        return plotted_countries(values, countries)
+
+    def draw(self, ax, panel):
+        """Draw the panel onto ax; returns its artists, for ChartTemplate to update in place"""
+        x, values, countries = self.values(panel)
+        text = self.label.replace('{label}', short_label(self.category or ''))
+        if self.kind == 'bar':
+            artists = bar_countries(ax, x, values, countries, text, colors=self.colors, **self.style)
+        else:
+            artists = plot_countries(ax, x, values, countries, text, **self.style)
+
+        ax.set_title(self.text(self.title, panel, countries), **self.title_style)
+        ax.set_xlabel(self.xlabel)
+        ax.set_ylabel(self.ylabel)
+        if self.kind == 'bar':
+            ax.set_xticks(x)
+            ax.set_xticklabels(self.ticklabels or [short_label(c) if isinstance(c, str) else ' + '.join(map(short_label, c))
+                                                   for c in self.categories])
+        ax.legend(**self.legend_style)
+        ax.grid(True, **self.grid_style)
+
+        labels = []
+        if self.value_labels is not None:
+            for bars in artists:
+                for bar in bars:
+                    height = bar.get_height()
+                    labels.append(ax.text(bar.get_x() + bar.get_width()/2., height + self.value_labels,
+                                          f'{int(height)}', ha='center', va='bottom', fontsize=10))
+        if self.despine:
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+        if self.hline is not None:
+            ax.axhline(y=self.hline, color='black', linestyle='--', alpha=0.5)
+        return {'series': artists, 'labels': labels}
+
+    def update(self, ax, artists, panel):
+        """Swap this spec's data into artists drawn by an earlier draw() of the same shape"""
+        x, values, countries = self.values(panel)
+        text = self.label.replace('{label}', short_label(self.category or ''))
+        for (position, country), artist in zip(plotted_countries(values, countries), artists['series']):
+            style = country_style(country, position)
+            name = text.format(country=country, name=style['name'])
+            if self.kind == 'bar':
+                for bar, height in zip(artist, values[:, position]):
+                    bar.set_height(height)
+                artist.set_label(name)
+                color = (self.colors or {}).get(country, style['color'])
+                for bar in artist:
+                    bar.set_facecolor(color)
+            else:
+                artist.set_data(x, values[:, position])
+                artist.set_label(name)
+                artist.set_color(style['color'])
+                artist.set_marker(style['fmt'][-1])
+
+        bars = [bar for container in artists['series'] for bar in container] if self.kind == 'bar' else []
+        for bar, label in zip(bars, artists['labels']):
+            height = bar.get_height()
+            label.set_position((bar.get_x() + bar.get_width()/2., height + self.value_labels))
+            label.set_text(f'{int(height)}')
+
+        ax.set_title(self.text(self.title, panel, countries), **self.title_style)
+        ax.legend(**self.legend_style)
+        ax.relim()
+        ax.autoscale_view()
+
+
+class FigureSpec:
+    """A whole figure: a grid of PanelSpecs plus the figure title, size, style and footer"""
+
+    def __init__(self, title, panels, shape=(1, 1), figsize=(7.5, 6), style=None, footer=None):
+        self.title = title
+        self.panels = list(panels)
+        self.shape = shape
+        self.figsize = figsize
+        self.style = style
+        self.footer = footer
+
+    def variant(self, title=None, **changes):
+        """A copy with `changes` applied to every panel that has those fields set"""
+        panels = [panel.variant(**{k: v for k, v in changes.items() if getattr(panel, k) is not None})
+                  for panel in self.panels]
+        return FigureSpec(title or self.title, panels, self.shape, self.figsize, self.style, self.footer)
+
+    def build(self, panel):
+        """Compile to a matplotlib figure; returns (figure, axes, artists per panel)"""
+        plt = pyplot()
+        if self.style:
+            plt.style.use(self.style)
+        fig, axes = plt.subplots(*self.shape, figsize=self.figsize, squeeze=False)
+        if self.title:
+            fig.suptitle(self.title, fontsize=16, fontweight='bold')
+
+        axes = list(axes.flat)
+        artists = [spec.draw(ax, panel) for ax, spec in zip(axes, self.panels)]
+
+        if self.footer:
+            fig.text(0.5, 0.02, self.footer, ha='center', fontsize=10, style='italic')
+        self.layout(fig)
+        return fig, axes, artists
+
+    def layout(self, fig):
+        """Fit the axes around their labels, starting from the default subplot positions
+
+        Starting from the defaults rather than the current positions makes
+        the layout of a redrawn template the same as that of a new figure.
+        """
+        import matplotlib
+
+        fig.subplots_adjust(**{param: matplotlib.rcParams[f'figure.subplot.{param}']
+                               for param in ('left', 'bottom', 'right', 'top', 'wspace', 'hspace')})
+        fig.tight_layout()
+        if self.footer:
+            fig.subplots_adjust(bottom=0.1)  # Make room for the footer
+
+
+def build_figure(spec, panel):
+    """A FigureSpec compiled against a panel, as a matplotlib figure"""
+    fig, _, _ = spec.build(panel)
+    return fig
+
+
+class ChartTemplate:
+    """A figure compiled once from a FigureSpec and redrawn for each variant
+
+    render() swaps a variant's data into the existing artists (set_data on
+    lines, set_height on bars) and re-exports, rather than building a new
+    figure, so it skips figure, axes and artist construction. Every
+    variant must draw the same number of series and bars as the spec the
+    template was built from, e.g. the same countries and category count.
+    The layout and export bounding box are redone per variant, since tick
+    labels change width with the data, so each export is the same image a
+    new figure would give.
+    """
+
+    def __init__(self, spec, panel):
+        self.spec = spec
+        self.fig, self.axes, self.artists = spec.build(panel)
+
+    def render(self, spec, panel, output_file, formats=('png',), memory=False):
+        """Export `spec` drawn from panel; returns export_figure's report"""
+        if spec.title:
+            self.fig.suptitle(spec.title, fontsize=16, fontweight='bold')
+        for ax, artists, panel_spec in zip(self.axes, self.artists, spec.panels):
+            panel_spec.update(ax, artists, panel)
+        spec.layout(self.fig)
+        return export_figure(self.fig, output_file, formats, memory=memory)
+
+    def close(self):
+        pyplot().close(self.fig)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def render_variants(variants, panel, reuse=True, formats=('png',)):
+    """Render [(FigureSpec, output file)] from one panel; returns [(output, seconds)]
+
+    With reuse, consecutive variants of the same shape share one
+    ChartTemplate; otherwise each is built and closed like any other chart.
+    """
+    results = []
+    template = None
+    try:
+        for spec, output in variants:
+            start = time.perf_counter()
+            if reuse:
+                if template is None or not same_shape(template.spec, spec, panel):
+                    if template is not None:
+                        template.close()
+                    template = ChartTemplate(spec, panel)
+                template.render(spec, panel, output, formats)
+            else:
+                fig = build_figure(spec, panel)
+                try:
+                    export_figure(fig, output, formats, memory=False)
+                finally:
+                    pyplot().close(fig)
+            results.append((output, time.perf_counter() - start))
+    finally:
+        if template is not None:
+            template.close()
+    return results
+
+
+def same_shape(a, b, panel):
+    """True if b can be drawn into a template built from a: same grid, kinds and series counts
+
+    Series are counted as drawn from panel, since countries without data are left out.
+    """
+    if (a.shape, a.figsize, a.style, len(a.panels)) != (b.shape, b.figsize, b.style, len(b.panels)):
+        return False
+    return all(p.kind == q.kind and len(p.drawn(panel)) == len(q.drawn(panel))
+               and len(p.categories or ()) == len(q.categories or ()) for p, q in zip(a.panels, b.panels))
+
+
+TREND_SPEC = FigureSpec(None, [PanelSpec('line', 'Quantum {label} Patents', 'Year', 'Number of Patents',
+                                         category='Quantum_Computing', label='{country} {label}',
+                                         style={'linewidth': 3})], style='seaborn-v0_8')
+
+BREAKDOWN_SPEC = FigureSpec(None, [PanelSpec('bar', 'Patents by Technology Category ({year})', 'Technology Category',
+                                             'Number of Patents', categories=PATENT_CATEGORIES, year=2023,
+                                             style={'alpha': 0.8}, grid_style={'alpha': 0.3, 'axis': 'y'},
+                                             despine=True)], style='seaborn-v0_8')
+
+COUNTRY_SPEC = FigureSpec(None, [PanelSpec('line', '{names}: {label}', 'Year', 'Number of Patents',
+                                           category='Total_Patents', countries=['US'], label='{name}',
+                                           style={'linewidth': 3})], style='seaborn-v0_8')
+
+
+def patent_variants(panel, kinds, output_dir=OUTPUT_DIR):
+    """[(FigureSpec, output file)]: per-category trends, per-year breakdowns and per-country x category lines"""
+    variants = []
+    categories = ['Total_Patents'] + PATENT_CATEGORIES
+    years = [panel.label(year) for year in panel.years]
+    if 'category' in kinds:
+        for category in categories:
+            variants.append((TREND_SPEC.variant(category=category), output_dir / f"trend_{category.lower()}.png"))
+    if 'year' in kinds:
+        for year in years:
+            variants.append((BREAKDOWN_SPEC.variant(year=year), output_dir / f"breakdown_{year}.png"))
+    if 'country' in kinds:
+        for country in panel.countries:
+            for category in categories:
+                variants.append((COUNTRY_SPEC.variant(countries=[country], category=category),
+                                 output_dir / f"{country.lower()}_{category.lower()}.png"))
+    return variants
+
+
+def main(argv=None):
+    """Render per-category, per-year and per-country patent chart variants from templates"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--variants', nargs='+', choices=['category', 'year', 'country'],
+                        default=['category', 'year', 'country'])
+    parser.add_argument('--dataset', choices=['us-china', 'countries'], default='us-china',
+                        help='the US and China tables, or every per-country patent file')
+    parser.add_argument('--formats', nargs='+', default=['preview'], help='export targets (default: preview)')
+    parser.add_argument('--rebuild', action='store_true', help='build a new figure per variant, for comparison')
+    args = parser.parse_args(argv)
+
+    from data_access import load_country_patent_tables, load_patent_tables
+    from metrics import build_panel
+
+    tables = load_patent_tables() if args.dataset == 'us-china' else load_country_patent_tables()
+    panel = build_panel(patents=tables)
+    variants = patent_variants(panel, args.variants)
+
+    start = time.perf_counter()
+    results = render_variants(variants, panel, reuse=not args.rebuild, formats=args.formats)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} charts in {elapsed:.2f}s ({elapsed / max(len(results), 1) * 1000:.0f}ms per chart, "
+          f"{'rebuilt' if args.rebuild else 'from templates'}) -> {OUTPUT_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Country Charts
+Small-multiples and ranked charts over every country of a long-format panel, rendered in batch
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from metrics import panel_from_long
+from plotting import country_style, pyplot
+from render_pool import OUTPUT_DIR, RenderJob, print_render_report, render_all
+
+SCRIPT = "country_charts.py"
+COUNTRY_OUTPUT_DIR = OUTPUT_DIR / "countries"
+
+# Size of one small-multiple panel, and of one row of a ranked chart, in inches
+PANEL_SIZE = (3.0, 2.2)
+RANK_ROW_HEIGHT = 0.32
+
+
+def grid_shape(n, ncols=None):
+    """(rows, columns) of a near-square grid holding n panels"""
+    ncols = ncols or math.ceil(math.sqrt(n))
+    return math.ceil(n / ncols), ncols
+
+
+def category_title(category):
+    return category.replace('_', ' ')
+
+
+def country_segments(years, values, log=False):
+    """One (point, 2) polyline per country from a (period, country) array, missing points dropped"""
+    segments = []
+    for i in range(values.shape[1]):
+        points = np.column_stack([years, values[:, i]])
+        usable = np.isfinite(points).all(axis=1) & ((points[:, 1] > 0) if log else True)
+        segments.append(points[usable])
+    return segments
+
+
+def build_small_multiples(long, category, log=False, ncols=None):
+    """One panel per country for a category, every other country drawn faintly behind it
+
+    long holds (Period, Country, Category, Value) rows. Panels share both
+    axes so countries compare at a glance; the background of each panel is
+    a single LineCollection, so a grid of n countries costs O(n) artists.
+    """
+    from matplotlib.collections import LineCollection
+
+    panel = panel_from_long(long)
+    years = np.asarray(panel.years, dtype='float64')
+    values = panel.series(category)
+    segments = country_segments(years, values, log)
+    nrows, ncols = grid_shape(len(panel.countries), ncols)
+
+    plt = pyplot()
+    fig, axes = plt.subplots(nrows, ncols, figsize=(PANEL_SIZE[0] * ncols, PANEL_SIZE[1] * nrows),
+                             sharex=True, sharey=True, squeeze=False, layout='constrained')
+    fig.suptitle(f'{category_title(category)} by Country', fontsize=14, fontweight='bold')
+
+    for position, (ax, country) in enumerate(zip(axes.flat, panel.countries)):
+        style = country_style(country, position)
+        ax.add_collection(LineCollection(segments, colors='lightgray', linewidths=0.8))
+        ax.plot(*segments[position].T, style['fmt'], color=style['color'], linewidth=2, markersize=3)
+        ax.set_title(style['name'], fontsize=10)
+        ax.grid(True, alpha=0.3)
+    for ax in axes.flat[len(panel.countries):]:
+        ax.set_visible(False)
+
+    if log:
+        axes[0, 0].set_yscale('log')
+    fig.supxlabel('Year')
+    fig.supylabel(category_title(category))
+    return fig
+
+
+def build_ranked_chart(long, category, year=None, top=None):
+    """Countries ranked by a category in one year (the latest by default), largest at the top"""
+    panel = panel_from_long(long)
+    year = panel.years[-1] if year is None else year
+    ranked = panel.rank(year, category, top)
+    styles = [country_style(country, panel.country_pos[country]) for country in ranked.index]
+
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(8, RANK_ROW_HEIGHT * len(ranked) + 1.5))
+    rows = np.arange(len(ranked))
+    bars = ax.barh(rows, ranked.to_numpy(), color=[style['color'] for style in styles], alpha=0.8)
+    ax.bar_label(bars, fmt='{:,.0f}', padding=3, fontsize=8)
+    ax.set_yticks(rows, [style['name'] for style in styles])
+    ax.invert_yaxis()
+    ax.set_title(f'{category_title(category)} by Country ({year})', fontsize=14, fontweight='bold')
+    ax.grid(True, axis='x', alpha=0.3)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    fig.tight_layout()
+    return fig
+
+
+def country_jobs(long, categories=None, year=None, top=None, log=False, output_dir=COUNTRY_OUTPUT_DIR):
+    """A small-multiples and a ranked chart per category, each job carrying only its category's rows"""
+    jobs = []
+    for category, rows in long.groupby('Category', sort=False):
+        if categories and category not in categories:
+            continue
+        name = category.lower()
+        jobs.append(RenderJob(SCRIPT, 'build_small_multiples', (rows, category),
+                              output_dir / f"{name}_small_multiples.png", kwargs={'log': log}))
+        jobs.append(RenderJob(SCRIPT, 'build_ranked_chart', (rows, category),
+                              output_dir / f"{name}_ranked.png", kwargs={'year': year, 'top': top}))
+    return jobs
+
+
+def load_long(dataset):
+    """Long rows of every country in the patent files, the funding tables, or both"""
+    from data_access import load_country_patent_tables, load_funding_tables
+    from metrics import build_long
+
+    patents = load_country_patent_tables() if dataset in ('patents', 'all') else None
+    funding = load_funding_tables() if dataset in ('funding', 'all') else None
+    return build_long(patents, funding)
+
+
+def main(argv=None):
+    """Render small-multiples and ranked charts for every country in the data"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', choices=['patents', 'funding', 'all'], default='all')
+    parser.add_argument('--categories', nargs='+', help='categories to chart (default: all)')
+    parser.add_argument('--year', type=int, default=None, help='year ranked (default: the latest)')
+    parser.add_argument('--top', type=int, default=None, help='countries shown in ranked charts (default: all)')
+    parser.add_argument('--log', action='store_true', help='log-scale small multiples')
+    parser.add_argument('--workers', type=int, default=None, help='process count (default: all cores)')
+    parser.add_argument('--force', action='store_true', help='re-render even if the charts are up to date')
+    args = parser.parse_args(argv)
+
+    long = load_long(args.dataset)
+    print(f"{long['Country'].nunique()} countries, {long['Category'].nunique()} categories")
+
+    start = time.perf_counter()
+    jobs = country_jobs(long, args.categories, args.year, args.top, args.log)
+    results = render_all(jobs, workers=args.workers, force=args.force)
+    print_render_report(results, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
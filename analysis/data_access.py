@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Shared Data Access
+Typed loading of the patent and funding CSVs through a columnar cache
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import stage
+from validation import GOVERNMENT_RULES, PATENT_RULES, PRIVATE_RULES, validate
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is an optimization only
+    pa = None
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+CACHE_DIR = DATA_DIR / ".cache"
+
+PATENT_DTYPES = {
+    'Year': 'int64',
+    'Total_Patents': 'int64',
+    'Quantum_Computing': 'int64',
+    'Quantum_Communications': 'int64',
+    'Quantum_Sensing': 'int64',
+    'Source': 'str',
+    'Notes': 'str',
+}
+
+# Every dataset the analysis scripts read, with its path under data/, the
+# column types to parse it with and the integrity rules it must satisfy
+DATASETS = {
+    'us_patents': {
+        'path': "patents/us-quantum-patents-2014-2024.csv",
+        'dtypes': PATENT_DTYPES,
+        'rules': PATENT_RULES,
+    },
+    'china_patents': {
+        'path': "patents/china-quantum-patents-2014-2024.csv",
+        'dtypes': PATENT_DTYPES,
+        'rules': PATENT_RULES,
+    },
+    'government_funding': {
+        'path': "funding/government-investment-comparison.csv",
+        'dtypes': {
+            'Year': 'int64',
+            'US_Government_Millions': 'int64',
+            'China_Government_Millions': 'int64',
+            'US_Cumulative_Millions': 'int64',
+            'China_Cumulative_Millions': 'int64',
+            'Key_Events': 'str',
+            'Sources': 'str',
+        },
+        'rules': GOVERNMENT_RULES,
+    },
+    'private_funding': {
+        'path': "funding/private-sector-funding.csv",
+        'dtypes': {
+            'Year': 'int64',
+            'US_Private_Millions': 'int64',
+            'China_Private_Millions': 'int64',
+            'Global_Private_Total': 'int64',
+            'US_Share_Percent': 'float64',
+            'China_Share_Percent': 'float64',
+            'Key_Investments': 'str',
+            'Sources': 'str',
+        },
+        'rules': PRIVATE_RULES,
+    },
+}
+
+# Per-country patent files are discovered by this pattern, one file per country
+PATENT_FILE_GLOB = "patents/*-quantum-patents-*.csv"
+
+# Country labels of file-name slugs that are not simply capitalized; the
+# assignee reference (data/reference/quantum-assignees.csv) uses the same labels
+COUNTRY_SLUGS = {'us': 'US', 'uk': 'UK', 'eu': 'EU', 'south-korea': 'Korea'}
+
+
+def content_hash(path, block_size=1 << 20):
+    """Hash a file's bytes; hashing is far cheaper than parsing the CSV"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_path(name):
+    """Source CSV path for a registered dataset"""
+    return DATA_DIR / DATASETS[name]['path']
+
+
+def cache_key(name):
+    """Hash of a dataset's CSV content and its declared column types
+
+    A cached table holds the parsed types, so changing a dtype in DATASETS
+    invalidates the cache just as editing the CSV does.
+    """
+    digest = hashlib.blake2b(content_hash(dataset_path(name)).encode(), digest_size=16)
+    digest.update(repr(sorted(DATASETS[name]['dtypes'].items())).encode())
+    return digest.hexdigest()
+
+
+def cache_path(name, digest):
+    """Cache file for a dataset at a given cache key"""
+    return CACHE_DIR / f"{name}-{digest}.arrow"
+
+
+def read_csv_typed(name, path=None, validated=True):
+    """Parse a dataset's CSV (or another file of the same layout) with its declared column types
+
+    Datasets may carry timestamped rows (a 'Date' column at monthly,
+    quarterly or record resolution) instead of a 'Year' column; 'Year' is
+    then derived from the date so annual consumers keep working. The
+    table is checked against the dataset's rules (see validation.py) and
+    ValidationError is raised if it breaks any.
+    """
+    data = pd.read_csv(path or dataset_path(name), dtype=DATASETS[name]['dtypes'])
+    if 'Date' in data:
+        data['Date'] = pd.to_datetime(data['Date'])
+        if 'Year' not in data:
+            data.insert(0, 'Year', data['Date'].dt.year.astype('int64'))
+    if validated:
+        validate(name, data, DATASETS[name]['rules'])
+    return data
+
+
+def load_dataset(name, use_cache=True, validated=True):
+    """Load a dataset, serving it from the columnar cache when it is current
+
+    The cache is an uncompressed Arrow IPC file keyed on the CSV's content
+    hash and the declared column types, so it is memory-mapped rather than
+    parsed and any edit to the CSV or its types invalidates it. Without pyarrow the CSV is parsed directly. Cached
+    tables are validated too, since the rules may have changed since the
+    cache was written; a table that fails is never cached.
+    """
+    with stage(f"load_{name}", 'load'):
+        if not use_cache or pa is None:
+            return read_csv_typed(name, validated=validated)
+
+        cached = cache_path(name, cache_key(name))
+        if not cached.exists():
+            data = read_csv_typed(name, validated=validated)
+            write_cache(name, cached, data)
+            return data
+
+        with pa.memory_map(str(cached)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        data = table.to_pandas(split_blocks=True)
+        if validated:
+            validate(name, data, DATASETS[name]['rules'])
+        return data
+
+
+def write_cache(name, cached, data):
+    """Write a cache file atomically and drop caches for older versions
+
+    The temporary file is named per process, so processes loading the same
+    dataset at once never write into each other's file.
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_suffix(f'.{os.getpid()}.tmp')
+    feather.write_feather(data, tmp, compression='uncompressed')
+    tmp.replace(cached)
+
+    for stale in CACHE_DIR.glob(f"{name}-*.arrow"):
+        if stale != cached:
+            stale.unlink(missing_ok=True)
+
+
+def load_patent_tables(use_cache=True):
+    """US and China yearly patent tables"""
+    return load_dataset('us_patents', use_cache), load_dataset('china_patents', use_cache)
+
+
+def country_patent_datasets():
+    """{country: dataset name} for every per-country patent CSV, registering any new ones"""
+    datasets = {}
+    for path in sorted((DATA_DIR / "patents").glob(Path(PATENT_FILE_GLOB).name)):
+        slug = path.name.split('-quantum-patents-')[0]
+        name = f"{slug.replace('-', '_')}_patents"
+        DATASETS.setdefault(name, {'path': str(path.relative_to(DATA_DIR)), 'dtypes': PATENT_DTYPES,
+                                   'rules': PATENT_RULES})
+        datasets[COUNTRY_SLUGS.get(slug, slug.replace('-', ' ').title())] = name
+    return datasets
+
+
+def load_country_patent_tables(use_cache=True):
+    """{country: yearly patent table} for every country with a patent CSV, US and China first"""
+    datasets = country_patent_datasets()
+    from metrics import COUNTRIES
+    order = [c for c in COUNTRIES if c in datasets] + [c for c in datasets if c not in COUNTRIES]
+    return {country: load_dataset(datasets[country], use_cache) for country in order}
+
+
+def load_funding_tables(use_cache=True):
+    """Government and private funding tables"""
+    return load_dataset('government_funding', use_cache), load_dataset('private_funding', use_cache)
+
+
+def load_patent_panel(use_cache=True):
+    """Patent tables as a year-indexed (year, country, category) Panel"""
+    from metrics import build_panel
+    return build_panel(patents=load_patent_tables(use_cache))
+
+
+def load_funding_panel(use_cache=True):
+    """Funding tables as a year-indexed (year, country, category) Panel"""
+    from metrics import build_panel
+    return build_panel(funding=load_funding_tables(use_cache))
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Trend Forecasting
+Log-linear and logistic trend fits per country x category, with bootstrap Monte Carlo bands and crossover years
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from metrics import PATENT_CATEGORIES
+from shared_data import SharedStore, attach
+
+MODELS = ['loglinear', 'logistic']
+
+# Fit window per dataset; patents stop at 2023 because of publication delays,
+# as in the CAGR figures, while the 2024 funding figures are complete
+FIT_WINDOWS = {'patents': (2014, 2023), 'funding': (2014, 2024)}
+FIT_START, FIT_END = FIT_WINDOWS['patents']
+DEFAULT_HORIZON = 2030
+
+# Categories fitted as trends. Running totals and shares are not trends of
+# their own, so Government_Cumulative and Private_Share are derived from the
+# projected flows instead (see derived_paths)
+FLOW_CATEGORIES = PATENT_CATEGORIES + ['Government', 'Private']
+
+# Series label of the private funding outside the panel's countries, which
+# is projected alongside them so the global total behind Private_Share is too
+REST_OF_WORLD = 'Rest_of_World'
+
+# Logistic saturation levels tried, as multiples of a series' largest observed value
+CAPACITY_MULTIPLES = np.geomspace(1.1, 20, 16)
+
+# Bootstrap paths simulated per task; bounds the (series, paths, capacities, years) work array
+SHARD_PATHS = 2048
+
+
+def linear_fit(y, t):
+    """Least-squares intercept and slope of y on t along the last axis, for any leading shape"""
+    design = np.column_stack([np.ones_like(t), t])
+    coef = y @ np.linalg.pinv(design).T
+    return coef[..., 0], coef[..., 1]
+
+
+def loglinear_fit(log_y, t):
+    """Fit log y = a + b t; returns parameters (a, b)"""
+    return linear_fit(log_y, t)
+
+
+def loglinear_predict(params, t):
+    """log y at times t for parameters from loglinear_fit"""
+    a, b = params
+    return a[..., None] + b[..., None] * t
+
+
+def logistic_fit(log_y, t):
+    """Fit y = K / (1 + exp(a + b t)), choosing K from a grid of multiples of max(y)
+
+    For a fixed K the model is linear in log(K/y - 1), so every candidate is
+    a single least-squares solve and the grid is searched in one array
+    operation; the K with the smallest squared error in log y is kept.
+    Returns parameters (K, a, b).
+    """
+    y = np.exp(log_y)
+    capacity = y.max(axis=-1)[..., None] * CAPACITY_MULTIPLES  # (..., K)
+    z = np.log(capacity[..., None] / y[..., None, :] - 1)  # (..., K, T); y < K by construction
+    a, b = linear_fit(z, t)
+
+    error = ((log_y[..., None, :] - logistic_predict((capacity, a, b), t)) ** 2).sum(axis=-1)
+    best = error.argmin(axis=-1)[..., None]
+
+    return tuple(np.take_along_axis(param, best, axis=-1)[..., 0] for param in (capacity, a, b))
+
+
+def logistic_predict(params, t):
+    """log y at times t for parameters from logistic_fit"""
+    capacity, a, b = params
+    return np.log(capacity)[..., None] - np.log1p(np.exp(a[..., None] + b[..., None] * t))
+
+
+FITS = {
+    'loglinear': (loglinear_fit, loglinear_predict),
+    'logistic': (logistic_fit, logistic_predict),
+}
+
+
+def simulate_shard(log_y, t, horizon_t, model, n_paths, seed):
+    """Bootstrap paths for every series: (series, paths, horizon) projected log values
+
+    Residuals of the point fit are resampled onto the fitted curve, the
+    model is refitted to each synthetic history, and its projection gets a
+    resampled residual per horizon step, so the bands cover both parameter
+    and year-to-year uncertainty.
+    """
+    fit, predict = FITS[model]
+    log_y = attach(log_y)
+    rng = np.random.default_rng(seed)
+    n_series, n_years = log_y.shape
+
+    fitted = predict(fit(log_y, t), t)
+    residuals = log_y - fitted
+
+    draws = rng.integers(0, n_years, size=(n_series, n_paths, n_years + len(horizon_t)))
+    resampled = np.take_along_axis(residuals[:, None, :], draws.reshape(n_series, 1, -1), axis=-1)
+    resampled = resampled.reshape(draws.shape)
+
+    synthetic = fitted[:, None, :] + resampled[..., :n_years]
+    projected = predict(fit(synthetic, t), horizon_t) + resampled[..., n_years:]
+    return projected.astype('float32')
+
+
+def series_matrix(panel, start=FIT_START, end=FIT_END):
+    """(series, year) log values of every complete, positive country x flow category series in a panel
+
+    If the panel has private funding shares, the private funding of the rest
+    of the world is added as one more series (see rest_of_world).
+    """
+    rows = panel.year_index(range(start, end + 1))
+    values = panel.values[rows].transpose(1, 2, 0).reshape(-1, len(rows))
+    labels = [(country, category) for country in panel.countries for category in panel.categories]
+
+    flows = np.isin([category for _, category in labels], FLOW_CATEGORIES)
+    usable = flows & np.isfinite(values).all(axis=1) & (values > 0).all(axis=1)
+    log_y, labels = np.log(values[usable]), [label for label, ok in zip(labels, usable) if ok]
+
+    rest = rest_of_world(panel, start, end)
+    if rest is not None and np.isfinite(rest).all() and (rest > 0).all():
+        log_y = np.vstack([log_y, np.log(rest)])
+        labels.append((REST_OF_WORLD, 'Private'))
+    return log_y, labels
+
+
+def rest_of_world(panel, start, end):
+    """(year,) private funding outside the panel's countries, or None without private shares
+
+    The global total is recovered from each country's private funding and
+    its share of the global total, taking the median over countries.
+    """
+    if 'Private' not in panel.category_pos or 'Private_Share' not in panel.category_pos:
+        return None
+    rows = panel.year_index(range(start, end + 1))
+    private = panel.values[rows][:, :, panel.category_pos['Private']]
+    share = panel.values[rows][:, :, panel.category_pos['Private_Share']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = np.nanmedian(private / share * 100, axis=1)
+    return total - np.nansum(private, axis=1)
+
+
+def derived_paths(panel, projected, labels, end):
+    """Projected log paths and labels with Government_Cumulative and Private_Share added
+
+    Government_Cumulative continues the running total observed in the last
+    fit year with the projected Government flows. Private_Share is each
+    country's projected Private over the projected global total: every
+    country's Private plus the rest of the world, whose series is dropped
+    from the result. Paths of different series are combined index by index.
+    """
+    position = {label: i for i, label in enumerate(labels)}
+    paths = [projected[i] for i, label in enumerate(labels) if label[0] != REST_OF_WORLD]
+    names = [label for label in labels if label[0] != REST_OF_WORLD]
+
+    if 'Government_Cumulative' in panel.category_pos:
+        for country in panel.countries:
+            last = panel.value(country, end, 'Government_Cumulative')
+            if (country, 'Government') in position and np.isfinite(last):
+                flows = np.exp(projected[position[(country, 'Government')]].astype('float64'))
+                paths.append(np.log(last + np.cumsum(flows, axis=-1)))
+                names.append((country, 'Government_Cumulative'))
+
+    if (REST_OF_WORLD, 'Private') in position:
+        private = {country: np.exp(projected[i].astype('float64'))
+                   for (country, category), i in position.items() if category == 'Private'}
+        total = sum(private.values())
+        for country, values in private.items():
+            if country != REST_OF_WORLD:
+                paths.append(np.log(values / total * 100))
+                names.append((country, 'Private_Share'))
+
+    # Keep each country's categories together, in panel order
+    order = sorted(range(len(names)), key=lambda i: (panel.country_pos[names[i][0]],
+                                                     panel.category_pos[names[i][1]]))
+    return np.stack([paths[i] for i in order]).astype('float32'), [names[i] for i in order]
+
+
+def simulate(log_y, t, horizon_t, model, paths, seed=0, workers=None):
+    """paths bootstrap paths per series, in shards spread across a process pool
+
+    Shards get independent child seeds of `seed`, so results do not depend
+    on the number of workers. Workers read the series from shared memory.
+    """
+    counts = [min(SHARD_PATHS, paths - start) for start in range(0, paths, SHARD_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    tasks = [(log_y, t, horizon_t, model, count, child) for count, child in zip(counts, seeds)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        shards = [simulate_shard(*task) for task in tasks]
+    else:
+        with SharedStore() as store, ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            shared = store.publish(log_y)
+            shards = list(pool.map(simulate_shard, *zip(*[(shared, *task[1:]) for task in tasks])))
+    return np.concatenate(shards, axis=1)
+
+
+def bands_frame(projected, labels, model, years, confidence):
+    """Low / median / high projection per series and year as long rows"""
+    tail = (100 - confidence) / 2
+    low, median, high = np.exp(np.percentile(projected, [tail, 50, 100 - tail], axis=1))
+    rows = [{'Country': country, 'Category': category, 'Model': model, 'Year': year,
+             'Low': low[i, j], 'Median': median[i, j], 'High': high[i, j]}
+            for i, (country, category) in enumerate(labels) for j, year in enumerate(years)]
+    return pd.DataFrame(rows)
+
+
+def crossovers_frame(projected, labels, log_last, model, years, confidence):
+    """Per category, when the country trailing at the end of the fit window overtakes the leader
+
+    Paths of the two countries are paired index by index. Probability is
+    the share of paths crossing by the last horizon year; the crossover
+    year band is taken over those paths only.
+    """
+    tail = (100 - confidence) / 2
+    position = {label: i for i, label in enumerate(labels)}
+    countries = list(dict.fromkeys(country for country, _ in labels))
+    rows = []
+    for category in dict.fromkeys(category for _, category in labels):
+        present = [c for c in countries if (c, category) in position]
+        for n, first in enumerate(present):
+            for second in present[n + 1:]:
+                i, j = position[(first, category)], position[(second, category)]
+                leader, challenger = (i, j) if log_last[i] >= log_last[j] else (j, i)
+                ahead = projected[challenger] > projected[leader]  # (paths, horizon)
+                crossed = ahead.any(axis=1)
+                year = np.asarray(years)[ahead.argmax(axis=1)][crossed]
+
+                low, median, high = (np.percentile(year, [tail, 50, 100 - tail]) if crossed.any()
+                                     else (np.nan, np.nan, np.nan))
+                rows.append({'Category': category, 'Model': model, 'Leader': labels[leader][0],
+                             'Challenger': labels[challenger][0], 'Probability': crossed.mean(),
+                             'Year_Low': low, 'Year_Median': median, 'Year_High': high})
+    return pd.DataFrame(rows)
+
+
+def forecast_panel(panel, horizon=DEFAULT_HORIZON, models=MODELS, paths=20_000, confidence=90,
+                   seed=0, workers=None, fit_start=FIT_START, fit_end=FIT_END):
+    """Projection bands and crossover years for every series of a panel
+
+    Flow categories are fitted and projected; running totals and shares
+    are derived from the projected flows (see derived_paths). Returns
+    (bands, crossovers) DataFrames; see bands_frame and crossovers_frame.
+    Years run from fit_end + 1 to horizon.
+    """
+    with stage('forecast_prepare', 'transform'):
+        log_y, labels = series_matrix(panel, fit_start, fit_end)
+        # Centre time on the fit window so the intercept and slope are well conditioned
+        origin = (fit_start + fit_end) / 2
+        t = np.arange(fit_start, fit_end + 1) - origin
+        years = list(range(fit_end + 1, horizon + 1))
+        horizon_t = np.array(years) - origin
+
+    bands, crossovers = [], []
+    for n, model in enumerate(models):
+        with stage(f'forecast_{model}', 'metrics'):
+            projected = simulate(log_y, t, horizon_t, model, paths, seed + n, workers)
+            projected, names = derived_paths(panel, projected, labels, fit_end)
+            log_last = np.log([panel.value(country, fit_end, category) for country, category in names])
+            bands.append(bands_frame(projected, names, model, years, confidence))
+            crossovers.append(crossovers_frame(projected, names, log_last, model, years, confidence))
+    return pd.concat(bands, ignore_index=True), pd.concat(crossovers, ignore_index=True)
+
+
+def print_forecast(bands, crossovers, confidence):
+    """Print the horizon-year bands and the crossover table"""
+    horizon = bands['Year'].max()
+    print(f"=== PROJECTIONS FOR {horizon} ({confidence}% BANDS) ===\n")
+    print(f"{'Country':<8} {'Category':<24} {'Model':<10} {'Low':>12} {'Median':>12} {'High':>12}")
+    for row in bands[bands['Year'] == horizon].itertuples():
+        print(f"{row.Country:<8} {row.Category:<24} {row.Model:<10} "
+              f"{row.Low:>12,.0f} {row.Median:>12,.0f} {row.High:>12,.0f}")
+
+    print(f"\n=== CROSSOVERS BY {horizon} ===\n")
+    for row in crossovers.itertuples():
+        text = f"{row.Challenger} overtakes {row.Leader} in {row.Category} ({row.Model}): {row.Probability:.1%} of paths"
+        if row.Probability > 0:
+            text += f", median {row.Year_Median:.0f} ({row.Year_Low:.0f}-{row.Year_High:.0f})"
+        print(text)
+
+
+def main(argv=None):
+    """Fit trend models to the patent and funding panels and print projections"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', choices=['patents', 'funding'], default='patents')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='last projected year')
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--paths', type=int, default=20_000, help='bootstrap paths per series and model')
+    parser.add_argument('--confidence', type=float, default=90, help='band width in percent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    from data_access import load_funding_tables, load_patent_tables
+    from metrics import build_panel
+
+    if args.dataset == 'patents':
+        panel = build_panel(patents=load_patent_tables())
+    else:
+        panel = build_panel(funding=load_funding_tables())
+
+    start = time.perf_counter()
+    fit_start, fit_end = FIT_WINDOWS[args.dataset]
+    bands, crossovers = forecast_panel(panel, args.horizon, args.models, args.paths, args.confidence,
+                                       args.seed, args.workers, fit_start, fit_end)
+    elapsed = time.perf_counter() - start
+
+    print_forecast(bands, crossovers, args.confidence)
+    n_series = len(series_matrix(panel, fit_start, fit_end)[1])
+    print(f"\n{n_series * len(args.models) * args.paths:,} paths simulated in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,216 +4,298 @@ Quantum Technology Funding Comparison Analysis
 Analyzes government and private sector funding patterns US vs China (2014-2024)
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
+import argparse
 from pathlib import Path
 
+import numpy as np
+
+from build_manifest import is_up_to_date, mark_built
+from chart_spec import FigureSpec, PanelSpec, build_figure
+from data_access import load_funding_tables
+from instrumentation import stage
+from memo import memoize
+from metrics import build_panel
+from plotting import (DEFAULT_FORMATS, EXPORT_FORMATS, OUTPUT_MODES, country_style, export_path, figure_params,
+                      finish_figure, in_memory, pyplot, set_output_mode)
+from uncertainty import funding_figures, funding_statistics, interval_text, intervals
+
 def load_funding_data():
     """Load funding data from CSV files"""
-    data_dir = Path(__file__).parent.parent / "data" / "funding"
-    
-    gov_data = pd.read_csv(data_dir / "government-investment-comparison.csv")
-    private_data = pd.read_csv(data_dir / "private-sector-funding.csv")
-    
-    return gov_data, private_data
+    return load_funding_tables()
+
+# Panels of the comprehensive funding figure, in grid order
+FUNDING_PANELS = {
+    'annual_government': PanelSpec('line', 'Annual Government Investment', 'Year', 'Investment (Millions USD)',
+                                   category='Government', label='{country} Government', style={'linewidth': 3}),
+    'cumulative_government': PanelSpec('line', 'Cumulative Government Investment', 'Year',
+                                       'Cumulative Investment (Millions USD)', category='Government_Cumulative',
+                                       label='{country} Cumulative', style={'linewidth': 3}),
+    'annual_private': PanelSpec('line', 'Annual Private Sector Investment', 'Year', 'Investment (Millions USD)',
+                                category='Private', label='{country} Private', style={'linewidth': 3}),
+    'total_comparison': PanelSpec('bar', 'Total Investment Comparison (2014-2024)', 'Investment Type',
+                                  'Investment (Millions USD)',
+                                  categories=['Government_Cumulative', 'Private', ('Government_Cumulative', 'Private')],
+                                  ticklabels=['Government', 'Private', 'Total'], style={'alpha': 0.7}),
+    'government_growth': PanelSpec('line', 'Government Investment Growth Rate', 'Year', 'Year-over-Year Growth (%)',
+                                   category='Government', transform='yoy', label='{country} Gov Growth %',
+                                   style={'linewidth': 3}, hline=0),
+    'private_share': PanelSpec('line', 'Share of Global Private Quantum Investment', 'Year',
+                               'Share of Global Investment (%)', category='Private_Share', label='{country} Share',
+                               style={'linewidth': 3}),
+}
+
+ANALYSIS_FIGURE = FigureSpec('US vs China Quantum Technology Funding Analysis (2014-2024)', FUNDING_PANELS.values(),
+                             shape=(2, 3), figsize=(20, 12), style='seaborn-v0_8')
+
+@stage('funding_analysis_figure', 'figure')
+def build_funding_analysis_figure(gov_data, private_data):
+    """Build the 2x3 funding analysis figure without saving it"""
+    return build_figure(ANALYSIS_FIGURE, build_panel(funding=(gov_data, private_data)))
 
-def create_funding_analysis_plots(gov_data, private_data):
+def build_funding_panel_figure(gov_data, private_data, panel):
+    """Build a single panel of the funding analysis as its own figure"""
+    spec = FigureSpec(None, [FUNDING_PANELS[panel]], figsize=(20/3, 6), style='seaborn-v0_8')
+    return build_figure(spec, build_panel(funding=(gov_data, private_data)))
+
+def create_funding_analysis_plots(gov_data, private_data, force=False, formats=DEFAULT_FORMATS):
     """Create comprehensive funding analysis visualizations"""
     
-    plt.style.use('seaborn-v0_8')
-    fig, axes = plt.subplots(2, 3, figsize=(20, 12))
-    fig.suptitle('US vs China Quantum Technology Funding Analysis (2014-2024)', fontsize=16, fontweight='bold')
-    
-    # Plot 1: Annual Government Investment
-    axes[0, 0].plot(gov_data['Year'], gov_data['US_Government_Millions'], 'b-o', label='US Government', linewidth=3)
-    axes[0, 0].plot(gov_data['Year'], gov_data['China_Government_Millions'], 'r-s', label='China Government', linewidth=3)
-    axes[0, 0].set_title('Annual Government Investment')
-    axes[0, 0].set_xlabel('Year')
-    axes[0, 0].set_ylabel('Investment (Millions USD)')
-    axes[0, 0].legend()
-    axes[0, 0].grid(True, alpha=0.3)
-    
-    # Plot 2: Cumulative Government Investment
-    axes[0, 1].plot(gov_data['Year'], gov_data['US_Cumulative_Millions'], 'b-o', label='US Cumulative', linewidth=3)
-    axes[0, 1].plot(gov_data['Year'], gov_data['China_Cumulative_Millions'], 'r-s', label='China Cumulative', linewidth=3)
-    axes[0, 1].set_title('Cumulative Government Investment')
-    axes[0, 1].set_xlabel('Year')
-    axes[0, 1].set_ylabel('Cumulative Investment (Millions USD)')
-    axes[0, 1].legend()
-    axes[0, 1].grid(True, alpha=0.3)
-    
-    # Plot 3: Annual Private Investment
-    axes[0, 2].plot(private_data['Year'], private_data['US_Private_Millions'], 'b-o', label='US Private', linewidth=3)
-    axes[0, 2].plot(private_data['Year'], private_data['China_Private_Millions'], 'r-s', label='China Private', linewidth=3)
-    axes[0, 2].set_title('Annual Private Sector Investment')
-    axes[0, 2].set_xlabel('Year')
-    axes[0, 2].set_ylabel('Investment (Millions USD)')
-    axes[0, 2].legend()
-    axes[0, 2].grid(True, alpha=0.3)
-    
-    # Plot 4: Total Investment Comparison (2024)
-    categories = ['Government', 'Private', 'Total']
-    us_final = [gov_data['US_Cumulative_Millions'].iloc[-1], 
-               private_data['US_Private_Millions'].iloc[-1],
-               gov_data['US_Cumulative_Millions'].iloc[-1] + private_data['US_Private_Millions'].iloc[-1]]
-    china_final = [gov_data['China_Cumulative_Millions'].iloc[-1],
-                  private_data['China_Private_Millions'].iloc[-1], 
-                  gov_data['China_Cumulative_Millions'].iloc[-1] + private_data['China_Private_Millions'].iloc[-1]]
-    
-    x = np.arange(len(categories))
-    width = 0.35
-    
-    axes[1, 0].bar(x - width/2, us_final, width, label='United States', color='blue', alpha=0.7)
-    axes[1, 0].bar(x + width/2, china_final, width, label='China', color='red', alpha=0.7)
-    axes[1, 0].set_title('Total Investment Comparison (2014-2024)')
-    axes[1, 0].set_xlabel('Investment Type')
-    axes[1, 0].set_ylabel('Investment (Millions USD)')
-    axes[1, 0].set_xticks(x)
-    axes[1, 0].set_xticklabels(categories)
-    axes[1, 0].legend()
-    axes[1, 0].grid(True, alpha=0.3)
-    
-    # Plot 5: Investment Growth Rate Comparison
-    us_gov_growth = gov_data['US_Government_Millions'].pct_change() * 100
-    china_gov_growth = gov_data['China_Government_Millions'].pct_change() * 100
-    
-    axes[1, 1].plot(gov_data['Year'][1:], us_gov_growth[1:], 'b-o', label='US Gov Growth %', linewidth=3)
-    axes[1, 1].plot(gov_data['Year'][1:], china_gov_growth[1:], 'r-s', label='China Gov Growth %', linewidth=3)
-    axes[1, 1].set_title('Government Investment Growth Rate')
-    axes[1, 1].set_xlabel('Year')
-    axes[1, 1].set_ylabel('Year-over-Year Growth (%)')
-    axes[1, 1].legend()
-    axes[1, 1].grid(True, alpha=0.3)
-    axes[1, 1].axhline(y=0, color='black', linestyle='--', alpha=0.5)
-    
-    # Plot 6: Private Sector Share of Global Investment
-    axes[1, 2].plot(private_data['Year'], private_data['US_Share_Percent'], 'b-o', label='US Share', linewidth=3)
-    axes[1, 2].plot(private_data['Year'], private_data['China_Share_Percent'], 'r-s', label='China Share', linewidth=3)
-    axes[1, 2].set_title('Share of Global Private Quantum Investment')
-    axes[1, 2].set_xlabel('Year')
-    axes[1, 2].set_ylabel('Share of Global Investment (%)')
-    axes[1, 2].legend()
-    axes[1, 2].grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    
-    # Save the plot
     output_dir = Path(__file__).parent / "visualizations"
-    output_dir.mkdir(exist_ok=True)
-    plt.savefig(output_dir / "funding_analysis_comprehensive.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    output_file = output_dir / "funding_analysis_comprehensive.png"
+    targets = [export_path(output_file, fmt) for fmt in formats]
+    chart_params = figure_params('build_funding_analysis_figure', formats)
+    
+    if not force and not in_memory() and is_up_to_date(targets, (gov_data, private_data), chart_params):
+        print(f"Chart up to date, skipping: {output_file.name}")
+        return targets[0]
+    
+    fig = build_funding_analysis_figure(gov_data, private_data)
+    
+    # Save the plot (or render it to a buffer in memory mode), then close it
+    with stage('save_funding_analysis', 'savefig'):
+        rendered = finish_figure(fig, output_file, formats)
+    if not in_memory():
+        mark_built(targets, (gov_data, private_data), chart_params)
+    return rendered
+
+@memoize
+def funding_metrics(gov_data, private_data, period='Y'):
+    """Totals, strategy split, CAGR and recent growth behind calculate_funding_metrics, as a dict"""
+    panel = build_panel(funding=(gov_data, private_data))
+    periodic = panel if period == 'Y' else build_panel(funding=(gov_data, private_data), freq=period)
+    final = panel.at_year(panel.years[-1])
+    combined = final['Government_Cumulative'] + final['Private']
+    
+    first_period, last_period = periodic.years[0], periodic.years[-1]
+    recent_start = periodic.years[-(2 * periodic.periods_per_year + 1)]
+    final_period = periodic.last_period(panel.years[-1])
+    
+    # Confidence intervals under reporting and estimation uncertainty
+    ci = intervals(periodic, funding_statistics(periodic, first_period, last_period, final_period))
+    
+    return {
+        'countries': panel.countries,
+        'final': final,
+        'combined': combined,
+        'strategy': final[['Government_Cumulative', 'Private']].div(combined, axis=0) * 100,
+        'first_period': first_period,
+        'last_period': last_period,
+        'cagr': periodic.cagr(first_period, last_period),
+        'figures': funding_figures(periodic, first_period, last_period, final_period),
+        'recent_start': recent_start,
+        'recent': periodic.growth(recent_start, last_period),
+        'ci': ci,
+    }
 
-def calculate_funding_metrics(gov_data, private_data):
-    """Calculate and display key funding metrics"""
+def print_leads(text, values, ci, ci_label):
+    """Print text once per other country, comparing it with the leader of values (a per-country Series)
+
+    text is a template over {leader}, {other}, {ratio}, {gap} and {ci}.
+    """
+    leader = values.idxmax()
+    for other in values.index.drop(leader):
+        interval = interval_text(ci.loc[f'{ci_label}_{other}'], suffix='x')
+        print("  " + text.format(leader=leader, other=other, ratio=values[leader] / values[other],
+                                 gap=values[leader] - values[other], ci=interval))
+
+@stage('funding_metrics', 'metrics')
+def calculate_funding_metrics(gov_data, private_data, period='Y'):
+    """Calculate and display key funding metrics
+
+    Totals are always annual; period ('Y', 'Q' or 'M') sets the resolution
+    of the growth and recent-trend figures. Every country in the funding
+    tables is listed, and each ratio compares the leader with the others.
+    """
     
     print("=== QUANTUM FUNDING ANALYSIS SUMMARY ===\n")
     
-    # Total investments
-    us_gov_total = gov_data['US_Cumulative_Millions'].iloc[-1]
-    china_gov_total = gov_data['China_Cumulative_Millions'].iloc[-1]
-    us_private_total = private_data['US_Private_Millions'].iloc[-1]
-    china_private_total = private_data['China_Private_Millions'].iloc[-1]
+    metrics = funding_metrics(gov_data, private_data, period)
+    figures = metrics['figures']
+    ci = metrics['ci']
     
+    # Total investments
     print("TOTAL INVESTMENT (2014-2024):")
-    print(f"  US Government: ${us_gov_total:,.0f} million")
-    print(f"  China Government: ${china_gov_total:,.0f} million") 
-    print(f"  Government Ratio: China leads by {china_gov_total/us_gov_total:.1f}x\n")
-    
-    print(f"  US Private Sector: ${us_private_total:,.0f} million")
-    print(f"  China Private Sector: ${china_private_total:,.0f} million")
-    print(f"  Private Ratio: US leads by {us_private_total/china_private_total:.1f}x\n")
+    for country, total in figures['government'].items():
+        print(f"  {country} Government: ${total:,.0f} million")
+    print_leads("Government Ratio: {leader} leads {other} by {ratio:.1f}x ({ci})", figures['government'],
+                ci, 'government_ratio')
+    print()
+    
+    for country, total in figures['private'].items():
+        print(f"  {country} Private Sector: ${total:,.0f} million")
+    print_leads("Private Ratio: {leader} leads {other} by {ratio:.1f}x ({ci})", figures['private'],
+                ci, 'private_ratio')
+    print()
     
     # Combined totals
-    us_total = us_gov_total + us_private_total
-    china_total = china_gov_total + china_private_total
-    
     print(f"COMBINED TOTAL INVESTMENT:")
-    print(f"  United States: ${us_total:,.0f} million")
-    print(f"  China: ${china_total:,.0f} million")
-    print(f"  China leads overall by ${china_total - us_total:,.0f} million ({china_total/us_total:.1f}x)\n")
+    for country, total in figures['combined'].items():
+        print(f"  {country_style(country, metrics['countries'].index(country))['name']}: ${total:,.0f} million")
+    print_leads("{leader} leads {other} overall by ${gap:,.0f} million ({ratio:.1f}x, {ci})", figures['combined'],
+                ci, 'combined_ratio')
+    print()
     
     # Investment strategy analysis
-    us_gov_percent = us_gov_total / us_total * 100
-    us_private_percent = us_private_total / us_total * 100
-    china_gov_percent = china_gov_total / china_total * 100
-    china_private_percent = china_private_total / china_total * 100
+    strategy = metrics['strategy'].dropna()
     
     print("INVESTMENT STRATEGY COMPARISON:")
-    print(f"  US: {us_gov_percent:.1f}% government, {us_private_percent:.1f}% private")
-    print(f"  China: {china_gov_percent:.1f}% government, {china_private_percent:.1f}% private\n")
+    for country in strategy.index:
+        print(f"  {country}: {strategy.at[country, 'Government_Cumulative']:.1f}% government, "
+              f"{strategy.at[country, 'Private']:.1f}% private")
+    print()
     
     # Growth rate analysis
-    us_gov_cagr = (gov_data['US_Government_Millions'].iloc[-1] / gov_data['US_Government_Millions'].iloc[0]) ** (1/10) - 1
-    china_gov_cagr = (gov_data['China_Government_Millions'].iloc[-1] / gov_data['China_Government_Millions'].iloc[0]) ** (1/10) - 1
-    
-    print("GOVERNMENT INVESTMENT GROWTH (CAGR 2014-2024):")
-    print(f"  US Government: {us_gov_cagr:.1%}")
-    print(f"  China Government: {china_gov_cagr:.1%}")
-    print(f"  China's growth rate is {china_gov_cagr/us_gov_cagr:.1f}x faster\n")
-    
-    # Recent trends (2022-2024)
-    us_recent_growth = (gov_data['US_Government_Millions'].iloc[-1] / gov_data['US_Government_Millions'].iloc[-3]) - 1
-    china_recent_growth = (gov_data['China_Government_Millions'].iloc[-1] / gov_data['China_Government_Millions'].iloc[-3]) - 1
-    
-    print("RECENT TRENDS (2022-2024):")
-    print(f"  US Government Growth: {us_recent_growth:.1%}")
-    print(f"  China Government Growth: {china_recent_growth:.1%}")
-    if us_recent_growth < 0:
-        print("  US showing decline in recent government investment")
-    if china_recent_growth > 0:
-        print("  China maintaining strong investment growth")
-
-def create_investment_strategy_comparison(gov_data, private_data):
-    """Create a pie chart comparison of investment strategies"""
-    
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
-    fig.suptitle('Investment Strategy Comparison: Government vs Private (2014-2024)', fontsize=14, fontweight='bold')
-    
-    # US Investment Breakdown
-    us_gov = gov_data['US_Cumulative_Millions'].iloc[-1]
-    us_private = private_data['US_Private_Millions'].iloc[-1] 
-    us_labels = ['Government\n$6.0B', 'Private Sector\n$3.3B']
-    us_sizes = [us_gov, us_private]
-    us_colors = ['lightblue', 'darkblue']
-    
-    ax1.pie(us_sizes, labels=us_labels, colors=us_colors, autopct='%1.1f%%', startangle=90)
-    ax1.set_title('United States\nTotal: $9.3B')
+    first_period, last_period = metrics['first_period'], metrics['last_period']
+    
+    print(f"GOVERNMENT INVESTMENT GROWTH (CAGR {first_period}-{last_period}):")
+    for country, cagr in figures['gov_cagr'].items():
+        print(f"  {country} Government: {cagr:.1%} ({interval_text(ci.loc[f'gov_cagr_{country}'], '.1%')})")
+    print_leads("{leader}'s growth rate is {ratio:.1f}x faster than {other} ({ci})", figures['gov_cagr'],
+                ci, 'gov_cagr_ratio')
+    print()
+    
+    # Recent trends (the last two years)
+    recent_start = metrics['recent_start']
+    recent = metrics['recent']['Government'].dropna()
+    
+    print(f"RECENT TRENDS ({recent_start}-{last_period}):")
+    for country, growth in recent.items():
+        print(f"  {country} Government Growth: {growth:.1%}")
+    for country, growth in recent.items():
+        if growth < 0:
+            print(f"  {country} showing decline in recent government investment")
+        elif growth > 0:
+            print(f"  {country} maintaining strong investment growth")
+
+def billions(millions):
+    """A figure in millions of USD as a chart label, e.g. $6.0B"""
+    return f"${millions / 1000:.1f}B"
+
+# Light (government) and dark (private) pie colors per country; other
+# countries get a tint and a shade of their line color
+STRATEGY_COLORS = {
+    'US': ('lightblue', 'darkblue'),
+    'China': ('lightcoral', 'darkred'),
+}
+
+# Pies per row of the strategy figure
+STRATEGY_COLUMNS = 3
+
+def strategy_colors(country, position):
+    """(government, private) pie colors of a country"""
+    if country in STRATEGY_COLORS:
+        return STRATEGY_COLORS[country]
+    from matplotlib.colors import to_rgb
+    rgb = to_rgb(country_style(country, position)['color'])
+    return tuple(1 - 0.45 * (1 - c) for c in rgb), tuple(0.6 * c for c in rgb)
+
+@stage('investment_strategy_figure', 'figure')
+def build_investment_strategy_figure(gov_data, private_data):
+    """Build the investment strategy pie charts, one per country, without saving them"""
     
-    # China Investment Breakdown
-    china_gov = gov_data['China_Cumulative_Millions'].iloc[-1]
-    china_private = private_data['China_Private_Millions'].iloc[-1]
-    china_labels = ['Government\n$15.6B', 'Private Sector\n$0.5B']
-    china_sizes = [china_gov, china_private]
-    china_colors = ['lightcoral', 'darkred']
+    panel = build_panel(funding=(gov_data, private_data))
+    final = panel.at_year(panel.years[-1])
+    columns = min(len(panel.countries), STRATEGY_COLUMNS)
+    rows = -(-len(panel.countries) // columns)
     
-    ax2.pie(china_sizes, labels=china_labels, colors=china_colors, autopct='%1.1f%%', startangle=90)
-    ax2.set_title('China\nTotal: $16.1B')
+    plt = pyplot()
+    fig, axes = plt.subplots(rows, columns, figsize=(6 * columns, 6 * rows), squeeze=False)
+    fig.suptitle('Investment Strategy Comparison: Government vs Private (2014-2024)', fontsize=14, fontweight='bold')
+    axes = list(axes.flat)
+    
+    # One government / private breakdown per country; missing parts are left out
+    for position, (country, ax) in enumerate(zip(panel.countries, axes)):
+        gov, private = final.at[country, 'Government_Cumulative'], final.at[country, 'Private']
+        gov_color, private_color = strategy_colors(country, position)
+        parts = [(f'Government\n{billions(gov)}', gov, gov_color),
+                 (f'Private Sector\n{billions(private)}', private, private_color)]
+        parts = [part for part in parts if not np.isnan(part[1])]
+        if not parts:
+            ax.axis('off')
+            continue
+        labels, sizes, colors = zip(*parts)
+        
+        ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
+        ax.set_title(f"{country_style(country, position)['name']}\nTotal: {billions(sum(sizes))}")
+    
+    for ax in axes[len(panel.countries):]:
+        ax.axis('off')
     
     plt.tight_layout()
+    return fig
+
+def create_investment_strategy_comparison(gov_data, private_data, force=False, formats=DEFAULT_FORMATS):
+    """Create a pie chart comparison of investment strategies"""
     
-    # Save the plot
     output_dir = Path(__file__).parent / "visualizations"
-    output_dir.mkdir(exist_ok=True)
-    plt.savefig(output_dir / "investment_strategy_comparison.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    output_file = output_dir / "investment_strategy_comparison.png"
+    targets = [export_path(output_file, fmt) for fmt in formats]
+    chart_params = figure_params('build_investment_strategy_figure', formats)
+    
+    if not force and not in_memory() and is_up_to_date(targets, (gov_data, private_data), chart_params):
+        print(f"Chart up to date, skipping: {output_file.name}")
+        return targets[0]
+    
+    fig = build_investment_strategy_figure(gov_data, private_data)
+    
+    # Save the plot (or render it to a buffer in memory mode), then close it
+    with stage('save_investment_strategy', 'savefig'):
+        rendered = finish_figure(fig, output_file, formats)
+    if not in_memory():
+        mark_built(targets, (gov_data, private_data), chart_params)
+    return rendered
 
-def main():
+def main(argv=None):
     """Main analysis function"""
+    parser = argparse.ArgumentParser(description="US vs China quantum funding comparison")
+    parser.add_argument('--stats-only', action='store_true',
+                        help='print funding metrics without loading the plotting stack')
+    parser.add_argument('--output-mode', choices=[m for m in OUTPUT_MODES if m != 'memory'],
+                        help='batch saves charts headlessly; interactive also shows them '
+                             '(default: interactive only when a display is available)')
+    parser.add_argument('--formats', nargs='+', choices=list(EXPORT_FORMATS), default=list(DEFAULT_FORMATS),
+                        help='export targets per chart: png (300 dpi), preview (80 dpi), svg, pdf')
+    args = parser.parse_args(argv)
+    if args.output_mode:
+        set_output_mode(args.output_mode)
+    
     print("Loading funding data...")
     gov_data, private_data = load_funding_data()
     
-    print("Creating funding analysis plots...")
-    create_funding_analysis_plots(gov_data, private_data)
-    
-    print("Creating investment strategy comparison...")
-    create_investment_strategy_comparison(gov_data, private_data)
+    if not args.stats_only:
+        print("Creating funding analysis plots...")
+        create_funding_analysis_plots(gov_data, private_data, formats=args.formats)
+        
+        print("Creating investment strategy comparison...")
+        create_investment_strategy_comparison(gov_data, private_data, formats=args.formats)
     
     print("Calculating funding metrics...")
     calculate_funding_metrics(gov_data, private_data)
     
-    print("\nFunding analysis complete! Check the visualizations folder for charts.")
+    if args.stats_only:
+        print("\nFunding analysis complete!")
+    else:
+        print("\nFunding analysis complete! Check the visualizations folder for charts.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Pipeline Instrumentation
+Stage timers usable as decorators or context managers, with optional cProfile/tracemalloc and run reports
+"""
+
+import atexit
+import cProfile
+import csv
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import ContextDecorator
+from pathlib import Path
+
+# Kinds of work a stage can be; the summary breaks time down by these
+STAGE_KINDS = ['import', 'load', 'transform', 'metrics', 'figure', 'savefig']
+
+# Set by run_analysis.py so scripts run as subprocesses hand their records back
+REPORT_ENV = 'ANALYSIS_STAGE_REPORT'
+PROFILE_ENV = 'ANALYSIS_PROFILE'
+MEMORY_ENV = 'ANALYSIS_TRACE_MEMORY'
+
+CSV_FIELDS = ['script', 'stage', 'kind', 'seconds', 'self_seconds', 'peak_mb', 'ok']
+
+# Records kept per process, newest last; long-running processes (the analytics
+# service) record stages on every request, so the oldest are dropped past this
+MAX_RECORDS = 10000
+
+
+class Recorder:
+    """Collects finished stage records from every thread, up to MAX_RECORDS"""
+
+    def __init__(self):
+        self.records = deque(maxlen=MAX_RECORDS)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.open_frames = []
+        self.profiler = None
+        self.trace_memory = False
+
+    def stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def extend(self, records):
+        with self.lock:
+            self.records.extend(records)
+
+    def drain(self):
+        with self.lock:
+            records = list(self.records)
+            self.records.clear()
+        return records
+
+
+RECORDER = Recorder()
+
+
+class stage(ContextDecorator):
+    """Time a block or a function as one pipeline stage
+
+        with stage('save_patent_comparison', 'savefig'):
+            plt.savefig(...)
+
+        @stage('patent_growth', 'metrics')
+        def calculate_growth_rates(...): ...
+
+    Stages nest; each record carries its own wall time and its self time
+    (minus nested stages), so per-kind totals do not double count. With
+    memory tracing on, peak_mb is the traced peak above the stage's
+    starting allocation.
+    """
+
+    def __init__(self, name, kind):
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unknown stage kind {kind!r}; expected one of {STAGE_KINDS}")
+        self.name = name
+        self.kind = kind
+
+    def __enter__(self):
+        frame = {'start': time.perf_counter(), 'children': 0.0}
+        if RECORDER.trace_memory:
+            with RECORDER.lock:
+                current, peak = tracemalloc.get_traced_memory()
+                # Fold the peak so far into open stages before resetting it
+                for other in RECORDER.open_frames:
+                    other['peak'] = max(other['peak'], peak)
+                tracemalloc.reset_peak()
+                frame['base'] = frame['peak'] = current
+                RECORDER.open_frames.append(frame)
+        RECORDER.stack().append(frame)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = RECORDER.stack()
+        frame = stack.pop()
+        seconds = time.perf_counter() - frame['start']
+        if stack:
+            stack[-1]['children'] += seconds
+
+        record = {
+            'stage': self.name,
+            'kind': self.kind,
+            'seconds': seconds,
+            'self_seconds': seconds - frame['children'],
+            'ok': exc_type is None,
+        }
+        if 'base' in frame:
+            with RECORDER.lock:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                RECORDER.open_frames.remove(frame)
+                for other in RECORDER.open_frames:
+                    other['peak'] = max(other['peak'], peak)
+            record['peak_mb'] = (peak - frame['base']) / 2**20
+
+        RECORDER.add(record)
+        return False
+
+
+def configure(profile=False, trace_memory=False):
+    """Turn on cProfile and/or tracemalloc for the rest of the run
+
+    cProfile only sees the thread that called this, so profile with
+    --workers 1 (or the subprocess mode) for a complete picture.
+    """
+    if profile and RECORDER.profiler is None:
+        RECORDER.profiler = cProfile.Profile()
+        RECORDER.profiler.enable()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    RECORDER.trace_memory = RECORDER.trace_memory or trace_memory
+
+
+def records():
+    """Copy of the stage records collected so far"""
+    with RECORDER.lock:
+        return list(RECORDER.records)
+
+
+def drain():
+    """The stage records collected so far, removing them from this process
+
+    Pool workers hand these back with each task's result; the parent
+    adds them to its own with merge().
+    """
+    return RECORDER.drain()
+
+
+def merge(stage_records):
+    """Add stage records collected in another process"""
+    RECORDER.extend(stage_records)
+
+
+def profile_summary(limit=20):
+    """Top functions by cumulative time from the cProfile run, if one is active"""
+    if RECORDER.profiler is None:
+        return []
+    RECORDER.profiler.disable()
+    stats = pstats.Stats(RECORDER.profiler)
+    RECORDER.profiler.enable()
+
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({'function': f"{Path(filename).name}:{line}({function})",
+                     'calls': calls, 'tottime': tottime, 'cumtime': cumtime})
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:limit]
+
+
+def summarize(stage_records):
+    """Aggregate records by stage, and self time by kind"""
+    by_stage = {}
+    for record in stage_records:
+        key = (record.get('script', ''), record['stage'], record['kind'])
+        entry = by_stage.setdefault(key, {'calls': 0, 'seconds': 0.0, 'peak_mb': None})
+        entry['calls'] += 1
+        entry['seconds'] += record['seconds']
+        if record.get('peak_mb') is not None:
+            entry['peak_mb'] = max(entry['peak_mb'] or 0.0, record['peak_mb'])
+
+    by_kind = dict.fromkeys(STAGE_KINDS, 0.0)
+    for record in stage_records:
+        by_kind[record['kind']] += record['self_seconds']
+    return by_stage, by_kind
+
+
+def print_summary(stage_records, total_seconds=None):
+    """Print per-stage times and where the time went by kind"""
+    by_stage, by_kind = summarize(stage_records)
+
+    print(f"\n{'='*60}")
+    print("STAGE TIMINGS")
+    print('='*60)
+    current_script = None
+    for (script, name, kind), entry in by_stage.items():
+        if script and script != current_script:
+            print(f"  {script}")
+            current_script = script
+        peak = f" {entry['peak_mb']:8.1f}MB" if entry['peak_mb'] is not None else ''
+        print(f"    {name:<30} {kind:<10} {entry['calls']:>3}x {entry['seconds']:8.3f}s{peak}")
+
+    accounted = sum(by_kind.values())
+    print("\n  Self time by kind:")
+    for kind, seconds in by_kind.items():
+        share = seconds / accounted if accounted else 0.0
+        print(f"    {kind:<30} {seconds:8.3f}s {share:7.1%}")
+    if total_seconds is not None:
+        print(f"    {'total (wall)':<30} {total_seconds:8.3f}s")
+
+
+def write_report(path, stage_records, profile=None, extra=None):
+    """Write the run report as CSV (stage rows) or JSON (stages, profile and metadata)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.suffix == '.csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(stage_records)
+        return path
+
+    report = dict(extra or {})
+    report['stages'] = stage_records
+    if profile:
+        report['profile'] = profile
+    path.write_text(json.dumps(report, indent=2, default=str))
+    return path
+
+
+def read_report(path):
+    """Stage records and profile rows from a JSON report"""
+    report = json.loads(Path(path).read_text())
+    return report.get('stages', []), report.get('profile', [])
+
+
+def dump_for_parent():
+    """atexit hook: write this process's records where run_analysis.py asked for them"""
+    write_report(os.environ[REPORT_ENV], records(), profile_summary())
+
+
+if os.environ.get(REPORT_ENV):
+    configure(profile=bool(os.environ.get(PROFILE_ENV)), trace_memory=bool(os.environ.get(MEMORY_ENV)))
+    atexit.register(dump_for_parent)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Result Memoization
+Two-tier (in-process LRU + size-bounded on-disk) cache for metric and chart computations
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from build_manifest import code_version, hash_inputs
+
+ANALYSIS_DIR = Path(__file__).parent
+MEMO_DIR = ANALYSIS_DIR.parent / "data" / ".cache" / "memo"
+
+# Set to 'off' to bypass memoization, or 'memory' to skip the disk tier
+MEMO_ENV = 'ANALYSIS_MEMO'
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# Argument types whose repr is a stable description of their value
+PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+class LRUCache:
+    """Least-recently-used result cache with hit/miss counts"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+class DiskCache:
+    """Pickled results under one directory, evicting least recently used files past max_bytes"""
+
+    def __init__(self, directory=MEMO_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used for eviction
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used files until the directory fits in max_bytes"""
+        files = []
+        for path in self.directory.glob('*.pkl'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path in self.directory.glob('*.pkl'):
+            path.unlink(missing_ok=True)
+
+    def stats(self):
+        files = list(self.directory.glob('*.pkl')) if self.directory.exists() else []
+        return {'files': len(files), 'bytes': sum(path.stat().st_size for path in files),
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+def function_id(func):
+    """Stable name of a function, the same whether its script was run or imported"""
+    func = getattr(func, '__wrapped__', func)
+    code = getattr(func, '__code__', None)
+    filename = Path(code.co_filename).name if code else getattr(func, '__module__', '')
+    return f"{filename}:{getattr(func, '__qualname__', repr(func))}"
+
+
+def describe(value, digest):
+    """Feed an argument into the key; False if its value cannot be described stably"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(b'frame:' + hash_inputs([value]).encode())
+    elif isinstance(value, PLAIN_TYPES):
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
+    elif isinstance(value, (tuple, list)):
+        digest.update(f"{type(value).__name__}[{len(value)}]".encode())
+        return all(describe(item, digest) for item in value)
+    elif isinstance(value, dict):
+        digest.update(f"dict[{len(value)}]".encode())
+        return all(describe(k, digest) and describe(v, digest) for k, v in sorted(value.items(), key=lambda kv: repr(kv[0])))
+    elif callable(value):
+        digest.update(b'func:' + function_id(value).encode())
+    else:
+        return False
+    return True
+
+
+def memo_key(func, args, kwargs):
+    """Key over (code version, function, dataset hashes and other arguments); None if uncacheable"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(code_version().encode())
+    digest.update(function_id(func).encode())
+    if not describe(args, digest) or not describe(kwargs, digest):
+        return None
+    return digest.hexdigest()
+
+
+class Memo:
+    """The in-process LRU tier in front of the disk tier"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, directory=MEMO_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskCache(directory, max_bytes)
+        self.lock = threading.Lock()
+
+    def mode(self):
+        return os.environ.get(MEMO_ENV, 'on')
+
+    def call(self, func, args, kwargs):
+        mode = self.mode()
+        key = memo_key(func, args, kwargs) if mode != 'off' else None
+        if key is None:
+            return func(*args, **kwargs)
+
+        with self.lock:
+            value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if mode != 'memory':
+            value = self.disk.get(key)
+        if value is None:
+            value = func(*args, **kwargs)
+            if mode != 'memory':
+                self.disk.put(key, value)
+
+        with self.lock:
+            self.memory.put(key, value)
+        return value
+
+    def clear(self, disk=True):
+        with self.lock:
+            self.memory.clear()
+        if disk:
+            self.disk.clear()
+
+    def stats(self):
+        with self.lock:
+            memory = self.memory.stats()
+        return {'memory': memory, 'disk': self.disk.stats()}
+
+
+MEMO = Memo()
+
+
+def memoize(func):
+    """Cache a pure function's results on (dataset hash, function, arguments)
+
+    Results are shared between callers, so treat them as read-only.
+    Calls with arguments that cannot be hashed by value run uncached.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return MEMO.call(func, args, kwargs)
+    return wrapper
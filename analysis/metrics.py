@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Shared Metrics Engine
+Year x Country x Category panel with vectorized CAGR, growth, ratio and share metrics
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from memo import memoize
+from periods import PERIODS_PER_YEAR, resample
+
+# Countries listed first in every panel, in this order; any other country
+# in the data follows in order of appearance
+COUNTRIES = ['US', 'China']
+
+PATENT_CATEGORIES = ['Total_Patents', 'Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']
+
+# Panel category -> per-country column template in the funding CSVs
+FUNDING_COLUMNS = {
+    'Government': '{country}_Government_Millions',
+    'Government_Cumulative': '{country}_Cumulative_Millions',
+    'Private': '{country}_Private_Millions',
+    'Private_Share': '{country}_Share_Percent',
+}
+
+
+class Panel:
+    """Dense (period, country, category) array with label lookups
+
+    Every metric is computed over the whole country x category grid in one
+    array operation and returned as a DataFrame indexed by country, so a
+    single figure is an O(1) .at[country, category] lookup. Annual panels
+    are labelled by year integers, finer ones ('Q', 'M') by pd.Period.
+    """
+
+    def __init__(self, values, years, countries, categories, freq='Y'):
+        self.values = np.asarray(values, dtype='float64')
+        self.freq = freq
+        self.years = np.array([self.label(year) for year in years], dtype=object if freq != 'Y' else None)
+        self.countries = list(countries)
+        self.categories = list(categories)
+        self.year_pos = {year: i for i, year in enumerate(self.years)}
+        self.country_pos = {country: i for i, country in enumerate(self.countries)}
+        self.category_pos = {category: i for i, category in enumerate(self.categories)}
+
+    @property
+    def periods_per_year(self):
+        return PERIODS_PER_YEAR[self.freq]
+
+    def label(self, period):
+        """Normalize a period given as int, string or pd.Period to this panel's labels"""
+        if self.freq == 'Y':
+            return int(period.year if isinstance(period, pd.Period) else period)
+        return pd.Period(period, freq=self.freq)
+
+    def first_period(self, year):
+        """Earliest period of a calendar year present in the panel"""
+        return min(p for p in self.years if (p if self.freq == 'Y' else p.year) == year)
+
+    def last_period(self, year):
+        """Latest period of a calendar year present in the panel"""
+        return max(p for p in self.years if (p if self.freq == 'Y' else p.year) == year)
+
+    def years_between(self, start, end):
+        """Elapsed time between two periods, in years"""
+        if self.freq == 'Y':
+            return self.label(end) - self.label(start)
+        return (self.label(end) - self.label(start)).n / self.periods_per_year
+
+    def year_index(self, years):
+        """Positions of one or more periods along the first axis"""
+        if np.ndim(years) == 0:
+            return self.year_pos[self.label(years)]
+        return np.array([self.year_pos[self.label(year)] for year in years])
+
+    def value(self, country, year, category):
+        """One cell by labels, via dictionary lookups rather than a column scan"""
+        return self.values[self.year_pos[self.label(year)], self.country_pos[country], self.category_pos[category]]
+
+    def row(self, country, year, categories=None):
+        """A country's values for one period, restricted to categories if given"""
+        values = self.values[self.year_pos[self.label(year)], self.country_pos[country]]
+        if categories is None:
+            return pd.Series(values, index=self.categories)
+        return pd.Series(values[[self.category_pos[c] for c in categories]], index=list(categories))
+
+    def series(self, category, countries=None):
+        """(period, country) values of one category, for all countries or those given"""
+        values = self.values[:, :, self.category_pos[category]]
+        if countries is None:
+            return values
+        return values[:, [self.country_pos[c] for c in countries]]
+
+    def rank(self, year, category, top=None):
+        """Countries ordered by one category's value in one period, largest first; missing values dropped"""
+        ranked = (pd.Series(self.values[self.year_index(year), :, self.category_pos[category]], index=self.countries)
+                  .dropna()
+                  .sort_values(ascending=False, kind='stable'))
+        return ranked if top is None else ranked.head(top)
+
+    def frame(self, values):
+        """Wrap a (country, category) array as a labelled DataFrame"""
+        return pd.DataFrame(values, index=self.countries, columns=self.categories)
+
+    def at_year(self, year):
+        """All values for one year"""
+        return self.frame(self.values[self.year_index(year)])
+
+    def growth(self, start, end):
+        """Total growth between two periods (0.5 == +50%)"""
+        return self.frame(self.values[self.year_index(end)] / self.values[self.year_index(start)] - 1)
+
+    def cagr(self, start, end):
+        """Compound annual growth rate between two periods, annualized for sub-annual panels"""
+        ratio = self.values[self.year_index(end)] / self.values[self.year_index(start)]
+        return self.frame(ratio ** (1 / self.years_between(start, end)) - 1)
+
+    def cagr_windows(self, windows):
+        """CAGR for many (start, end) windows at once, as a (window, country, category) array"""
+        starts, ends = zip(*windows)
+        ratio = self.values[self.year_index(ends)] / self.values[self.year_index(starts)]
+        years = np.array([self.years_between(start, end) for start, end in windows])
+        return ratio ** (1 / years)[:, None, None] - 1
+
+    def yoy(self):
+        """Year-over-year growth as a (period, country, category) array; the first year is NaN
+
+        Sub-annual panels compare each period with the same period a year earlier.
+        """
+        lag = self.periods_per_year
+        growth = np.full_like(self.values, np.nan)
+        growth[lag:] = self.values[lag:] / self.values[:-lag] - 1
+        return growth
+
+    def ratio(self, year, leader, follower):
+        """leader / follower for every category in one period"""
+        row = self.values[self.year_index(year)]
+        return pd.Series(row[self.country_pos[leader]] / row[self.country_pos[follower]],
+                         index=self.categories)
+
+    def shares(self, year, parts, whole):
+        """Each part category's share of a whole (sum of its parts by default) for one period"""
+        row = self.at_year(year)
+        total = row[whole] if whole in row else row[parts].sum(axis=1)
+        return row[parts].div(total, axis=0)
+
+
+def country_tables(tables):
+    """{country: table} from a {country: table} mapping or a (us_data, china_data) pair"""
+    if isinstance(tables, dict):
+        return tables
+    return dict(zip(COUNTRIES, tables))
+
+
+def patent_long(tables, freq='Y'):
+    """Long (Period, Country, Category, Value) rows from the per-country patent tables
+
+    tables is a {country: table} mapping, or the (us_data, china_data) pair.
+    """
+    frames = {country: resample(data, freq)[['Period'] + PATENT_CATEGORIES]
+              for country, data in country_tables(tables).items()}
+    wide = pd.concat(frames, names=['Country']).reset_index(level='Country')
+    return wide.melt(id_vars=['Period', 'Country'], value_vars=PATENT_CATEGORIES,
+                     var_name='Category', value_name='Value')
+
+
+def funding_columns(columns):
+    """{column: (country, category)} for every column matching a FUNDING_COLUMNS template
+
+    Countries are read off the column names, so a table gains a country by
+    gaining its columns (e.g. EU_Government_Millions).
+    """
+    suffixes = {template.format(country=''): category for category, template in FUNDING_COLUMNS.items()}
+    matched = {}
+    for column in columns:
+        for suffix, category in suffixes.items():
+            if column.endswith(suffix) and len(column) > len(suffix):
+                matched[column] = (column[:-len(suffix)], category)
+    order = list(FUNDING_COLUMNS)
+    return dict(sorted(matched.items(), key=lambda item: order.index(item[1][1])))
+
+
+def funding_long(gov_data, private_data, freq='Y'):
+    """Long (Period, Country, Category, Value) rows from the wide funding tables"""
+    funding = resample(gov_data, freq).merge(resample(private_data, freq).drop(columns='Year'),
+                                             on='Period', how='outer')
+    columns = funding_columns(funding.columns)
+    long = funding.melt(id_vars='Period', value_vars=list(columns), var_name='Column', value_name='Value')
+    labels = pd.DataFrame(list(columns.values()), index=list(columns), columns=['Country', 'Category'])
+    long[['Country', 'Category']] = labels.loc[long['Column']].to_numpy()
+    return long.drop(columns='Column')
+
+
+def long_countries(long):
+    """Countries of long rows: COUNTRIES first, then the rest in order of appearance"""
+    present = list(dict.fromkeys(long['Country']))
+    return [c for c in COUNTRIES if c in present] + [c for c in present if c not in COUNTRIES]
+
+
+def panel_from_long(long, freq='Y'):
+    """Pivot long rows into a Panel, filling missing cells with NaN"""
+    years = sorted(long['Period'].unique())
+    countries = long_countries(long)
+    categories = list(dict.fromkeys(long['Category']))
+
+    full_index = pd.MultiIndex.from_product([years, countries, categories], names=['Period', 'Country', 'Category'])
+    values = (long.set_index(['Period', 'Country', 'Category'])['Value']
+              .astype('float64')
+              .reindex(full_index)
+              .to_numpy()
+              .reshape(len(years), len(countries), len(categories)))
+    return Panel(values, years, countries, categories, freq)
+
+
+def build_long(patents=None, funding=None, freq='Y'):
+    """Long (Period, Country, Category, Value) rows over any of the patent and funding tables"""
+    parts = []
+    if patents is not None:
+        parts.append(patent_long(patents, freq=freq))
+    if funding is not None:
+        parts.append(funding_long(*funding, freq=freq))
+    return pd.concat(parts, ignore_index=True)
+
+
+@stage('build_panel', 'transform')
+@memoize
+def build_panel(patents=None, funding=None, freq='Y'):
+    """One panel over any of the patent tables and (gov_data, private_data)
+
+    patents is a {country: table} mapping or the (us_data, china_data)
+    pair; funding countries are read off the column names. Tables are
+    resampled to `freq` ('Y', 'Q' or 'M') first, so annual CSVs and
+    timestamped records can be mixed as long as they are at least that fine.
+    """
+    return panel_from_long(build_long(patents, funding, freq), freq)
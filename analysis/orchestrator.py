@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+In-Process Analysis Orchestrator
+Runs the analysis suite as a dependency graph of steps in a single interpreter
+"""
+
+import importlib.util
+import io
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import instrumentation
+from plotting import output_mode, pyplot, set_output_mode
+from shared_data import SharedStore, attach
+
+ANALYSIS_DIR = Path(__file__).parent
+
+# pyplot keeps global state, so chart steps never overlap within one process
+PYPLOT_LOCK = threading.Lock()
+
+# A script is registered in sys.modules before it finishes executing, so
+# threads importing steps' scripts take turns
+IMPORT_LOCK = threading.RLock()
+
+
+class Step:
+    """One node of the analysis graph: a function in an analysis script plus the steps it reads
+
+    The function is named rather than passed so steps can be sent to
+    worker processes however they were started; scripts with hyphens in
+    their names are only importable through import_script.
+    """
+
+    def __init__(self, name, script, func, deps=(), uses_pyplot=False):
+        self.name = name
+        self.script = script
+        self.func = func
+        self.deps = tuple(deps)
+        self.uses_pyplot = uses_pyplot
+
+
+class StepOutput(io.TextIOBase):
+    """sys.stdout stand-in that routes each thread's prints to its own buffer"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def import_script(filename):
+    """Import an analysis script as a module, even if its name has hyphens"""
+    module_name = Path(filename).stem.replace('-', '_')
+    with IMPORT_LOCK:
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+
+        spec = importlib.util.spec_from_file_location(module_name, ANALYSIS_DIR / filename)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        return module
+
+
+def build_steps(stats_only=False):
+    """The default suite: load → metrics → charts, without the charts if stats_only"""
+    patents = "patent-trends-analysis.py"
+    funding = "funding-comparison.py"
+
+    steps = [
+        Step('load_patents', "data_access.py", 'load_patent_tables'),
+        Step('load_funding', "data_access.py", 'load_funding_tables'),
+        Step('patent_growth', patents, 'calculate_growth_rates', ['load_patents']),
+        Step('funding_metrics', funding, 'calculate_funding_metrics', ['load_funding']),
+        Step('patent_charts', patents, 'create_comparison_plots', ['load_patents'], uses_pyplot=True),
+        Step('funding_charts', funding, 'create_funding_analysis_plots', ['load_funding'], uses_pyplot=True),
+        Step('strategy_chart', funding, 'create_investment_strategy_comparison', ['load_funding'], uses_pyplot=True),
+    ]
+    if stats_only:
+        return [step for step in steps if not step.uses_pyplot]
+    return steps
+
+
+def step_function(script, func):
+    """The function a step names, importing its script on first use"""
+    return getattr(import_script(script), func)
+
+
+def init_worker(mode, trace_memory):
+    """Give a pool worker the parent's output mode and memory tracing
+
+    Spawned workers start from the defaults, and forked ones would hand
+    back the parent's stage records as their own, so those are dropped.
+    """
+    set_output_mode(mode)
+    instrumentation.drain()
+    instrumentation.configure(trace_memory=trace_memory)
+
+
+def execute_step(script, func, args, uses_pyplot=False):
+    """Run a step function, capturing its output and wall time
+
+    The time excludes any wait for the pyplot lock. args may hold
+    shared-memory handles, which are attached before the call.
+    """
+    func = step_function(script, func)
+    args = attach(args)
+    buffer = io.StringIO()
+
+    if isinstance(sys.stdout, StepOutput):
+        sys.stdout.local.buffer = buffer
+        capture = None
+    else:
+        capture = redirect_stdout(buffer)
+        capture.__enter__()
+
+    try:
+        if uses_pyplot:
+            with PYPLOT_LOCK:
+                plt = pyplot('Agg')  # Charts are only saved, never shown, in batch runs
+                start = time.perf_counter()
+                result = func(*args)
+                plt.close('all')
+                seconds = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            result = func(*args)
+            seconds = time.perf_counter() - start
+    finally:
+        if capture is None:
+            sys.stdout.local.buffer = None
+        else:
+            capture.__exit__(None, None, None)
+
+    return result, buffer.getvalue(), seconds
+
+
+def execute_in_worker(script, func, args, uses_pyplot=False):
+    """execute_step in a pool worker, also returning the stage records the step made there"""
+    return (*execute_step(script, func, args, uses_pyplot), instrumentation.drain())
+
+
+def step_args(step, results):
+    """Positional arguments for a step from its dependencies' results"""
+    args = []
+    for dep in step.deps:
+        value = results[dep]
+        args.extend(value if isinstance(value, tuple) else (value,))
+    return args
+
+
+def run_graph(steps, workers=1, executor='thread', mp_context=None):
+    """Run steps in dependency order; independent steps share a pool
+
+    mp_context (e.g. multiprocessing.get_context('spawn')) selects how
+    process workers start; by default the platform's own method is used.
+    Returns {step name: {'output', 'seconds'}} in completion order.
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        missing = [dep for dep in step.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Step {step.name} depends on unknown steps: {missing}")
+
+    results, report = {}, {}
+    pending = list(steps)
+
+    def ready():
+        return [s for s in pending if all(dep in results for dep in s.deps)]
+
+    if workers <= 1:
+        while pending:
+            batch = ready()
+            if not batch:
+                raise ValueError(f"Dependency cycle among: {[s.name for s in pending]}")
+            for step in batch:
+                pending.remove(step)
+                result, output, seconds = execute_step(step.script, step.func, step_args(step, results),
+                                                       step.uses_pyplot)
+                results[step.name] = result
+                report[step.name] = {'output': output, 'seconds': seconds}
+        return report
+
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    original_stdout = sys.stdout
+    if pool_class is ThreadPoolExecutor:
+        sys.stdout = StepOutput(original_stdout)
+
+    # Worker processes get step inputs as shared-memory views rather than pickled copies.
+    # The steps without dependencies (the loads) run here first and their results are
+    # published before the pool starts
+    store = SharedStore()
+    try:
+        if pool_class is ProcessPoolExecutor:
+            for step in ready():
+                pending.remove(step)
+                result, output, seconds = execute_step(step.script, step.func, [], step.uses_pyplot)
+                results[step.name] = result
+                report[step.name] = {'output': output, 'seconds': seconds}
+                store.publish(result)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=init_worker,
+                                       initargs=(output_mode(), instrumentation.RECORDER.trace_memory))
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        with pool:
+            running = {}
+            while pending or running:
+                for step in ready():
+                    pending.remove(step)
+                    args = step_args(step, results)
+                    if pool_class is ProcessPoolExecutor:
+                        args = store.publish(args)
+                    task = execute_in_worker if pool_class is ProcessPoolExecutor else execute_step
+                    future = pool.submit(task, step.script, step.func, args, step.uses_pyplot)
+                    running[future] = step
+                if not running:
+                    raise ValueError(f"Dependency cycle among: {[s.name for s in pending]}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    if pool_class is ProcessPoolExecutor:
+                        result, output, seconds, stage_records = future.result()
+                        instrumentation.merge(stage_records)
+                    else:
+                        result, output, seconds = future.result()
+                    results[step.name] = result
+                    report[step.name] = {'output': output, 'seconds': seconds}
+    finally:
+        sys.stdout = original_stdout
+        store.close()
+
+    return report
+
+
+def print_timings(steps, report, total_seconds):
+    """Print per-step wall times"""
+    print(f"\n{'='*60}")
+    print("STEP TIMINGS")
+    print('='*60)
+    for step in steps:
+        print(f"  {step.name:<20} {report[step.name]['seconds']:8.3f}s")
+    print(f"  {'total (wall)':<20} {total_seconds:8.3f}s")
+
+
+def main(workers=1, executor='thread', stats_only=False, start_method=None):
+    """Run the whole suite in-process and report per-step timings"""
+    start = time.perf_counter()
+    set_output_mode('batch')
+    steps = build_steps(stats_only)
+    mp_context = multiprocessing.get_context(start_method) if start_method else None
+    report = run_graph(steps, workers=workers, executor=executor, mp_context=mp_context)
+
+    for step in steps:
+        if report[step.name]['output']:
+            print(f"\n{'='*60}")
+            print(f"{step.name}")
+            print('='*60)
+            print(report[step.name]['output'], end='')
+
+    print_timings(steps, report, time.perf_counter() - start)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -4,137 +4,162 @@ Quantum Technology Patent Trends Analysis
 Analyzes US vs China patent filing trends from 2014-2024
 """
 
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
 from pathlib import Path
 
-def load_patent_data():
-    """Load patent data from CSV files"""
-    data_dir = Path(__file__).parent.parent / "data" / "patents"
-    
-    us_data = pd.read_csv(data_dir / "us-quantum-patents-2014-2024.csv")
-    china_data = pd.read_csv(data_dir / "china-quantum-patents-2014-2024.csv")
-    
-    return us_data, china_data
+from build_manifest import is_up_to_date, mark_built
+from chart_spec import PATENT_CATEGORIES, FigureSpec, PanelSpec, build_figure
+from data_access import load_patent_tables
+from instrumentation import stage
+from memo import memoize
+from metrics import build_panel
+from plotting import (DEFAULT_FORMATS, EXPORT_FORMATS, OUTPUT_MODES, export_path, figure_params, finish_figure,
+                      in_memory, set_output_mode)
+from uncertainty import growth_statistics, interval_text, intervals, lead_statistics
+
+def load_patent_data(raw_dir=None):
+    """Load patent data from CSV files, or classify raw exports when raw_dir is given"""
+    if raw_dir is not None:
+        from patent_ingest import load_from_raw
+        return load_from_raw(raw_dir)
+
+    return load_patent_tables()
+
+# Panels of the comparison figure, in grid order
+PATENT_PANELS = {
+    'total_patents': PanelSpec('line', 'Total Patent Applications by Year', 'Year', 'Number of Patents',
+                               category='Total_Patents', style={'linewidth': 3}),
+    'category_breakdown': PanelSpec('bar', 'Patents by Technology Category ({year})', 'Technology Category',
+                                    'Number of Patents', categories=PATENT_CATEGORIES, year=2024,
+                                    style={'alpha': 0.7}),
+    'computing_trend': PanelSpec('line', 'Quantum {label} Patents', 'Year', 'Number of Patents',
+                                 category='Quantum_Computing', label='{country} {label}', style={'linewidth': 3}),
+    'communications_trend': PanelSpec('line', 'Quantum {label} Patents', 'Year', 'Number of Patents',
+                                      category='Quantum_Communications', label='{country} {label}',
+                                      style={'linewidth': 3}),
+}
+
+COMPARISON_FIGURE = FigureSpec('US vs China Quantum Technology Patents (2014-2024)', PATENT_PANELS.values(),
+                               shape=(2, 2), figsize=(15, 12), style='seaborn-v0_8')
+
+@stage('patent_comparison_figure', 'figure')
+def build_comparison_figure(us_data, china_data):
+    """Build the 2x2 patent comparison figure without saving it"""
+    return build_figure(COMPARISON_FIGURE, build_panel(patents=(us_data, china_data)))
 
-def create_comparison_plots(us_data, china_data):
+def build_patent_panel_figure(us_data, china_data, panel):
+    """Build a single panel of the comparison figure as its own figure"""
+    spec = FigureSpec(None, [PATENT_PANELS[panel]], style='seaborn-v0_8')
+    return build_figure(spec, build_panel(patents=(us_data, china_data)))
+
+def build_category_trend_figure(us_data, china_data, category):
+    """Build a single-category trend chart, one per chart variant"""
+    spec = FigureSpec(None, [PATENT_PANELS['computing_trend'].variant(category=category)], style='seaborn-v0_8')
+    return build_figure(spec, build_panel(patents=(us_data, china_data)))
+
+def create_comparison_plots(us_data, china_data, force=False, formats=DEFAULT_FORMATS):
     """Create comparative analysis plots"""
     
-    # Set up the plotting style
-    plt.style.use('seaborn-v0_8')
-    fig, axes = plt.subplots(2, 2, figsize=(15, 12))
-    fig.suptitle('US vs China Quantum Technology Patents (2014-2024)', fontsize=16, fontweight='bold')
-    
-    # Plot 1: Total Patents Over Time
-    axes[0, 0].plot(us_data['Year'], us_data['Total_Patents'], 'b-o', label='United States', linewidth=3)
-    axes[0, 0].plot(china_data['Year'], china_data['Total_Patents'], 'r-s', label='China', linewidth=3)
-    axes[0, 0].set_title('Total Patent Applications by Year')
-    axes[0, 0].set_xlabel('Year')
-    axes[0, 0].set_ylabel('Number of Patents')
-    axes[0, 0].legend()
-    axes[0, 0].grid(True, alpha=0.3)
-    
-    # Plot 2: Technology Category Breakdown (2024)
-    categories = ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']
-    us_2024 = us_data[us_data['Year'] == 2024][categories].iloc[0].values
-    china_2024 = china_data[china_data['Year'] == 2024][categories].iloc[0].values
-    
-    x = np.arange(len(categories))
-    width = 0.35
-    
-    axes[0, 1].bar(x - width/2, us_2024, width, label='United States', color='blue', alpha=0.7)
-    axes[0, 1].bar(x + width/2, china_2024, width, label='China', color='red', alpha=0.7)
-    axes[0, 1].set_title('Patents by Technology Category (2024)')
-    axes[0, 1].set_xlabel('Technology Category')
-    axes[0, 1].set_ylabel('Number of Patents')
-    axes[0, 1].set_xticks(x)
-    axes[0, 1].set_xticklabels(['Computing', 'Communications', 'Sensing'])
-    axes[0, 1].legend()
-    axes[0, 1].grid(True, alpha=0.3)
-    
-    # Plot 3: Quantum Computing Patents Trend
-    axes[1, 0].plot(us_data['Year'], us_data['Quantum_Computing'], 'b-o', label='US Computing', linewidth=3)
-    axes[1, 0].plot(china_data['Year'], china_data['Quantum_Computing'], 'r-s', label='China Computing', linewidth=3)
-    axes[1, 0].set_title('Quantum Computing Patents')
-    axes[1, 0].set_xlabel('Year')
-    axes[1, 0].set_ylabel('Number of Patents')
-    axes[1, 0].legend()
-    axes[1, 0].grid(True, alpha=0.3)
-    
-    # Plot 4: Quantum Communications Patents Trend
-    axes[1, 1].plot(us_data['Year'], us_data['Quantum_Communications'], 'b-o', label='US Communications', linewidth=3)
-    axes[1, 1].plot(china_data['Year'], china_data['Quantum_Communications'], 'r-s', label='China Communications', linewidth=3)
-    axes[1, 1].set_title('Quantum Communications Patents')
-    axes[1, 1].set_xlabel('Year')
-    axes[1, 1].set_ylabel('Number of Patents')
-    axes[1, 1].legend()
-    axes[1, 1].grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    
-    # Save the plot
     output_dir = Path(__file__).parent / "visualizations"
-    output_dir.mkdir(exist_ok=True)
-    plt.savefig(output_dir / "patent_trends_comparison.png", dpi=300, bbox_inches='tight')
-    plt.show()
+    output_file = output_dir / "patent_trends_comparison.png"
+    targets = [export_path(output_file, fmt) for fmt in formats]
+    chart_params = figure_params('build_comparison_figure', formats)
+    
+    if not force and not in_memory() and is_up_to_date(targets, (us_data, china_data), chart_params):
+        print(f"Chart up to date, skipping: {output_file.name}")
+        return targets[0]
+    
+    fig = build_comparison_figure(us_data, china_data)
+    
+    # Save the plot (or render it to a buffer in memory mode), then close it
+    with stage('save_patent_comparison', 'savefig'):
+        rendered = finish_figure(fig, output_file, formats)
+    if not in_memory():
+        mark_built(targets, (us_data, china_data), chart_params)
+    return rendered
+
+@memoize
+def growth_metrics(us_data, china_data, period='Y'):
+    """CAGR and 2023 category figures behind calculate_growth_rates, as a dict"""
+    panel = build_panel(patents=(us_data, china_data))
+    periodic = panel if period == 'Y' else build_panel(patents=(us_data, china_data), freq=period)
+    
+    # CAGR (Compound Annual Growth Rate), using 2023 due to 2024 publication delays
+    start, end = periodic.first_period(2014), periodic.last_period(2023)
+    cagr = periodic.cagr(start, end)
+    
+    # Confidence intervals under classification error, plus the publication-delay adjusted estimates
+    ci = pd.concat([intervals(periodic, growth_statistics(start, end)),
+                    intervals(panel, lead_statistics(2023))])
+    
+    return {
+        'us_cagr': cagr.at['US', 'Total_Patents'],
+        'china_cagr': cagr.at['China', 'Total_Patents'],
+        'values_2023': panel.at_year(2023),
+        'lead_2023': panel.ratio(2023, 'China', 'US'),
+        'ci': ci,
+    }
+
+@stage('patent_growth', 'metrics')
+def calculate_growth_rates(us_data, china_data, period='Y'):
+    """Calculate and display growth rate statistics
 
-def calculate_growth_rates(us_data, china_data):
-    """Calculate and display growth rate statistics"""
+    period ('Y', 'Q' or 'M') sets the resolution the CAGR is measured at;
+    sub-annual rates are annualized.
+    """
     
     print("=== PATENT GROWTH ANALYSIS ===\n")
     
-    # Calculate CAGR (Compound Annual Growth Rate)
-    def cagr(start_value, end_value, years):
-        return (end_value / start_value) ** (1/years) - 1
+    metrics = growth_metrics(us_data, china_data, period)
+    us_cagr = metrics['us_cagr']
+    china_cagr = metrics['china_cagr']
+    ci = metrics['ci']
     
-    # US Growth Rates
-    us_start = us_data[us_data['Year'] == 2014]['Total_Patents'].iloc[0]
-    us_end = us_data[us_data['Year'] == 2023]['Total_Patents'].iloc[0]  # Use 2023 due to 2024 publication delays
-    us_cagr = cagr(us_start, us_end, 9)
-    
-    # China Growth Rates
-    china_start = china_data[china_data['Year'] == 2014]['Total_Patents'].iloc[0]
-    china_end = china_data[china_data['Year'] == 2023]['Total_Patents'].iloc[0]
-    china_cagr = cagr(china_start, china_end, 9)
-    
-    print(f"United States CAGR (2014-2023): {us_cagr:.1%}")
-    print(f"China CAGR (2014-2023): {china_cagr:.1%}")
-    print(f"China growth rate is {china_cagr/us_cagr:.1f}x faster than US\n")
+    print(f"United States CAGR (2014-2023): {us_cagr:.1%} ({interval_text(ci.loc['us_cagr'], '.1%')})")
+    print(f"China CAGR (2014-2023): {china_cagr:.1%} ({interval_text(ci.loc['china_cagr'], '.1%')})")
+    print(f"China growth rate is {china_cagr/us_cagr:.1f}x faster than US "
+          f"({interval_text(ci.loc['cagr_ratio'], suffix='x')})\n")
     
     # Technology-specific analysis for 2023
-    us_2023 = us_data[us_data['Year'] == 2023].iloc[0]
-    china_2023 = china_data[china_data['Year'] == 2023].iloc[0]
+    values_2023 = metrics['values_2023']
+    lead_2023 = metrics['lead_2023']
     
     print("=== 2023 TECHNOLOGY LEADERSHIP ===\n")
-    print(f"Quantum Computing:")
-    print(f"  US: {us_2023['Quantum_Computing']:,} patents")
-    print(f"  China: {china_2023['Quantum_Computing']:,} patents")
-    print(f"  China leads by {china_2023['Quantum_Computing']/us_2023['Quantum_Computing']:.1f}x\n")
-    
-    print(f"Quantum Communications:")
-    print(f"  US: {us_2023['Quantum_Communications']:,} patents") 
-    print(f"  China: {china_2023['Quantum_Communications']:,} patents")
-    print(f"  China leads by {china_2023['Quantum_Communications']/us_2023['Quantum_Communications']:.1f}x\n")
-    
-    print(f"Quantum Sensing:")
-    print(f"  US: {us_2023['Quantum_Sensing']:,} patents")
-    print(f"  China: {china_2023['Quantum_Sensing']:,} patents") 
-    print(f"  China leads by {china_2023['Quantum_Sensing']/us_2023['Quantum_Sensing']:.1f}x\n")
+    for category in ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']:
+        print(f"{category.replace('_', ' ')}:")
+        print(f"  US: {values_2023.at['US', category]:,.0f} patents")
+        print(f"  China: {values_2023.at['China', category]:,.0f} patents")
+        print(f"  China leads by {lead_2023[category]:.1f}x ({interval_text(ci.loc[f'lead_{category}'], suffix='x')})\n")
 
-def main():
+def main(argv=None):
     """Main analysis function"""
+    parser = argparse.ArgumentParser(description="US vs China quantum patent trends")
+    parser.add_argument('--stats-only', action='store_true',
+                        help='print growth statistics without loading the plotting stack')
+    parser.add_argument('--output-mode', choices=[m for m in OUTPUT_MODES if m != 'memory'],
+                        help='batch saves charts headlessly; interactive also shows them '
+                             '(default: interactive only when a display is available)')
+    parser.add_argument('--formats', nargs='+', choices=list(EXPORT_FORMATS), default=list(DEFAULT_FORMATS),
+                        help='export targets per chart: png (300 dpi), preview (80 dpi), svg, pdf')
+    args = parser.parse_args(argv)
+    if args.output_mode:
+        set_output_mode(args.output_mode)
+    
     print("Loading patent data...")
     us_data, china_data = load_patent_data()
     
-    print("Creating comparison plots...")
-    create_comparison_plots(us_data, china_data)
+    if not args.stats_only:
+        print("Creating comparison plots...")
+        create_comparison_plots(us_data, china_data, formats=args.formats)
     
     print("Calculating growth rates...")
     calculate_growth_rates(us_data, china_data)
     
-    print("\nAnalysis complete! Check the visualizations folder for charts.")
+    if args.stats_only:
+        print("\nAnalysis complete!")
+    else:
+        print("\nAnalysis complete! Check the visualizations folder for charts.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
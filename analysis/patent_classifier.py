@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Quantum Patent Classifier
+Batch CPC-code and keyword categorization following reports/methodology.md
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Search strategy from reports/methodology.md. A record belongs to a category
+# when one of its CPC codes falls under the category's prefixes OR its
+# abstract contains one of the keywords. H04L9/08 and G01R33 also cover
+# classical key distribution and magnetic resonance, so a CPC hit there
+# only counts when the abstract mentions "quantum" (or there is no abstract).
+CATEGORY_RULES = [
+    {
+        'category': 'Quantum_Computing',
+        'cpc': ['G06N10'],
+        'keywords': ['quantum computing', 'quantum computer', 'qubit'],
+        'cpc_requires_quantum': False,
+    },
+    {
+        'category': 'Quantum_Communications',
+        'cpc': ['H04L9/08'],
+        'keywords': ['quantum communication', 'quantum cryptography', 'quantum key distribution'],
+        'cpc_requires_quantum': True,
+    },
+    {
+        'category': 'Quantum_Sensing',
+        'cpc': ['G01R33'],
+        'keywords': ['quantum sensing', 'quantum sensor', 'quantum magnetometer'],
+        'cpc_requires_quantum': True,
+    },
+]
+
+CATEGORIES = [rule['category'] for rule in CATEGORY_RULES]
+
+
+class CPCTrie:
+    """Prefix tree mapping CPC code prefixes to category positions"""
+
+    def __init__(self, rules=CATEGORY_RULES):
+        self.root = {}
+        self.n_categories = len(rules)
+        for position, rule in enumerate(rules):
+            for prefix in rule['cpc']:
+                node = self.root
+                for char in normalize_cpc(prefix):
+                    node = node.setdefault(char, {})
+                node[None] = position
+
+    def lookup(self, code):
+        """Return the category position of the longest matching prefix, or -1"""
+        node, match = self.root, -1
+        for char in code:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(None, match)
+        return match
+
+
+class KeywordMatcher:
+    """Single compiled multi-pattern matcher over abstract text
+
+    All keywords are folded into one alternation so each abstract is scanned
+    once, whatever the number of keywords, instead of once per keyword.
+    Identical abstracts (family members and re-filings share them) are
+    scanned once and their hits mapped back to every record.
+    """
+
+    def __init__(self, rules=CATEGORY_RULES):
+        self.categories = {}
+        self.n_categories = len(rules)
+        for position, rule in enumerate(rules):
+            for keyword in rule['keywords']:
+                self.categories[keyword.lower()] = position
+        # Longest keywords first so overlapping phrases resolve to the most specific
+        keywords = sorted(self.categories, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(k) for k in keywords))
+
+    def match(self, text):
+        """Return a (records x categories) boolean matrix of keyword hits"""
+        codes, uniques = pd.factorize(text.fillna(''))
+        unique_hits = np.zeros((len(uniques), self.n_categories), dtype=bool)
+        found = pd.Series(uniques).str.lower().str.findall(self.pattern).explode().dropna()
+        if len(found):
+            unique_hits[found.index.to_numpy(), found.map(self.categories).to_numpy(dtype=int)] = True
+        return unique_hits[codes]
+
+
+def normalize_cpc(code):
+    """Canonical CPC form: uppercase with spaces removed"""
+    return code.replace(' ', '').upper()
+
+
+def cpc_matrix(cpc_codes, trie=None):
+    """Return a (records x categories) boolean matrix of CPC prefix hits
+
+    Codes are factorized first so the trie is walked once per distinct code,
+    not once per record.
+    """
+    trie = trie or CPCTrie()
+    codes = cpc_codes.fillna('').str.replace(' ', '', regex=False).str.upper().str.split(';').explode()
+    codes = codes[codes != '']
+
+    hits = np.zeros((len(cpc_codes), trie.n_categories), dtype=bool)
+    if len(codes):
+        labels, uniques = pd.factorize(codes)
+        unique_positions = np.array([trie.lookup(code) for code in uniques], dtype=int)
+        positions = unique_positions[labels]
+        matched = positions >= 0
+        rows = cpc_codes.index.get_indexer(codes.index[matched])
+        hits[rows, positions[matched]] = True
+    return hits
+
+
+def classify(records, trie=None, matcher=None):
+    """Assign every record a single quantum category (or NA)
+
+    Expects a 'CPC' column of ';'-joined codes and, optionally, an 'Abstract'
+    column. Categories are taken in CATEGORY_RULES order, so a patent that
+    qualifies for several is counted once under the first.
+    """
+    index = records.index
+    records = records.reset_index(drop=True)
+    hits = cpc_matrix(records['CPC'], trie)
+
+    if 'Abstract' in records:
+        abstracts = records['Abstract']
+        requires = np.array([rule['cpc_requires_quantum'] for rule in CATEGORY_RULES])
+        has_abstract = abstracts.fillna('').str.len().to_numpy() > 0
+        mentions_quantum = abstracts.fillna('').str.contains('quantum', case=False, regex=False).to_numpy()
+        allowed = ~requires[None, :] | ~has_abstract[:, None] | mentions_quantum[:, None]
+        hits = (hits & allowed) | (matcher or KeywordMatcher()).match(abstracts)
+
+    first = hits.argmax(axis=1)
+    labels = np.array(CATEGORIES, dtype=object)[first]
+    labels[~hits.any(axis=1)] = None
+    return pd.Series(labels, index=index, dtype='object')
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Patent Deduplication
+Collapses record-level exports to one count per invention: family-ID hash join, then MinHash/LSH on text
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from patent_classifier import CATEGORIES
+
+DEFAULT_PARTITIONS = 64
+DEFAULT_NUM_PERM = 32
+DEFAULT_BANDS = 8
+DEFAULT_THRESHOLD = 0.7
+
+# Words of each record's title + abstract that go into its MinHash signature
+TEXT_WORDS = 64
+SHINGLE_WORDS = 3
+
+# Records hashed per MinHash batch; bounds the (shingles,) work arrays
+SIGNATURE_BATCH = 20_000
+
+MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Partition file layouts
+FAMILY_ROW = np.dtype([('key', 'u8'), ('source', 'u1'), ('first', 'i4')])
+BUCKET_ROW = np.dtype([('bucket', 'u8'), ('record', 'i8')])
+RECORD_ROW = np.dtype([('source', 'u1'), ('first', 'i4')])
+
+
+def first_code(year, category):
+    """Year and category packed so the minimum over a group is its earliest filing"""
+    return year.astype('int32') * 16 + category.astype('int32')
+
+
+def split_code(code):
+    return code // 16, code % 16
+
+
+def text_hashes(values, salt=0):
+    """uint64 hashes of strings, vectorized"""
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=f'{salt:016d}')
+
+
+def shingle_hashes(texts):
+    """(record position, shingle hash) of every word n-gram of each text, in record order"""
+    words = texts.str.lower().str.findall(r'\w+').str[:TEXT_WORDS].explode().dropna()
+    if words.empty:
+        return np.empty(0, 'int64'), np.empty(0, 'uint64')
+    record = words.index.to_numpy()
+    hashes = text_hashes(words.to_numpy())
+
+    # An n-gram is n consecutive words of the same record; records shorter than n use their words
+    n = len(hashes)
+    shingles = hashes.copy()
+    complete = np.ones(n, dtype=bool)  # an n-gram starting here stays inside its record
+    for offset in range(1, SHINGLE_WORDS):
+        following = np.zeros(n, dtype='uint64')
+        following[:-offset] = hashes[offset:]
+        complete[-offset:] = False
+        complete[:-offset] &= record[offset:] == record[:-offset]
+        shingles = (shingles * MIX) ^ following
+    short = np.bincount(record)[record] < SHINGLE_WORDS
+    keep = complete | short
+    return record[keep], np.where(complete[keep], shingles[keep], hashes[keep])
+
+
+def minhash_signatures(texts, num_perm=DEFAULT_NUM_PERM, seed=1):
+    """(records, num_perm) uint32 MinHash signatures; rows of texts without words are all 0xFFFFFFFF
+
+    Each permutation is a multiply-add hash over uint64 (wrapping) keeping
+    the high 32 bits; the minimum per record is one reduceat over the
+    flattened shingles.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype='uint64') | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype='uint64')
+
+    texts = pd.Series(np.asarray(texts, dtype=object)).fillna('')
+    signatures = np.full((len(texts), num_perm), 0xFFFFFFFF, dtype='uint32')
+    for start in range(0, len(texts), SIGNATURE_BATCH):
+        record, shingles = shingle_hashes(texts.iloc[start:start + SIGNATURE_BATCH].reset_index(drop=True))
+        if not len(record):
+            continue
+        starts = np.flatnonzero(np.r_[True, record[1:] != record[:-1]])
+        rows = start + record[starts]
+        for k in range(num_perm):
+            permuted = ((shingles * a[k] + b[k]) >> np.uint64(32)).astype('uint32')
+            signatures[rows, k] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def band_buckets(signatures, bands, salt):
+    """(records, bands) uint64 LSH bucket per band; records agreeing on a whole band share its bucket"""
+    rows = signatures.shape[1] // bands
+    bucket = np.zeros((len(signatures), bands), dtype='uint64')
+    for r in range(rows):
+        bucket = (bucket * MIX) ^ signatures[:, r::rows][:, :bands].astype('uint64')
+    return bucket ^ (np.arange(bands, dtype='uint64') * MIX + np.uint64(salt))
+
+
+def connected_components(n, u, v):
+    """Component label (its smallest member) of n nodes joined by edges u-v
+
+    Min-label propagation with pointer jumping: each round is a couple of
+    array operations over the edges, and rounds are logarithmic in
+    practice.
+    """
+    labels = np.arange(n)
+    while len(u):
+        low = np.minimum(labels[u], labels[v])
+        before = labels.copy()
+        np.minimum.at(labels, u, low)
+        np.minimum.at(labels, v, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            break
+    while True:
+        jumped = labels[labels]
+        if np.array_equal(jumped, labels):
+            return labels
+        labels = jumped
+
+
+class PartitionFiles:
+    """Rows of one layout spread over files by key, appended chunk by chunk"""
+
+    def __init__(self, directory, name, dtype, partitions):
+        self.paths = [Path(directory) / f"{name}-{i:03d}.bin" for i in range(partitions)]
+        self.dtype = dtype
+
+    def append(self, rows, keys):
+        part = (keys % np.uint64(len(self.paths))).astype('int64')
+        order = np.argsort(part, kind='stable')
+        bounds = np.searchsorted(part[order], np.arange(len(self.paths) + 1))
+        for i, path in enumerate(self.paths):
+            if bounds[i] < bounds[i + 1]:
+                with open(path, 'ab') as f:
+                    rows[order[bounds[i]:bounds[i + 1]]].tofile(f)
+
+    def __iter__(self):
+        for path in self.paths:
+            if path.exists():
+                yield np.fromfile(path, dtype=self.dtype)
+
+
+class Deduplicator:
+    """Two-pass deduplication of classified records from one or more sources
+
+    add() streams chunks to partition files on disk: records with a family
+    ID are partitioned by family hash, the rest get a MinHash signature
+    and are partitioned by LSH bucket. counts() then reads back one
+    partition at a time, so memory is bounded by the partition size plus
+    one label per record without a family ID.
+
+    A family (or near-duplicate cluster) is counted once per source, in the
+    year and category of its earliest filing. Families seen in more than
+    one source are counted in each and reported as cross_source_families.
+    """
+
+    def __init__(self, workdir=None, partitions=DEFAULT_PARTITIONS, num_perm=DEFAULT_NUM_PERM,
+                 bands=DEFAULT_BANDS, threshold=DEFAULT_THRESHOLD):
+        self.tempdir = tempfile.TemporaryDirectory(prefix='patent-dedup-', dir=workdir)
+        directory = self.tempdir.name
+        self.families = PartitionFiles(directory, 'family', FAMILY_ROW, partitions)
+        self.buckets = PartitionFiles(directory, 'bucket', BUCKET_ROW, partitions)
+        self.records_path = Path(directory) / 'records.bin'
+        self.signatures_path = Path(directory) / 'signatures.bin'
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.sources = []
+        self.stats = {'records': 0, 'with_family': 0, 'without_family': 0}
+
+    def source_code(self, source):
+        if source not in self.sources:
+            self.sources.append(source)
+        return self.sources.index(source)
+
+    def add(self, chunk, source):
+        """Partition one chunk of classified records (Year, Category, Family_ID, Title, Abstract)"""
+        code = self.source_code(source)
+        category = pd.Categorical(chunk['Category'], categories=CATEGORIES).codes
+        first = first_code(chunk['Year'].to_numpy(), category)
+        family = chunk['Family_ID'].fillna('').str.strip().to_numpy(dtype=object)
+        has_family = family != ''
+
+        keys = text_hashes(family[has_family])
+        rows = np.empty(len(keys), dtype=FAMILY_ROW)
+        rows['key'], rows['source'], rows['first'] = keys, code, first[has_family]
+        self.families.append(rows, keys)
+
+        loose = ~has_family
+        offset = self.stats['without_family']
+        text = (chunk['Title'].fillna('') + ' ' + chunk['Abstract'].fillna('')).to_numpy(dtype=object)[loose]
+        signatures = minhash_signatures(text, self.num_perm)
+        records = np.empty(len(signatures), dtype=RECORD_ROW)
+        records['source'], records['first'] = code, first[loose]
+        with open(self.records_path, 'ab') as f:
+            records.tofile(f)
+        with open(self.signatures_path, 'ab') as f:
+            signatures.tofile(f)
+
+        # Texts without words are never near-duplicates of anything
+        has_text = (signatures != 0xFFFFFFFF).any(axis=1)
+        buckets = band_buckets(signatures[has_text], self.bands, salt=code)
+        index = offset + np.flatnonzero(has_text)
+        rows = np.empty(buckets.size, dtype=BUCKET_ROW)
+        rows['bucket'], rows['record'] = buckets.ravel(), np.repeat(index, self.bands)
+        self.buckets.append(rows, rows['bucket'])
+
+        self.stats['records'] += len(chunk)
+        self.stats['with_family'] += int(has_family.sum())
+        self.stats['without_family'] += int(loose.sum())
+
+    def family_firsts(self):
+        """(source, first code) of every distinct (family, source), and the cross-source family count"""
+        sources, firsts, shared = [], [], 0
+        for rows in self.families:
+            rows = rows[np.lexsort((rows['first'], rows['source'], rows['key']))]
+            new = np.r_[True, (rows['key'][1:] != rows['key'][:-1]) | (rows['source'][1:] != rows['source'][:-1])]
+            kept = rows[new]
+            sources.append(kept['source'])
+            firsts.append(kept['first'])
+            family_starts = np.r_[True, kept['key'][1:] != kept['key'][:-1]]
+            shared += int((np.diff(np.r_[np.flatnonzero(family_starts), len(kept)]) > 1).sum())
+        if not sources:
+            return np.empty(0, 'u1'), np.empty(0, 'i4'), 0
+        return np.concatenate(sources), np.concatenate(firsts), shared
+
+    def near_duplicate_firsts(self):
+        """(source, first code) of every near-duplicate cluster of records without a family ID"""
+        n = self.stats['without_family']
+        if not n:
+            return np.empty(0, 'u1'), np.empty(0, 'i4')
+        signatures = np.memmap(self.signatures_path, dtype='uint32', mode='r', shape=(n, self.num_perm))
+
+        # Candidate pairs: every record in a bucket against the bucket's first record,
+        # kept when their signatures agree on at least `threshold` of the permutations
+        edges_u, edges_v = [], []
+        for rows in self.buckets:
+            rows = rows[np.argsort(rows['bucket'], kind='stable')]
+            same = rows['bucket'][1:] == rows['bucket'][:-1]
+            if not same.any():
+                continue
+            group = np.cumsum(np.r_[True, ~same]) - 1
+            head = rows['record'][np.flatnonzero(np.r_[True, ~same])][group]
+            pair = head != rows['record']
+            u, v = head[pair], rows['record'][pair]
+            agree = (signatures[u] == signatures[v]).mean(axis=1) >= self.threshold
+            edges_u.append(u[agree])
+            edges_v.append(v[agree])
+
+        labels = connected_components(n, np.concatenate(edges_u or [np.empty(0, 'i8')]),
+                                      np.concatenate(edges_v or [np.empty(0, 'i8')]))
+        records = np.memmap(self.records_path, dtype=RECORD_ROW, mode='r', shape=(n,))
+        first = np.full(n, np.iinfo('int32').max, dtype='int32')
+        np.minimum.at(first, labels, records['first'])
+        roots = np.flatnonzero(labels == np.arange(n))
+        return records['source'][roots], first[roots]
+
+    @stage('dedup_resolve', 'transform')
+    def counts(self):
+        """{source: per-year category counts after deduplication} and the dedup stats"""
+        family_sources, family_firsts, shared = self.family_firsts()
+        loose_sources, loose_firsts = self.near_duplicate_firsts()
+        sources = np.concatenate([family_sources, loose_sources])
+        year, category = split_code(np.concatenate([family_firsts, loose_firsts]))
+
+        stats = dict(self.stats)
+        stats['families'] = len(family_sources)
+        stats['family_duplicates'] = stats['with_family'] - len(family_sources)
+        stats['near_duplicates'] = stats['without_family'] - len(loose_sources)
+        stats['unique'] = len(sources)
+        stats['cross_source_families'] = shared
+
+        counts = {}
+        for code, source in enumerate(self.sources):
+            mine = sources == code
+            frame = pd.DataFrame({'Year': year[mine], 'Category': category[mine]})
+            counts[source] = (frame.groupby(['Year', 'Category']).size().unstack(fill_value=0)
+                              .reindex(columns=range(len(CATEGORIES)), fill_value=0)
+                              .set_axis(CATEGORIES, axis=1).astype('int64'))
+        return counts, stats
+
+    def close(self):
+        self.tempdir.cleanup()
+
+
+@stage('dedup_partition', 'transform')
+def partition_sources(dedup, sources, categorize, report_every=None):
+    """Classify and partition every chunk of every source into the deduplicator"""
+    start = time.perf_counter()
+    chunks = 0
+    dedup.stats['read'] = 0
+    for source, records in sources.items():
+        dedup.source_code(source)  # sources without quantum records still get (empty) counts
+        for chunk in records:
+            category = categorize(chunk)
+            matched = category.notna()
+            dedup.add(chunk[matched].assign(Category=category[matched]), source)
+            dedup.stats['read'] += len(chunk)
+            chunks += 1
+            if report_every and chunks % report_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"  {dedup.stats['records']:,} quantum records partitioned "
+                      f"({dedup.stats['records'] / elapsed:,.0f} records/sec)")
+
+
+def deduplicate(sources, categorize, workdir=None, report_every=None, **options):
+    """Deduplicated per-year category counts for {source: record chunks}
+
+    Returns ({source: counts indexed by Year}, stats). Only records the
+    classifier assigns to a category are kept. options are passed to
+    Deduplicator (partitions, num_perm, bands, threshold).
+    """
+    dedup = Deduplicator(workdir, **options)
+    try:
+        partition_sources(dedup, sources, categorize, report_every)
+        return dedup.counts()
+    finally:
+        dedup.close()
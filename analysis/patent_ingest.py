@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Streaming Patent Ingestion
+Aggregates raw PatentsView / CNIPA bulk exports into the yearly patent CSVs
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from assignee_index import attribute, load_index
+from instrumentation import stage
+from patent_classifier import CATEGORIES as CATEGORY_COLUMNS, classify
+from patent_dedup import deduplicate
+from validation import PATENT_RULES, validate
+
+OUTPUT_COLUMNS = ['Year', 'Total_Patents'] + CATEGORY_COLUMNS + ['Source', 'Notes']
+
+# Raw column names in each bulk export, mapped onto the fields we classify
+# and aggregate. Exports are expected to carry one row per patent with its
+# CPC codes joined by ';' (the PatentsView custom-query layout).
+SOURCE_FORMATS = {
+    'patentsview': {
+        'sep': '\t',
+        'columns': {
+            'patent_id': 'Patent_ID',
+            'patent_date': 'Date',
+            'cpc_codes': 'CPC',
+            'patent_abstract': 'Abstract',
+            'patent_title': 'Title',
+            'family_id': 'Family_ID',
+            'assignee_organization': 'Assignee',
+        },
+        'source': 'USPTO/PatentsView',
+    },
+    'cnipa': {
+        'sep': ',',
+        'columns': {
+            'application_number': 'Patent_ID',
+            'application_date': 'Date',
+            'cpc_codes': 'CPC',
+            'abstract': 'Abstract',
+            'title': 'Title',
+            'family_id': 'Family_ID',
+            'applicant': 'Assignee',
+        },
+        'source': 'CNIPA/WIPO',
+    },
+}
+
+# Raw exports picked up by load_from_raw(), one per country
+RAW_EXPORTS = {
+    'us': ('us-quantum-patents-raw.tsv', 'patentsview'),
+    'china': ('china-quantum-patents-raw.csv', 'cnipa'),
+}
+
+DEFAULT_CHUNKSIZE = 250_000
+
+
+def iter_records(path, source_format='patentsview', chunksize=DEFAULT_CHUNKSIZE, country=None):
+    """Yield normalized record chunks from a bulk export without loading it whole
+
+    With country (e.g. 'US'), only records whose first assignee resolves to
+    that country in the assignee index are kept; a country no organization
+    in the index resolves to raises ValueError.
+    """
+    fmt = SOURCE_FORMATS[source_format]
+    columns = fmt['columns']
+    index = load_index() if country else None
+    if index is not None and country not in index.countries:
+        raise ValueError(f"No assignees resolve to country {country!r}; expected one of {index.countries}")
+
+    reader = pd.read_csv(path, sep=fmt['sep'], usecols=lambda c: c in columns,
+                         dtype=str, chunksize=chunksize, on_bad_lines='skip')
+    for chunk in reader:
+        chunk = chunk.rename(columns=columns)
+        chunk['Year'] = pd.to_datetime(chunk['Date'], errors='coerce').dt.year
+        chunk = chunk.dropna(subset=['Year'])
+        chunk['Year'] = chunk['Year'].astype('int16')
+        chunk['CPC'] = chunk['CPC'].fillna('')
+        for optional in ('Abstract', 'Title', 'Family_ID', 'Assignee'):
+            if optional not in chunk:
+                chunk[optional] = ''
+        if index is not None:
+            chunk = chunk[attribute(chunk, index) == country]
+        yield chunk
+
+
+def aggregate_yearly(chunks, categorize=classify, report_every=None):
+    """Fold record chunks into per-year category counts
+
+    Only the running per-year totals are kept between chunks, so memory stays
+    bounded by the number of distinct years rather than the input size.
+    """
+    counts = pd.DataFrame(0, index=pd.Index([], name='Year', dtype='int64'),
+                          columns=CATEGORY_COLUMNS, dtype='int64')
+    stats = {'records': 0, 'matched': 0, 'chunks': 0}
+    start = time.perf_counter()
+
+    for chunk in chunks:
+        category = categorize(chunk)
+        matched = category.notna()
+
+        if matched.any():
+            chunk_counts = (pd.crosstab(chunk.loc[matched, 'Year'], category[matched])
+                            .reindex(columns=CATEGORY_COLUMNS, fill_value=0))
+            counts = counts.add(chunk_counts, fill_value=0).astype('int64')
+
+        stats['records'] += len(chunk)
+        stats['matched'] += int(matched.sum())
+        stats['chunks'] += 1
+
+        if report_every and stats['chunks'] % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  {stats['records']:,} records ({stats['records'] / elapsed:,.0f} records/sec)")
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['records_per_sec'] = stats['records'] / stats['seconds'] if stats['seconds'] else 0.0
+
+    return with_totals(counts), stats
+
+
+def with_totals(counts):
+    """Year-indexed category counts as Year, Total_Patents, category columns"""
+    counts = counts.copy()
+    counts.insert(0, 'Total_Patents', counts[CATEGORY_COLUMNS].sum(axis=1))
+    return counts.rename_axis('Year').sort_index().reset_index()
+
+
+def deduplicated_counts(exports, chunksize=DEFAULT_CHUNKSIZE, report_every=None, dedup_dir=None, country=None):
+    """Per-year counts of distinct inventions for {name: (path, source_format)}
+
+    Records are classified, then collapsed by family ID or near-duplicate
+    text before counting (see patent_dedup). Exports deduplicated together
+    are also matched against each other; families filed in several are
+    counted in each and reported as cross_source_families.
+    """
+    start = time.perf_counter()
+    sources = {name: iter_records(path, source_format, chunksize, country)
+               for name, (path, source_format) in exports.items()}
+    counts, stats = deduplicate(sources, classify, workdir=dedup_dir, report_every=report_every)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['records_per_sec'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+    return {name: with_totals(frame) for name, frame in counts.items()}, stats
+
+
+def yearly_table(counts, source_format, start_year=2014, end_year=2024):
+    """Lay out yearly counts as data/patents/*.csv, with zero rows for missing years
+
+    The table is checked against the rules of the patent datasets, so a
+    bad export fails here rather than when the written CSV is next loaded.
+    """
+    years = pd.DataFrame({'Year': range(start_year, end_year + 1)})
+    table = years.merge(counts, on='Year', how='left').fillna(0)
+    table[['Total_Patents'] + CATEGORY_COLUMNS] = table[['Total_Patents'] + CATEGORY_COLUMNS].astype('int64')
+    table['Source'] = SOURCE_FORMATS[source_format]['source']
+    table['Notes'] = ''
+    return validate(f"{source_format} export", table[OUTPUT_COLUMNS], PATENT_RULES)
+
+
+@stage('ingest_raw_export', 'load')
+def build_yearly_table(path, source_format='patentsview', start_year=2014, end_year=2024,
+                       chunksize=DEFAULT_CHUNKSIZE, report_every=None, dedup=False, dedup_dir=None, country=None):
+    """Build a yearly patent table in the layout of data/patents/*.csv
+
+    With dedup, each family or near-duplicate cluster is counted once;
+    dedup_dir holds the partition files (default: the system temp dir).
+    With country, records are first attributed by assignee (see
+    assignee_index), so one multi-country export yields each country's table.
+    """
+    if dedup:
+        counts, stats = deduplicated_counts({'export': (path, source_format)}, chunksize, report_every,
+                                            dedup_dir, country)
+        counts = counts['export']
+    else:
+        chunks = iter_records(path, source_format, chunksize, country)
+        counts, stats = aggregate_yearly(chunks, report_every=report_every)
+
+    return yearly_table(counts, source_format, start_year, end_year), stats
+
+
+def load_from_raw(raw_dir, start_year=2014, end_year=2024, dedup=False):
+    """Build the US and China yearly tables straight from raw exports in raw_dir
+
+    With dedup, both exports are deduplicated in one pass, so families
+    filed with both offices are matched as well.
+    """
+    raw_dir = Path(raw_dir)
+    if dedup:
+        exports = {country: (raw_dir / filename, source_format)
+                   for country, (filename, source_format) in RAW_EXPORTS.items()}
+        counts, _ = deduplicated_counts(exports)
+        return tuple(yearly_table(counts[country], RAW_EXPORTS[country][1], start_year, end_year)
+                     for country in ('us', 'china'))
+
+    tables = []
+    for country in ('us', 'china'):
+        filename, source_format = RAW_EXPORTS[country]
+        table, _ = build_yearly_table(raw_dir / filename, source_format, start_year, end_year)
+        tables.append(table)
+    return tuple(tables)
+
+
+def main(argv=None):
+    """Aggregate a bulk export and write the yearly CSV"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', type=Path, help='PatentsView TSV or CNIPA CSV bulk export')
+    parser.add_argument('output', type=Path, help='yearly CSV to write')
+    parser.add_argument('--format', choices=sorted(SOURCE_FORMATS), default='patentsview')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--start-year', type=int, default=2014)
+    parser.add_argument('--end-year', type=int, default=2024)
+    parser.add_argument('--dedup', action='store_true',
+                        help='count each patent family / near-duplicate filing once')
+    parser.add_argument('--dedup-dir', type=Path, default=None,
+                        help='directory for the dedup partition files, created if missing (default: system temp dir)')
+    parser.add_argument('--country', default=None,
+                        help="keep only patents whose first assignee resolves to this country (e.g. 'US', 'China')")
+    args = parser.parse_args(argv)
+    if args.country:
+        countries = load_index().countries
+        if args.country not in countries:
+            parser.error(f"--country {args.country!r} is not in the assignee index; expected one of {countries}")
+    if args.dedup_dir:
+        args.dedup_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Ingesting {args.input} ({args.format})...")
+    table, stats = build_yearly_table(args.input, args.format, args.start_year, args.end_year,
+                                      chunksize=args.chunksize, report_every=10,
+                                      dedup=args.dedup, dedup_dir=args.dedup_dir, country=args.country)
+    table.to_csv(args.output, index=False)
+
+    if args.dedup:
+        print(f"✅ {stats['read']:,} records read, {stats['records']:,} quantum patents, "
+              f"{stats['unique']:,} distinct inventions")
+        print(f"   {stats['family_duplicates']:,} collapsed by family ID, "
+              f"{stats['near_duplicates']:,} by near-duplicate text")
+    else:
+        print(f"✅ {stats['records']:,} records read, {stats['matched']:,} quantum patents")
+    print(f"   {stats['seconds']:.1f}s at {stats['records_per_sec']:,.0f} records/sec")
+    print(f"   Written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,101 +4,71 @@ Simple Patent Trends Visualization Script
 Reads patent data and generates comparison charts
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+import argparse
 from pathlib import Path
 
-def load_data():
-    """Load patent data from CSV files"""
-    data_dir = Path(__file__).parent.parent / "data" / "patents"
-    
+from build_manifest import is_up_to_date, mark_built
+from chart_spec import PATENT_CATEGORIES, FigureSpec, PanelSpec, build_figure
+from data_access import load_patent_tables
+from instrumentation import stage
+from metrics import build_panel
+from plotting import (DEFAULT_FORMATS, EXPORT_FORMATS, OUTPUT_MODES, export_path, figure_params, finish_figure,
+                      in_memory, set_output_mode)
+
+def load_data(raw_dir=None):
+    """Load patent data from CSV files, or classify raw exports when raw_dir is given"""
     print("Loading patent data...")
-    us_data = pd.read_csv(data_dir / "us-quantum-patents-2014-2024.csv")
-    china_data = pd.read_csv(data_dir / "china-quantum-patents-2014-2024.csv")
+    if raw_dir is not None:
+        from patent_ingest import load_from_raw
+        us_data, china_data = load_from_raw(raw_dir)
+    else:
+        us_data, china_data = load_patent_tables()
     
     print(f"Loaded US data: {len(us_data)} years")
     print(f"Loaded China data: {len(china_data)} years")
     
     return us_data, china_data
 
-def create_comparison_chart(us_data, china_data):
+# Chart 2 uses 2023 rather than 2024 because of publication delays
+TRENDS_CHART = FigureSpec('US vs China Quantum Technology Patents (2014-2024)', [
+    PanelSpec('line', 'Total Patent Applications by Year', 'Year', 'Number of Patents', category='Total_Patents',
+              style={'linewidth': 3, 'markersize': 8}, title_style={'fontsize': 14},
+              legend_style={'fontsize': 12}, despine=True),
+    PanelSpec('bar', 'Patents by Technology Category ({year})', 'Technology Category', 'Number of Patents',
+              categories=PATENT_CATEGORIES, year=2023,
+              ticklabels=['Quantum\nComputing', 'Quantum\nCommunications', 'Quantum\nSensing'],
+              colors={'US': 'steelblue', 'China': 'crimson'}, style={'alpha': 0.8},
+              title_style={'fontsize': 14}, legend_style={'fontsize': 12}, grid_style={'alpha': 0.3, 'axis': 'y'},
+              value_labels=10, despine=True),
+], shape=(1, 2), figsize=(15, 6), style='default')
+
+@stage('patent_trends_figure', 'figure')
+def create_comparison_chart(us_data, china_data, force=False, formats=DEFAULT_FORMATS):
     """Create patent comparison visualization"""
     
-    # Set up the plot
-    plt.style.use('default')  # Use default style for compatibility
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-    fig.suptitle('US vs China Quantum Technology Patents (2014-2024)', fontsize=16, fontweight='bold')
-    
-    # Chart 1: Total Patents Over Time
-    ax1.plot(us_data['Year'], us_data['Total_Patents'], 'b-o', 
-             label='United States', linewidth=3, markersize=8)
-    ax1.plot(china_data['Year'], china_data['Total_Patents'], 'r-s', 
-             label='China', linewidth=3, markersize=8)
-    
-    ax1.set_title('Total Patent Applications by Year', fontsize=14)
-    ax1.set_xlabel('Year')
-    ax1.set_ylabel('Number of Patents')
-    ax1.legend(fontsize=12)
-    ax1.grid(True, alpha=0.3)
-    
-    # Add some styling
-    ax1.spines['top'].set_visible(False)
-    ax1.spines['right'].set_visible(False)
-    
-    # Chart 2: 2023 Technology Breakdown (avoiding 2024 due to publication delays)
-    categories = ['Quantum\nComputing', 'Quantum\nCommunications', 'Quantum\nSensing']
-    us_2023 = [us_data[us_data['Year'] == 2023]['Quantum_Computing'].iloc[0],
-               us_data[us_data['Year'] == 2023]['Quantum_Communications'].iloc[0],
-               us_data[us_data['Year'] == 2023]['Quantum_Sensing'].iloc[0]]
-    china_2023 = [china_data[china_data['Year'] == 2023]['Quantum_Computing'].iloc[0],
-                  china_data[china_data['Year'] == 2023]['Quantum_Communications'].iloc[0],
-                  china_data[china_data['Year'] == 2023]['Quantum_Sensing'].iloc[0]]
-    
-    x = np.arange(len(categories))
-    width = 0.35
-    
-    bars1 = ax2.bar(x - width/2, us_2023, width, label='United States', 
-                    color='steelblue', alpha=0.8)
-    bars2 = ax2.bar(x + width/2, china_2023, width, label='China', 
-                    color='crimson', alpha=0.8)
-    
-    ax2.set_title('Patents by Technology Category (2023)', fontsize=14)
-    ax2.set_xlabel('Technology Category')
-    ax2.set_ylabel('Number of Patents')
-    ax2.set_xticks(x)
-    ax2.set_xticklabels(categories)
-    ax2.legend(fontsize=12)
-    ax2.grid(True, alpha=0.3, axis='y')
-    
-    # Add value labels on bars
-    for bar in bars1:
-        height = bar.get_height()
-        ax2.text(bar.get_x() + bar.get_width()/2., height + 10,
-                f'{int(height)}', ha='center', va='bottom', fontsize=10)
-    
-    for bar in bars2:
-        height = bar.get_height()
-        ax2.text(bar.get_x() + bar.get_width()/2., height + 10,
-                f'{int(height)}', ha='center', va='bottom', fontsize=10)
-    
-    ax2.spines['top'].set_visible(False)
-    ax2.spines['right'].set_visible(False)
-    
-    plt.tight_layout()
-    
-    # Save the chart
     output_dir = Path(__file__).parent / "visualizations"
-    output_dir.mkdir(exist_ok=True)
-    
     output_file = output_dir / "patent_trends_comparison.png"
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
+    targets = [export_path(output_file, fmt) for fmt in formats]
+    chart_params = figure_params('TRENDS_CHART', formats)
+    
+    if not force and not in_memory() and is_up_to_date(targets, (us_data, china_data), chart_params):
+        print(f"\n✓ Chart up to date, skipping: {targets[0]}")
+        return targets[0]
     
-    print(f"\n✅ Chart saved to: {output_file}")
-    plt.show()
+    fig = build_figure(TRENDS_CHART, build_panel(patents=(us_data, china_data)))
     
-    return output_file
+    # Save the chart (or render it to a buffer in memory mode), then close it
+    with stage('save_patent_trends', 'savefig'):
+        rendered = finish_figure(fig, output_file, formats)
+    if in_memory():
+        return rendered
+    mark_built(targets, (us_data, china_data), chart_params)
+    
+    print(f"\n✅ Chart saved to: {targets[0]}")
+    
+    return targets[0]
 
+@stage('patent_key_statistics', 'metrics')
 def print_key_statistics(us_data, china_data):
     """Print key statistics from the data"""
     
@@ -107,43 +77,59 @@ def print_key_statistics(us_data, china_data):
     print("="*50)
     
     # Use 2023 data to avoid publication delay issues
-    us_2023 = us_data[us_data['Year'] == 2023].iloc[0]
-    china_2023 = china_data[china_data['Year'] == 2023].iloc[0]
-    
-    us_2014 = us_data[us_data['Year'] == 2014].iloc[0]
-    china_2014 = china_data[china_data['Year'] == 2014].iloc[0]
+    panel = build_panel(patents=(us_data, china_data))
+    us_2023 = panel.row('US', 2023)
+    china_2023 = panel.row('China', 2023)
     
     print(f"\n📊 TOTAL PATENTS (2023):")
-    print(f"   United States: {us_2023['Total_Patents']:,} patents")
-    print(f"   China: {china_2023['Total_Patents']:,} patents")
+    print(f"   United States: {us_2023['Total_Patents']:,.0f} patents")
+    print(f"   China: {china_2023['Total_Patents']:,.0f} patents")
     print(f"   China leads by: {china_2023['Total_Patents']/us_2023['Total_Patents']:.1f}x")
     
     print(f"\n🚀 GROWTH (2014-2023):")
-    us_growth = (us_2023['Total_Patents'] / us_2014['Total_Patents'] - 1) * 100
-    china_growth = (china_2023['Total_Patents'] / china_2014['Total_Patents'] - 1) * 100
+    growth = panel.growth(2014, 2023) * 100
+    us_growth = growth.at['US', 'Total_Patents']
+    china_growth = growth.at['China', 'Total_Patents']
     
     print(f"   US Growth: {us_growth:.0f}%")
     print(f"   China Growth: {china_growth:.0f}%")
     
     print(f"\n🔬 TECHNOLOGY BREAKDOWN (2023):")
     print(f"   Quantum Computing:")
-    print(f"      US: {us_2023['Quantum_Computing']:,} | China: {china_2023['Quantum_Computing']:,}")
+    print(f"      US: {us_2023['Quantum_Computing']:,.0f} | China: {china_2023['Quantum_Computing']:,.0f}")
     print(f"   Quantum Communications:")  
-    print(f"      US: {us_2023['Quantum_Communications']:,} | China: {china_2023['Quantum_Communications']:,}")
+    print(f"      US: {us_2023['Quantum_Communications']:,.0f} | China: {china_2023['Quantum_Communications']:,.0f}")
     print(f"   Quantum Sensing:")
-    print(f"      US: {us_2023['Quantum_Sensing']:,} | China: {china_2023['Quantum_Sensing']:,}")
+    print(f"      US: {us_2023['Quantum_Sensing']:,.0f} | China: {china_2023['Quantum_Sensing']:,.0f}")
 
-def main():
+def main(argv=None):
     """Main function to run the analysis"""
     
+    parser = argparse.ArgumentParser(description="Quantum patent trends chart and key statistics")
+    parser.add_argument('--stats-only', action='store_true',
+                        help='print key statistics without loading the plotting stack')
+    parser.add_argument('--output-mode', choices=[m for m in OUTPUT_MODES if m != 'memory'],
+                        help='batch saves the chart headlessly; interactive also shows it '
+                             '(default: interactive only when a display is available)')
+    parser.add_argument('--formats', nargs='+', choices=list(EXPORT_FORMATS), default=list(DEFAULT_FORMATS),
+                        help='export targets per chart: png (300 dpi), preview (80 dpi), svg, pdf')
+    args = parser.parse_args(argv)
+    if args.output_mode:
+        set_output_mode(args.output_mode)
+    
     print("🚀 Quantum Patent Trends Analysis")
     print("="*40)
     
     # Load data
     us_data, china_data = load_data()
     
+    if args.stats_only:
+        print_key_statistics(us_data, china_data)
+        print(f"\n🎉 Analysis complete!")
+        return
+    
     # Create visualization
-    chart_file = create_comparison_chart(us_data, china_data)
+    chart_file = create_comparison_chart(us_data, china_data, formats=args.formats)
     
     # Print statistics
     print_key_statistics(us_data, china_data)
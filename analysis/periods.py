@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Period Resampling
+Brings annual tables and timestamped (monthly/quarterly/record-level) data to a common period
+"""
+
+import pandas as pd
+
+from instrumentation import stage
+
+PERIODS_PER_YEAR = {'Y': 1, 'Q': 4, 'M': 12}
+
+# Finest to coarsest; data can only be resampled to the same or a coarser period
+RESOLUTION = ['D', 'M', 'Q', 'Y']
+
+
+def infer_freq(data):
+    """Resolution of a table: 'Y' for Year-only tables, otherwise from its Date column"""
+    if 'Date' not in data:
+        return 'Y'
+    dates = pd.to_datetime(data['Date'])
+    if (dates.dt.day != 1).any():
+        return 'D'
+    if (~dates.dt.month.isin([1, 4, 7, 10])).any():
+        return 'M'
+    if (dates.dt.month != 1).any():
+        return 'Q'
+    return 'Y'
+
+
+def period_labels(data, freq):
+    """Period of every row at the requested resolution"""
+    if 'Date' in data:
+        periods = pd.PeriodIndex(pd.to_datetime(data['Date']), freq=freq)
+    else:
+        periods = pd.PeriodIndex(data['Year'].astype(str), freq=freq)
+    if freq == 'Y':
+        return pd.Index(periods.year, name='Period')
+    return pd.Index(periods, name='Period')
+
+
+def column_aggregation(column, dtype):
+    """How a column combines when rows are merged into a coarser period"""
+    if not pd.api.types.is_numeric_dtype(dtype):
+        return 'last'
+    if 'Cumulative' in column:
+        return 'last'
+    if 'Share_Percent' in column:
+        return 'mean'
+    return 'sum'
+
+
+def recompute_shares(data):
+    """Shares of a summed total must be recomputed, not averaged"""
+    for share in [c for c in data.columns if c.endswith('_Share_Percent')]:
+        part = share.replace('_Share_Percent', '_Private_Millions')
+        if part in data and 'Global_Private_Total' in data:
+            data[share] = data[part] / data['Global_Private_Total'] * 100
+    return data
+
+
+@stage('resample', 'transform')
+def resample(data, freq='Y', source_freq=None):
+    """Aggregate a table to `freq` periods with one vectorized groupby
+
+    Returns the table with a 'Period' column (and 'Year'), one row per
+    period. Flows are summed, cumulative columns keep their last value and
+    shares are recomputed from the summed totals.
+    """
+    if freq not in PERIODS_PER_YEAR:
+        raise ValueError(f"Unknown period {freq!r}; expected one of {sorted(PERIODS_PER_YEAR)}")
+    source_freq = source_freq or infer_freq(data)
+    if RESOLUTION.index(freq) < RESOLUTION.index(source_freq):
+        raise ValueError(f"Cannot resample {source_freq!r} data to the finer period {freq!r}")
+
+    # Annual tables asked for annually are already one row per period
+    if freq == source_freq == 'Y' and 'Date' not in data:
+        return data.assign(Period=data['Year'])
+
+    value_columns = [c for c in data.columns if c not in ('Year', 'Date', 'Period')]
+    aggregation = {c: column_aggregation(c, data[c].dtype) for c in value_columns}
+    ordered = data.sort_values('Date' if 'Date' in data else 'Year', kind='stable')
+
+    resampled = ordered[value_columns].groupby(period_labels(ordered, freq), sort=True).agg(aggregation)
+    if freq != source_freq:
+        resampled = recompute_shares(resampled)
+
+    resampled = resampled.reset_index()
+    resampled.insert(0, 'Year', [p if freq == 'Y' else p.year for p in resampled['Period']])
+    return resampled
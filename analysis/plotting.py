@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Plotting Stack
+Imports matplotlib only when a chart is actually drawn, and exports, shows and closes figures per output mode
+"""
+
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from instrumentation import stage
+from memo import memoize
+
+# batch: save files with the Agg backend; interactive: save, then show;
+# memory: render into BytesIO buffers instead of files
+OUTPUT_MODES = ['batch', 'interactive', 'memory']
+MODE_ENV = 'ANALYSIS_OUTPUT_MODE'
+
+OUTPUT_MODE = None
+
+# Export targets a figure can be written to, each a file next to the main output
+EXPORT_FORMATS = {
+    'png': {'suffix': '.png', 'format': 'png', 'dpi': 300},
+    'preview': {'suffix': '.preview.png', 'format': 'png', 'dpi': 80},
+    'svg': {'suffix': '.svg', 'format': 'svg', 'dpi': 300},
+    'pdf': {'suffix': '.pdf', 'format': 'pdf', 'dpi': 300},
+}
+DEFAULT_FORMATS = ('png',)
+
+# Display name, line format and color per country; other countries are
+# labelled by their code and styled from COUNTRY_COLORS and COUNTRY_MARKERS
+# in panel order (no grays, which are kept for context lines)
+COUNTRY_STYLES = {
+    'US': {'name': 'United States', 'fmt': '-o', 'color': 'blue'},
+    'China': {'name': 'China', 'fmt': '-s', 'color': 'red'},
+}
+COUNTRY_COLORS = ['tab:orange', 'tab:green', 'tab:purple', 'tab:brown', 'tab:pink', 'tab:olive', 'tab:cyan',
+                  'tab:blue', 'tab:red']
+COUNTRY_MARKERS = 'o^Dvp*hX<>'
+
+
+def default_output_mode():
+    """Mode from ANALYSIS_OUTPUT_MODE, else interactive only where a display exists"""
+    mode = os.environ.get(MODE_ENV)
+    if mode:
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"{MODE_ENV}={mode!r}; expected one of {OUTPUT_MODES}")
+        return mode
+    if sys.platform in ('darwin', 'win32') or os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+        return 'interactive'
+    return 'batch'
+
+
+def output_mode():
+    """The current output mode, chosen once per process"""
+    global OUTPUT_MODE
+    if OUTPUT_MODE is None:
+        OUTPUT_MODE = default_output_mode()
+    return OUTPUT_MODE
+
+
+def set_output_mode(mode):
+    """Select batch, interactive or memory output for the rest of the process"""
+    global OUTPUT_MODE
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}; expected one of {OUTPUT_MODES}")
+    OUTPUT_MODE = mode
+    if mode != 'interactive' and 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].switch_backend('Agg')
+
+
+def in_memory():
+    """True when charts are rendered to buffers rather than files"""
+    return output_mode() == 'memory'
+
+
+def pyplot(backend=None):
+    """matplotlib.pyplot, imported on first use; the import is recorded as a stage
+
+    backend (e.g. 'Agg') is selected before any figure is created; by
+    default batch and memory modes use Agg and interactive mode keeps
+    matplotlib's own choice.
+    """
+    if backend is None and output_mode() != 'interactive':
+        backend = 'Agg'
+    if 'matplotlib.pyplot' not in sys.modules:
+        with stage('import_pyplot', 'import'):
+            import matplotlib
+            if backend:
+                matplotlib.use(backend)
+            import matplotlib.pyplot
+    elif backend:
+        import matplotlib
+        matplotlib.use(backend)
+    return sys.modules['matplotlib.pyplot']
+
+
+def country_style(country, position=0):
+    """{'name', 'fmt', 'color'} of a country, by its position in the panel if it has no fixed style"""
+    if country in COUNTRY_STYLES:
+        return COUNTRY_STYLES[country]
+    return {'name': country, 'fmt': f'-{COUNTRY_MARKERS[position % len(COUNTRY_MARKERS)]}',
+            'color': COUNTRY_COLORS[position % len(COUNTRY_COLORS)]}
+
+
+def plotted_countries(values, countries):
+    """(position, country) of each country with any data in an (x, country) array
+
+    Countries whose values are all missing are left out of a chart, so
+    they get no line, bar or legend entry.
+    """
+    return [(position, country) for position, country in enumerate(countries)
+            if not np.isnan(values[:, position]).all()]
+
+
+def plot_countries(ax, periods, values, countries, label='{country}', **kwargs):
+    """One line per country with data; values is a (period, country) array
+
+    label is a template over {country} (the code) and {name} (the display
+    name), e.g. '{country} Government'. Returns the lines in country order.
+    """
+    lines = []
+    for position, country in plotted_countries(values, countries):
+        style = country_style(country, position)
+        lines += ax.plot(periods, values[:, position], style['fmt'], color=style['color'],
+                         label=label.format(country=country, name=style['name']), **kwargs)
+    return lines
+
+
+def bar_countries(ax, x, values, countries, label='{name}', colors=None, group_width=0.7, **kwargs):
+    """Grouped bars, one per country with data at each x, centred on x; values is an (x, country) array
+
+    colors overrides the country colors, as {country: color}. Returns the
+    bar containers in country order.
+    """
+    drawn = plotted_countries(values, countries)
+    width = group_width / max(len(drawn), 1)
+    containers = []
+    for slot, (position, country) in enumerate(drawn):
+        style = country_style(country, position)
+        offset = (slot - (len(drawn) - 1) / 2) * width
+        containers.append(ax.bar(x + offset, values[:, position], width,
+                                 label=label.format(country=country, name=style['name']),
+                                 color=(colors or {}).get(country, style['color']), **kwargs))
+    return containers
+
+
+def export_path(output_file, fmt):
+    """File an export format is written to, e.g. chart.png -> chart.preview.png"""
+    output_file = Path(output_file)
+    return output_file.with_name(output_file.stem + EXPORT_FORMATS[fmt]['suffix'])
+
+
+def figure_params(figure, formats=DEFAULT_FORMATS, kwargs=None):
+    """Build-manifest parameters of a chart: the builder that draws it, its options and its exports
+
+    Every writer of a chart (the scripts and render_pool) fingerprints it
+    through this function, so a chart rendered by one is up to date for
+    the others.
+    """
+    return {'figure': figure, 'kwargs': dict(kwargs or {}), 'exports': [EXPORT_FORMATS[fmt] for fmt in formats]}
+
+
+def tight_bbox(fig, dpi):
+    """The bbox_inches='tight' box, computed once at dpi so every export can reuse it"""
+    import matplotlib
+
+    original_dpi = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+    finally:
+        fig.set_dpi(original_dpi)
+    return bbox.padded(matplotlib.rcParams['savefig.pad_inches'])
+
+
+def export_figure(fig, output_file, formats=DEFAULT_FORMATS, memory=None, bbox=None):
+    """Write a figure to several export targets from one layout pass
+
+    The tight bounding box is computed once (at the highest dpi requested)
+    and shared, so each target costs a single render; a bbox from an
+    earlier tight_bbox call skips the layout pass altogether. In memory mode (or
+    with memory=True) targets are BytesIO buffers instead of files. Returns
+    {format: {'output', 'bytes', 'seconds'}}, plus the layout pass time
+    under 'layout'.
+    """
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export formats {unknown}; expected some of {list(EXPORT_FORMATS)}")
+
+    start = time.perf_counter()
+    if bbox is None:
+        bbox = tight_bbox(fig, max(EXPORT_FORMATS[fmt]['dpi'] for fmt in formats))
+    report = {'layout': {'output': None, 'bytes': 0, 'seconds': time.perf_counter() - start}}
+    memory = in_memory() if memory is None else memory
+
+    for fmt in formats:
+        spec = EXPORT_FORMATS[fmt]
+        start = time.perf_counter()
+        if memory:
+            output = io.BytesIO()
+            fig.savefig(output, format=spec['format'], dpi=spec['dpi'], bbox_inches=bbox)
+            size = output.tell()
+            output.seek(0)
+        else:
+            output = export_path(output_file, fmt)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            fig.savefig(output, format=spec['format'], dpi=spec['dpi'], bbox_inches=bbox)
+            size = output.stat().st_size
+        report[fmt] = {'output': output, 'bytes': size, 'seconds': time.perf_counter() - start}
+    return report
+
+
+def print_export_report(report):
+    """Print the size and render time of each export"""
+    for fmt, entry in report.items():
+        if fmt == 'layout':
+            print(f"  {'layout pass':<10} {'':>10} {entry['seconds']:7.3f}s")
+            continue
+        name = entry['output'].name if isinstance(entry['output'], Path) else 'in memory'
+        print(f"  {fmt:<10} {entry['bytes'] / 1024:8,.0f}KB {entry['seconds']:7.3f}s  {name}")
+
+
+@memoize
+def render_figure(builder, args, fmt='png'):
+    """Image bytes of builder(*args) in one export format, memoized on the builder, data and format"""
+    fig = builder(*args)
+    try:
+        return export_figure(fig, f"{builder.__name__}.png", (fmt,), memory=True)[fmt]['output'].getvalue()
+    finally:
+        pyplot().close(fig)
+
+
+def finish_figure(fig, output_file, formats=DEFAULT_FORMATS):
+    """Export a figure per the output mode, show it if interactive, and close it
+
+    Returns the first format's output: its path, or a BytesIO in memory
+    mode (export_figure returns every target). Sizes and render times are
+    printed when exporting anything beyond the default PNG. The figure is
+    always closed, so long runs do not accumulate open figures.
+    """
+    plt = pyplot()
+
+    try:
+        report = export_figure(fig, output_file, formats)
+        if output_mode() == 'interactive':
+            plt.show()
+    finally:
+        plt.close(fig)
+
+    if tuple(formats) != DEFAULT_FORMATS:
+        print_export_report(report)
+    return report[formats[0]]['output']
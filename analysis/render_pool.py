@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Parallel Chart Rendering
+Renders independent figures and panels across a process pool with the Agg backend
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_manifest import MANIFEST_PATH, BuildManifest, fingerprint
+from plotting import DEFAULT_FORMATS, export_figure, export_path, figure_params
+from shared_data import SharedStore, attach
+
+ANALYSIS_DIR = Path(__file__).parent
+OUTPUT_DIR = ANALYSIS_DIR / "visualizations"
+
+
+class RenderJob:
+    """One figure to render: a builder in an analysis script plus its inputs
+
+    The builder is named rather than passed as a function so jobs can be
+    sent to worker processes regardless of how the scripts were imported.
+    """
+
+    def __init__(self, script, builder, args, output, formats=DEFAULT_FORMATS, kwargs=None):
+        self.script = script
+        self.builder = builder
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.output = Path(output)
+        self.formats = tuple(formats)
+
+    @property
+    def targets(self):
+        """Every file the job writes, one per export format"""
+        return [export_path(self.output, fmt) for fmt in self.formats]
+
+    def shared(self, store):
+        """This job with its inputs published to shared memory, for sending to workers"""
+        return RenderJob(self.script, self.builder, store.publish(self.args), self.output, self.formats, self.kwargs)
+
+
+def init_worker():
+    """Select the non-interactive backend before pyplot is imported"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_job(job):
+    """Build, export and close one figure; returns (output path, seconds)
+
+    Figures are exported exactly as the scripts export them, so either
+    writer's output satisfies the other's manifest entry.
+    """
+    init_worker()
+    import matplotlib.pyplot as plt
+    from orchestrator import import_script
+
+    start = time.perf_counter()
+    builder = getattr(import_script(job.script), job.builder)
+    fig = builder(*attach(job.args), **job.kwargs)
+    export_figure(fig, job.output, job.formats, memory=False)
+    plt.close(fig)
+    return job.output, time.perf_counter() - start
+
+
+def job_fingerprint(job):
+    """Manifest fingerprint of a job, the same one the scripts record for the chart"""
+    return fingerprint(job.args, figure_params(job.builder, job.formats, job.kwargs))
+
+
+def render_all(jobs, workers=None, force=False, manifest_path=MANIFEST_PATH):
+    """Render stale jobs across a process pool
+
+    Returns [(output path, seconds)] in job order; seconds is None for
+    outputs that were already up to date and so were not re-rendered.
+    Each distinct input table is published to shared memory once, however
+    many jobs use it.
+    """
+    jobs = list(jobs)
+    manifest = BuildManifest(manifest_path)
+    records = [job_fingerprint(job) for job in jobs]
+    stale = [i for i, (job, record) in enumerate(zip(jobs, records))
+             if force or not all(manifest.is_fresh(target, record) for target in job.targets)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(stale) <= 1:
+        rendered = [render_job(jobs[i]) for i in stale]
+    else:
+        with SharedStore() as store, ProcessPoolExecutor(max_workers=min(workers, len(stale)),
+                                                         initializer=init_worker) as pool:
+            rendered = list(pool.map(render_job, [jobs[i].shared(store) for i in stale]))
+
+    # Only the parent process writes the manifest, so workers never race on it
+    results = [(job.output, None) for job in jobs]
+    for i, result in zip(stale, rendered):
+        results[i] = result
+        for target in jobs[i].targets:
+            manifest.record(target, records[i])
+    if stale:
+        manifest.save()
+    return results
+
+
+def suite_jobs(us_data, china_data, gov_data, private_data, output_dir=OUTPUT_DIR):
+    """The three figures saved by the analysis scripts"""
+    return [
+        RenderJob("patent-trends-analysis.py", 'build_comparison_figure', (us_data, china_data),
+                  output_dir / "patent_trends_comparison.png"),
+        RenderJob("funding-comparison.py", 'build_funding_analysis_figure', (gov_data, private_data),
+                  output_dir / "funding_analysis_comprehensive.png"),
+        RenderJob("funding-comparison.py", 'build_investment_strategy_figure', (gov_data, private_data),
+                  output_dir / "investment_strategy_comparison.png"),
+    ]
+
+
+def panel_jobs(us_data, china_data, gov_data, private_data, output_dir=OUTPUT_DIR / "panels"):
+    """Every panel of the grid figures, plus per-category trends, as separate figures"""
+    from orchestrator import import_script
+    patents = import_script("patent-trends-analysis.py")
+    funding = import_script("funding-comparison.py")
+
+    jobs = []
+    for panel in patents.PATENT_PANELS:
+        jobs.append(RenderJob("patent-trends-analysis.py", 'build_patent_panel_figure', (us_data, china_data),
+                              output_dir / f"patents_{panel}.png", kwargs={'panel': panel}))
+    for panel in funding.FUNDING_PANELS:
+        jobs.append(RenderJob("funding-comparison.py", 'build_funding_panel_figure', (gov_data, private_data),
+                              output_dir / f"funding_{panel}.png", kwargs={'panel': panel}))
+    for category in ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']:
+        jobs.append(RenderJob("patent-trends-analysis.py", 'build_category_trend_figure', (us_data, china_data),
+                              output_dir / f"patents_{category.lower()}_trend.png", kwargs={'category': category}))
+    return jobs
+
+
+def print_render_report(results, total_seconds):
+    """Print per-figure render times"""
+    print(f"\n{'='*60}")
+    print("RENDER TIMES")
+    print('='*60)
+    for output, seconds in results:
+        if seconds is None:
+            print(f"  {output.name:<45} up to date")
+        else:
+            print(f"  {output.name:<45} {seconds:7.3f}s")
+    print(f"  {'total (wall)':<45} {total_seconds:7.3f}s")
+
+
+def main(argv=None):
+    """Render the suite's figures (and optionally every panel) in parallel"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=None, help='process count (default: all cores)')
+    parser.add_argument('--panels', action='store_true', help='also render each panel as its own figure')
+    parser.add_argument('--force', action='store_true', help='re-render even if outputs are up to date')
+    args = parser.parse_args(argv)
+
+    from data_access import load_funding_tables, load_patent_tables
+    us_data, china_data = load_patent_tables()
+    gov_data, private_data = load_funding_tables()
+
+    jobs = suite_jobs(us_data, china_data, gov_data, private_data)
+    if args.panels:
+        jobs += panel_jobs(us_data, china_data, gov_data, private_data)
+
+    start = time.perf_counter()
+    results = render_all(jobs, args.workers, force=args.force)
+    print_render_report(results, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
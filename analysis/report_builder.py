@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Report Builder
+Regenerates the data-driven sections of the Markdown reports from the computed metrics, rewriting only stale sections
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import string
+import sys
+import time
+from pathlib import Path
+
+from build_manifest import BuildManifest, fingerprint
+from instrumentation import stage
+
+ROOT = Path(__file__).parent.parent
+TEMPLATE_DIR = ROOT / "reports" / "templates"
+REPORT_MANIFEST = ROOT / "data" / ".cache" / "report-manifest.json"
+
+# A generated section sits between these markers; everything outside them is hand-written
+BLOCK = re.compile(r'(<!-- report:(?P<name>[\w-]+) -->\n)(?P<body>.*?)(<!-- /report:(?P=name) -->)', re.DOTALL)
+
+MONEY_SPEC = re.compile(r'^(?P<number>[^A-Za-z]*)(?P<unit>B|M|billion|million)$')
+MONEY_UNITS = {'B': (1000, 'B', '.1'), 'M': (1, 'M', ',.0'), 'billion': (1000, ' billion', '.1'),
+               'million': (1, ' million', ',.0')}
+
+# Panel category -> context name, e.g. us_gov[2024] or china_patents[2023]
+CONTEXT_NAMES = {
+    'Total_Patents': 'patents',
+    'Quantum_Computing': 'computing',
+    'Quantum_Communications': 'communications',
+    'Quantum_Sensing': 'sensing',
+    'Government': 'gov',
+    'Government_Cumulative': 'gov_cumulative',
+    'Private': 'private',
+    'Private_Share': 'private_share',
+}
+
+
+class Section:
+    """A generated block of a report: its template in TEMPLATE_DIR and the datasets its figures come from"""
+
+    def __init__(self, report, name, datasets):
+        self.report = ROOT / report
+        self.name = name
+        self.datasets = list(datasets)
+
+    @property
+    def template_path(self):
+        return TEMPLATE_DIR / f"{self.name}.md"
+
+
+SECTIONS = [
+    Section("reports/executive-summary.md", 'summary-funding-models', ['funding']),
+    Section("reports/executive-summary.md", 'summary-advantages', ['funding']),
+    Section("reports/detailed-findings.md", 'findings-patent-history', ['patents']),
+    Section("reports/detailed-findings.md", 'findings-government', ['funding']),
+    Section("reports/detailed-findings.md", 'findings-private', ['funding']),
+    Section("reports/detailed-findings.md", 'findings-strategy', ['funding']),
+    Section("data/patents/patent-analysis-summary.md", 'patent-dataset-figures', ['patents']),
+    Section("data/funding/funding-trends-analysis.md", 'funding-government', ['funding']),
+    Section("data/funding/funding-trends-analysis.md", 'funding-private', ['funding']),
+    Section("data/funding/funding-trends-analysis.md", 'funding-strategy', ['funding']),
+]
+
+
+class ReportFormatter(string.Formatter):
+    """str.format with money specs for values in millions of USD
+
+    '{x:B}' -> $6.0B, '{x:M}' -> $482M, '{x:billion}' -> $6.0 billion,
+    '{x:million}' -> $482 million; a precision may be given, as in
+    '{x:.3billion}'. Other specs are the usual format specs.
+    """
+
+    def format_field(self, value, format_spec):
+        match = MONEY_SPEC.match(format_spec)
+        if not match:
+            return super().format_field(value, format_spec)
+        scale, suffix, default = MONEY_UNITS[match['unit']]
+        number = match['number'] or default
+        return f"${value / scale:{number}f}{suffix}"
+
+
+FORMATTER = ReportFormatter()
+
+
+def series_context(panel):
+    """{country}_{category}: {year: value} for every series of a panel"""
+    context = {}
+    for country in panel.countries:
+        for category in panel.categories:
+            values = panel.series(category, [country])[:, 0]
+            context[f"{country.lower()}_{CONTEXT_NAMES.get(category, category.lower())}"] = dict(
+                zip(panel.years.tolist(), values.tolist()))
+    return context
+
+
+def patent_context(us_data, china_data):
+    """Template fields from the patent tables and the metrics calculate_growth_rates reports"""
+    from metrics import build_panel
+    from orchestrator import import_script
+    from uncertainty import interval_text
+
+    metrics = import_script("patent-trends-analysis.py").growth_metrics(us_data, china_data)
+    panel = build_panel(patents=(us_data, china_data))
+    ci = metrics['ci']
+    lead = metrics['lead_2023']
+    return {
+        **series_context(panel),
+        'first_year': int(panel.years[0]),
+        'last_year': int(panel.years[-1]),
+        'us_cagr': metrics['us_cagr'],
+        'china_cagr': metrics['china_cagr'],
+        'cagr_ratio': metrics['china_cagr'] / metrics['us_cagr'],
+        'us_cagr_ci': interval_text(ci.loc['us_cagr'], '.1%'),
+        'china_cagr_ci': interval_text(ci.loc['china_cagr'], '.1%'),
+        'cagr_ratio_ci': interval_text(ci.loc['cagr_ratio'], suffix='x'),
+        **{f"lead_{CONTEXT_NAMES[category]}": lead[category] for category in lead.index},
+        **{f"lead_{CONTEXT_NAMES[category]}_ci": interval_text(ci.loc[f'lead_{category}'], suffix='x')
+           for category in ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']},
+    }
+
+
+def funding_context(gov_data, private_data):
+    """Template fields from the funding tables and the metrics calculate_funding_metrics reports"""
+    from metrics import build_panel
+    from orchestrator import import_script
+
+    metrics = import_script("funding-comparison.py").funding_metrics(gov_data, private_data)
+    panel = build_panel(funding=(gov_data, private_data))
+    final, combined, strategy = metrics['final'], metrics['combined'], metrics['strategy']
+    us_gov = panel.series('Government', ['US'])[:, 0]
+    shares = panel.series('Private_Share')
+    global_private = dict(zip(private_data['Year'].tolist(), private_data['Global_Private_Total'].tolist()))
+    return {
+        **series_context(panel),
+        'first_year': int(panel.years[0]),
+        'last_year': int(panel.years[-1]),
+        'global_private': global_private,
+        'global_private_total': global_private[int(panel.years[-1])],
+        'us_gov_total': final.at['US', 'Government_Cumulative'],
+        'china_gov_total': final.at['China', 'Government_Cumulative'],
+        'us_private_total': final.at['US', 'Private'],
+        'china_private_total': final.at['China', 'Private'],
+        'us_total': combined['US'],
+        'china_total': combined['China'],
+        'total_gap': combined['China'] - combined['US'],
+        'total_gap_ratio': combined['China'] / combined['US'] - 1,
+        'gov_ratio': final.at['China', 'Government_Cumulative'] / final.at['US', 'Government_Cumulative'],
+        'private_ratio': final.at['US', 'Private'] / final.at['China', 'Private'],
+        'us_gov_strategy': strategy.at['US', 'Government_Cumulative'],
+        'china_gov_strategy': strategy.at['China', 'Government_Cumulative'],
+        'us_gov_peak': us_gov.max(),
+        'us_gov_peak_year': int(panel.years[us_gov.argmax()]),
+        'us_gov_cagr': metrics['cagr'].at['US', 'Government'],
+        'china_gov_cagr': metrics['cagr'].at['China', 'Government'],
+        'us_share_final': shares[-1, panel.country_pos['US']],
+        'china_share_final': shares[-1, panel.country_pos['China']],
+        'us_share_min': shares[:, panel.country_pos['US']].min(),
+        'us_share_max': shares[:, panel.country_pos['US']].max(),
+        'china_share_min': shares[:, panel.country_pos['China']].min(),
+        'china_share_max': shares[:, panel.country_pos['China']].max(),
+    }
+
+
+CONTEXTS = {'patents': patent_context, 'funding': funding_context}
+
+
+def load_tables():
+    """The tables behind each dataset a section can depend on"""
+    from data_access import load_funding_tables, load_patent_tables
+    return {'patents': load_patent_tables(), 'funding': load_funding_tables()}
+
+
+def digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def find_blocks(text, report):
+    """{section name: match} of the generated blocks in a report's text"""
+    blocks = {}
+    for match in BLOCK.finditer(text):
+        if match['name'] in blocks:
+            raise ValueError(f"{report}: section {match['name']!r} appears twice")
+        blocks[match['name']] = match
+    return blocks
+
+
+def write_atomic(path, text):
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_text(text)
+    tmp.replace(path)
+
+
+@stage('build_reports', 'transform')
+def build_reports(sections=SECTIONS, force=False, manifest_path=REPORT_MANIFEST, tables=None):
+    """Regenerate the sections whose data, template or analysis code changed since they were written
+
+    A section is also regenerated if its block was edited by hand. Metrics
+    are computed only for datasets some stale section depends on, and each
+    report is rewritten only if one of its blocks actually changed.
+    Returns {section name: 'up to date' | 'unchanged' | 'rewritten'}.
+    """
+    tables = tables or load_tables()
+    manifest = BuildManifest(manifest_path)
+    texts = {section.report: section.report.read_text() for section in sections}
+
+    status, stale = {}, []
+    for section in sections:
+        blocks = find_blocks(texts[section.report], section.report)
+        if section.name not in blocks:
+            raise ValueError(f"{section.report}: no <!-- report:{section.name} --> block")
+        template = section.template_path.read_text()
+        inputs = [table for dataset in section.datasets for table in tables[dataset]]
+        record = fingerprint(inputs, {'section': section.name, 'template': template})
+        key = f"{manifest.key(section.report)}#{section.name}"
+        if not force and manifest.entries.get(key) == {**record, 'output': digest(blocks[section.name]['body'])}:
+            status[section.name] = 'up to date'
+        else:
+            stale.append((section, template, record, key))
+
+    needed = {dataset for section, *_ in stale for dataset in section.datasets}
+    contexts = {dataset: CONTEXTS[dataset](*tables[dataset]) for dataset in sorted(needed)}
+
+    for section, template, record, key in stale:
+        context = {}
+        for dataset in section.datasets:
+            context.update(contexts[dataset])
+        body = FORMATTER.format(template, **context)
+        text = texts[section.report]
+        match = find_blocks(text, section.report)[section.name]
+        if match['body'] == body:
+            status[section.name] = 'unchanged'
+        else:
+            texts[section.report] = text[:match.start('body')] + body + text[match.end('body'):]
+            status[section.name] = 'rewritten'
+        manifest.record(key, {**record, 'output': digest(body)})
+
+    for report in {section.report for section, *_ in stale if status[section.name] == 'rewritten'}:
+        write_atomic(report, texts[report])
+    if stale:
+        manifest.save()
+    return status
+
+
+def main(argv=None):
+    """Refresh the generated report sections and print what changed"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='regenerate every section')
+    parser.add_argument('--check', action='store_true',
+                        help='regenerate every section and exit with status 1 if any text changed (for CI)')
+    args = parser.parse_args(argv)
+
+    # A check must not trust the manifest: a stale entry that still matches would hide drift
+    start = time.perf_counter()
+    status = build_reports(force=args.force or args.check)
+    for section in SECTIONS:
+        label = f"{section.report.relative_to(ROOT)}#{section.name}"
+        print(f"  {label:<70} {status[section.name]}")
+    print(f"  {'total':<70} {time.perf_counter() - start:.3f}s")
+
+    if args.check and any(state == 'rewritten' for state in status.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,21 @@ Master script to run all quantum technology analyses
 Executes patent trends and funding comparison scripts
 """
 
+import argparse
+import multiprocessing
+import os
 import sys
+import tempfile
+import time
 from pathlib import Path
 import subprocess
 
-def run_script(script_name):
+import instrumentation
+from plotting import MODE_ENV
+
+DEFAULT_REPORT = Path(__file__).parent / "run_report.json"
+
+def run_script(script_name, env=None, script_args=()):
     """Run a Python script and handle errors"""
     script_path = Path(__file__).parent / script_name
     
@@ -16,9 +26,13 @@ def run_script(script_name):
     print(f"Running {script_name}")
     print('='*60)
     
+    # Output is captured, so charts are saved headlessly rather than shown
+    env = dict(env or os.environ)
+    env.setdefault(MODE_ENV, 'batch')
+    
     try:
-        result = subprocess.run([sys.executable, str(script_path)], 
-                              capture_output=True, text=True, check=True)
+        result = subprocess.run([sys.executable, str(script_path), *script_args], 
+                              capture_output=True, text=True, check=True, env=env)
         print(result.stdout)
         if result.stderr:
             print("Warnings/Errors:", result.stderr)
@@ -35,29 +49,111 @@ def run_script(script_name):
     
     return True
 
-def main():
+def run_in_process(workers, executor, stats_only=False, start_method=None):
+    """Run all analyses in this interpreter through the orchestrator"""
+    import orchestrator
+    
+    try:
+        orchestrator.main(workers=workers, executor=executor, stats_only=stats_only, start_method=start_method)
+    except Exception as e:
+        print(f"❌ Error in in-process run: {e}")
+        return False
+    
+    return True
+
+def instrumentation_env(report_file, profile=False, trace_memory=False):
+    """Environment that makes a script subprocess write its stage records to report_file"""
+    env = dict(os.environ)
+    env[instrumentation.REPORT_ENV] = str(report_file)
+    if profile:
+        env[instrumentation.PROFILE_ENV] = '1'
+    if trace_memory:
+        env[instrumentation.MEMORY_ENV] = '1'
+    return env
+
+def run_scripts(scripts, profile=False, trace_memory=False, script_args=()):
+    """Run each script in a subprocess and gather their stage records and profiles"""
+    success_count = 0
+    stage_records, profiles = [], {}
+    
+    with tempfile.TemporaryDirectory() as report_dir:
+        for script in scripts:
+            report_file = Path(report_dir) / f"{Path(script).stem}.json"
+            if run_script(script, instrumentation_env(report_file, profile, trace_memory), script_args):
+                success_count += 1
+            
+            # Failed scripts still report the stages they got through
+            if report_file.exists():
+                records, profile_rows = instrumentation.read_report(report_file)
+                stage_records.extend(dict(record, script=script) for record in records)
+                if profile_rows:
+                    profiles[script] = profile_rows
+    
+    return success_count, stage_records, profiles
+
+def main(argv=None):
     """Run all analysis scripts"""
+    parser = argparse.ArgumentParser(description="Run the quantum technology analysis suite")
+    parser.add_argument('--in-process', action='store_true',
+                        help='import the analyses as modules and run them as one dependency graph')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='pool size for independent steps (with --in-process)')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='pool type for independent steps (with --in-process)')
+    parser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(), default=None,
+                        help='how process workers start (with --executor process; default: the platform\'s)')
+    parser.add_argument('--stats-only', action='store_true',
+                        help='compute and print statistics only, without importing matplotlib')
+    parser.add_argument('--report', type=Path, default=DEFAULT_REPORT,
+                        help='run report path; .csv for stage rows only, otherwise JSON')
+    parser.add_argument('--profile', action='store_true',
+                        help='run under cProfile and add the top functions to the report')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='record each stage\'s peak traced allocation with tracemalloc')
+    args = parser.parse_args(argv)
+    
     print("🚀 Starting Quantum Technology Analysis Suite")
     print("Analyzing US vs China patent and funding competition (2014-2024)")
+    start = time.perf_counter()
     
-    scripts = [
-        "patent-trends-analysis.py",
-        "funding-comparison.py"
-    ]
+    if args.in_process:
+        instrumentation.configure(profile=args.profile, trace_memory=args.trace_memory)
+        success_count = int(run_in_process(args.workers, args.executor, args.stats_only,
+                                                 args.start_method))
+        total_scripts = 1
+        stage_records = instrumentation.records()
+        profile_rows = instrumentation.profile_summary()
+        profiles = {'in-process': profile_rows} if profile_rows else {}
+    else:
+        scripts = [
+            "patent-trends-analysis.py",
+            "funding-comparison.py"
+        ]
+        total_scripts = len(scripts)
+        script_args = ['--stats-only'] if args.stats_only else []
+        success_count, stage_records, profiles = run_scripts(scripts, args.profile, args.trace_memory, script_args)
     
-    success_count = 0
-    total_scripts = len(scripts)
+    exit_code = report_completion(success_count, total_scripts, charts=not args.stats_only)
     
-    for script in scripts:
-        if run_script(script):
-            success_count += 1
+    total_seconds = time.perf_counter() - start
+    instrumentation.print_summary(stage_records, total_seconds)
+    run_info = {'mode': 'in-process' if args.in_process else 'subprocess',
+                'succeeded': success_count, 'total': total_scripts, 'total_seconds': total_seconds}
+    report_file = instrumentation.write_report(args.report, stage_records, profiles, run_info)
+    print(f"\n📄 Run report written to: {report_file}")
     
+    return exit_code
+
+def report_completion(success_count, total_scripts, charts=True):
+    """Print the closing summary and return the exit code"""
     print(f"\n{'='*60}")
     print("ANALYSIS COMPLETE")
     print('='*60)
     print(f"✅ {success_count}/{total_scripts} scripts completed successfully")
     
-    if success_count == total_scripts:
+    if success_count == total_scripts and not charts:
+        print("🎉 All analyses completed (statistics only, no charts generated).")
+    elif success_count == total_scripts:
         print("🎉 All analyses completed! Check the visualizations folder for charts.")
         print("\n📊 Generated files:")
         print("  - patent_trends_comparison.png")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Shared Datasets
+Publishes loaded tables and panels once into shared memory so pool workers attach read-only views instead of unpickling copies
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from metrics import Panel
+
+# Arrays are laid out in a segment at offsets aligned to a cache line
+ALIGNMENT = 64
+
+# Segments this process has attached to, by name: (SharedMemory, rebuilt object).
+# Kept open for the life of the worker so repeated tasks attach in O(1)
+ATTACHED = {}
+
+# Held while resource tracker registration is switched off for an attach
+REGISTER_LOCK = threading.Lock()
+
+
+class SharedHandle:
+    """Picklable reference to an object published in a shared memory segment
+
+    spec describes how to rebuild the object around views of the segment;
+    only this description (names, shapes, offsets and any non-numeric
+    columns) is pickled to workers, never the numeric data.
+    """
+
+    __slots__ = ('segment', 'spec')
+
+    def __init__(self, segment, spec):
+        self.segment = segment
+        self.spec = spec
+
+    def __getstate__(self):
+        return self.segment, self.spec
+
+    def __setstate__(self, state):
+        self.segment, self.spec = state
+
+    def __repr__(self):
+        return f"SharedHandle({self.segment!r}, {self.spec['kind']!r})"
+
+
+def is_shareable(array):
+    """True for arrays that can be viewed straight from a byte buffer (numbers, bools, datetimes)"""
+    return isinstance(array, np.ndarray) and array.dtype.kind in 'biufcmM'
+
+
+def numeric_arrays(obj):
+    """The arrays of a DataFrame, Panel or ndarray that go into shared memory, by key"""
+    if isinstance(obj, np.ndarray):
+        return {'array': obj} if is_shareable(obj) else {}
+    if isinstance(obj, Panel):
+        return {'values': obj.values}
+    arrays = {}
+    for i, (_, column) in enumerate(obj.items()):
+        values = column.to_numpy() if isinstance(column.dtype, np.dtype) else None
+        if is_shareable(values):
+            arrays[i] = values
+    return arrays
+
+
+def layout(arrays):
+    """{key: offset} for arrays packed at aligned offsets, and the total size in bytes"""
+    offsets, size = {}, 0
+    for key, array in arrays.items():
+        offsets[key] = size
+        size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    return offsets, max(size, 1)
+
+
+def view(buffer, entry):
+    """Read-only ndarray over a segment from an (offset, shape, dtype) entry"""
+    offset, shape, dtype = entry
+    array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+    array.flags.writeable = False
+    return array
+
+
+def frame_spec(data, arrays, entries):
+    """Spec of a DataFrame: shared columns by entry, others (strings, extension types) inline"""
+    columns = []
+    for i, (name, column) in enumerate(data.items()):
+        columns.append((name, ('shared', entries[i]) if i in arrays else ('inline', column)))
+    return {'kind': 'frame', 'columns': columns, 'index': data.index}
+
+
+def rebuild(spec, buffer):
+    """The object a spec describes, around views of a segment's buffer"""
+    if spec['kind'] == 'array':
+        return view(buffer, spec['array'])
+    if spec['kind'] == 'panel':
+        return Panel(view(buffer, spec['values']), spec['years'], spec['countries'], spec['categories'],
+                     spec['freq'])
+    columns = {}
+    for name, (where, value) in spec['columns']:
+        columns[name] = view(buffer, value) if where == 'shared' else value.to_numpy()
+    return pd.DataFrame(columns, index=spec['index'], copy=False)
+
+
+class SharedStore:
+    """Owner of the shared memory segments published by one process
+
+    publish() copies each DataFrame, Panel or numeric ndarray into its own
+    segment once (an object published twice reuses its segment) and
+    returns handles in place of them, inside any tuples, lists and dicts.
+    Segments are unlinked on close(); use the store as a context manager
+    around the pool that reads them.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.published = {}  # id(obj) -> (obj, handle); obj is kept alive so ids stay unique
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def publish(self, obj):
+        """obj with every DataFrame, Panel and numeric ndarray replaced by a SharedHandle"""
+        if isinstance(obj, tuple):
+            return tuple(self.publish(item) for item in obj)
+        if isinstance(obj, list):
+            return [self.publish(item) for item in obj]
+        if isinstance(obj, dict):
+            return {key: self.publish(value) for key, value in obj.items()}
+        if not isinstance(obj, (pd.DataFrame, Panel, np.ndarray)):
+            return obj
+        if id(obj) in self.published:
+            return self.published[id(obj)][1]
+
+        arrays = numeric_arrays(obj)
+        if not arrays:
+            return obj
+        offsets, size = layout(arrays)
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        self.segments.append(segment)
+
+        entries = {}
+        for key, array in arrays.items():
+            entries[key] = (offsets[key], array.shape, array.dtype.str)
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf, offset=offsets[key])[...] = array
+
+        if isinstance(obj, np.ndarray):
+            spec = {'kind': 'array', 'array': entries['array']}
+        elif isinstance(obj, Panel):
+            spec = {'kind': 'panel', 'values': entries['values'], 'years': list(obj.years),
+                    'countries': obj.countries, 'categories': obj.categories, 'freq': obj.freq}
+        else:
+            spec = frame_spec(obj, arrays, entries)
+
+        handle = SharedHandle(segment.name, spec)
+        self.published[id(obj)] = (obj, handle)
+        return handle
+
+    @property
+    def nbytes(self):
+        return sum(segment.size for segment in self.segments)
+
+    def close(self):
+        """Release and unlink every segment; workers' existing views stay valid until they exit"""
+        for segment in self.segments:
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass  # already unlinked, e.g. by a resource tracker cleaning up after a crashed worker
+        self.segments = []
+        self.published = {}
+
+
+def attach_segment(name):
+    """Open an existing segment without taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 attaching registers the segment with this process's resource
+    # tracker, which may be the publisher's (shared by fork or spawn) or one of
+    # the worker's own that would unlink the segment when the worker exits.
+    # Registration is skipped for the attach, as track=False does, so the
+    # publisher's registration is the only one whichever way workers started
+    with REGISTER_LOCK:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def attach(obj):
+    """obj with every SharedHandle replaced by its object, as read-only views of shared memory
+
+    Anything else is returned unchanged, so task functions can call this on
+    their arguments whether or not the caller published them.
+    """
+    if isinstance(obj, SharedHandle):
+        if obj.segment not in ATTACHED:
+            segment = attach_segment(obj.segment)
+            ATTACHED[obj.segment] = (segment, rebuild(obj.spec, segment.buf))
+        return ATTACHED[obj.segment][1]
+    if isinstance(obj, tuple):
+        return tuple(attach(item) for item in obj)
+    if isinstance(obj, list):
+        return [attach(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: attach(value) for key, value in obj.items()}
+    return obj
+
+
+def probe(handles):
+    """Attach in a worker: (pid, attach seconds, bytes of numeric data viewed rather than copied)"""
+    start = time.perf_counter()
+    objects = attach(handles)
+    seconds = time.perf_counter() - start
+
+    shared = 0
+    for obj in objects:
+        arrays = numeric_arrays(obj)
+        shared += sum(a.nbytes for a in arrays.values() if not a.flags.owndata and not a.flags.writeable)
+    return os.getpid(), seconds, shared
+
+
+def main(argv=None):
+    """Publish the loaded tables and panels and time how long pool workers take to attach"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=None, help='process count (default: all cores)')
+    args = parser.parse_args(argv)
+
+    from data_access import load_funding_tables, load_patent_tables
+    from metrics import build_panel
+
+    patents, funding = load_patent_tables(), load_funding_tables()
+    objects = (*patents, *funding, build_panel(patents=patents), build_panel(funding=funding))
+    workers = args.workers or os.cpu_count() or 1
+
+    with SharedStore() as store:
+        start = time.perf_counter()
+        handles = store.publish(objects)
+        published = time.perf_counter() - start
+        print(f"Published {len(store.segments)} segments ({store.nbytes:,} bytes) in {published * 1000:.2f}ms")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for pid, seconds, shared in pool.map(probe, [handles] * workers):
+                print(f"  worker {pid}: attached in {seconds * 1000:.2f}ms, {shared:,} bytes viewed in place")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Headline Uncertainty
+Perturbation bootstrap confidence intervals for the headline ratios and CAGRs
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from metrics import PATENT_CATEGORIES
+from shared_data import SharedStore, attach
+
+DEFAULT_SAMPLES = 10_000
+DEFAULT_CONFIDENCE = 95
+
+# Relative (log-scale) measurement error of each category: patent counts
+# depend on classification queries, private funding is largely estimated
+# from disclosed rounds, government budgets are published figures
+RELATIVE_ERROR = {
+    **{category: 0.10 for category in PATENT_CATEGORIES},
+    'Government': 0.05,
+    'Government_Cumulative': 0.05,
+    'Private': 0.15,
+    'Private_Share': 0.15,
+}
+
+# Share of patents already published for years inside the ~18-month
+# publication delay. Estimates and intervals describe the counts as
+# published; each statistic is also reported with these years' counts
+# scaled up by the middle of their range, so the shift is shown on its own
+PUBLICATION_COMPLETENESS = {2023: (0.85, 1.0), 2024: (0.5, 0.8)}
+
+# Relative (log-scale) error of converting a year's funding to USD at the
+# annual average exchange rate (reports/methodology.md, "Exchange Rate
+# Volatility"). One draw per country and year applies to all of that year's
+# funding; countries reporting in USD have no conversion error
+FX_ERROR = 0.03
+FX_CATEGORIES = ['Government', 'Private']
+USD_COUNTRIES = ['US']
+
+# Bootstrap samples drawn per task
+SHARD_SAMPLES = 5000
+
+
+class Statistic:
+    """A headline figure as a function of the panel values
+
+    kind is 'ratio' (numerator / denominator country in one period),
+    'cagr' (one country between two periods) or 'cagr_ratio' (numerator
+    CAGR / denominator CAGR). categories may be a single category or a
+    tuple summed together, e.g. ('Government_Cumulative', 'Private').
+    """
+
+    def __init__(self, label, kind, categories, numerator, denominator=None, start=None, end=None):
+        self.label = label
+        self.kind = kind
+        self.categories = (categories,) if isinstance(categories, str) else tuple(categories)
+        self.numerator = numerator
+        self.denominator = denominator
+        self.start = start
+        self.end = end
+
+    def cell(self, panel, values, country, period):
+        """(samples,) values of the summed categories for one country and period"""
+        columns = [panel.category_pos[category] for category in self.categories]
+        return values[:, panel.year_index(period), panel.country_pos[country]][:, columns].sum(axis=-1)
+
+    def cagr(self, panel, values, country):
+        ratio = self.cell(panel, values, country, self.end) / self.cell(panel, values, country, self.start)
+        return ratio ** (1 / panel.years_between(self.start, self.end)) - 1
+
+    def evaluate(self, panel, values):
+        """The statistic for every sample of a (samples, period, country, category) array"""
+        if self.kind == 'ratio':
+            return (self.cell(panel, values, self.numerator, self.end)
+                    / self.cell(panel, values, self.denominator, self.end))
+        if self.kind == 'cagr':
+            return self.cagr(panel, values, self.numerator)
+        if self.kind == 'cagr_ratio':
+            return self.cagr(panel, values, self.numerator) / self.cagr(panel, values, self.denominator)
+        raise ValueError(f"Unknown statistic kind {self.kind!r}")
+
+
+def fx_noise(panel, samples, rng):
+    """(samples, period, country, category) log errors from currency conversion
+
+    Annual flows get the year's draw. Government_Cumulative is converted
+    year by year too, so it gets the log of its converted running total
+    over the reported one.
+    """
+    noise = np.zeros((samples,) + panel.values.shape)
+    converted = ~np.isin(panel.countries, USD_COUNTRIES)
+    if FX_ERROR <= 0 or not converted.any() or not set(FX_CATEGORIES) & set(panel.categories):
+        return noise
+
+    fx = rng.standard_normal((samples, len(panel.years), len(panel.countries))) * FX_ERROR * converted
+    for category in FX_CATEGORIES:
+        if category in panel.category_pos:
+            noise[..., panel.category_pos[category]] = fx
+    if 'Government' in panel.category_pos and 'Government_Cumulative' in panel.category_pos:
+        flows = panel.values[:, :, panel.category_pos['Government']]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            noise[..., panel.category_pos['Government_Cumulative']] = (
+                np.log(np.cumsum(flows * np.exp(fx), axis=1)) - np.log(np.cumsum(flows, axis=0)))
+    return noise
+
+
+def perturb(panel, samples, rng):
+    """(samples, period, country, category) draws of the panel values under the measurement error model"""
+    sigma = np.array([RELATIVE_ERROR.get(category, 0.0) for category in panel.categories])
+    noise = rng.standard_normal((samples,) + panel.values.shape) * sigma + fx_noise(panel, samples, rng)
+    return panel.values * np.exp(noise)
+
+
+def completeness(panel):
+    """(period, country, category) share of each value already published: 1 outside PUBLICATION_COMPLETENESS"""
+    shares = np.ones(panel.values.shape)
+    is_patent = np.isin(panel.categories, PATENT_CATEGORIES)
+    for i, period in enumerate(panel.years):
+        year = period if panel.freq == 'Y' else period.year
+        if year in PUBLICATION_COMPLETENESS:
+            shares[i][:, is_patent] = np.mean(PUBLICATION_COMPLETENESS[year])
+    return shares
+
+
+def sample_shard(panel, statistics, samples, seed):
+    """(statistic, samples) bootstrap values from one block of perturbed panels"""
+    panel = attach(panel)
+    values = perturb(panel, samples, np.random.default_rng(seed))
+    return np.stack([statistic.evaluate(panel, values) for statistic in statistics])
+
+
+def intervals(panel, statistics, samples=DEFAULT_SAMPLES, confidence=DEFAULT_CONFIDENCE, seed=0, workers=1):
+    """Point estimate and confidence interval of each statistic
+
+    All statistics share one batch of perturbed panels. Samples are drawn
+    in shards with child seeds of `seed`, so the result is the same for any
+    number of workers (workers=None uses one per CPU); workers read the
+    panel from shared memory. Returns a DataFrame indexed by label with
+    Estimate, Low and High columns for the values as published, so each
+    interval contains its estimate, and Adjusted, the estimate with the
+    years still inside the publication delay scaled up to completeness.
+    """
+    with stage('headline_intervals', 'metrics'):
+        counts = [min(SHARD_SAMPLES, samples - start) for start in range(0, samples, SHARD_SAMPLES)]
+        seeds = np.random.SeedSequence(seed).spawn(len(counts))
+
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(counts) <= 1:
+            shards = [sample_shard(panel, statistics, count, child) for count, child in zip(counts, seeds)]
+        else:
+            with SharedStore() as store, ProcessPoolExecutor(max_workers=min(workers, len(counts))) as pool:
+                shared = store.publish(panel)
+                shards = list(pool.map(sample_shard, [shared] * len(counts), [statistics] * len(counts),
+                                       counts, seeds))
+        draws = np.concatenate(shards, axis=1)
+
+        tail = (100 - confidence) / 2
+        low, high = np.nanpercentile(draws, [tail, 100 - tail], axis=1)
+        estimate = [statistic.evaluate(panel, panel.values[None])[0] for statistic in statistics]
+        complete = (panel.values / completeness(panel))[None]
+        adjusted = [statistic.evaluate(panel, complete)[0] for statistic in statistics]
+    return pd.DataFrame({'Estimate': estimate, 'Low': low, 'High': high, 'Adjusted': adjusted},
+                        index=[statistic.label for statistic in statistics])
+
+
+def growth_statistics(start, end):
+    """The patent CAGRs reported by calculate_growth_rates"""
+    return [
+        Statistic('us_cagr', 'cagr', 'Total_Patents', 'US', start=start, end=end),
+        Statistic('china_cagr', 'cagr', 'Total_Patents', 'China', start=start, end=end),
+        Statistic('cagr_ratio', 'cagr_ratio', 'Total_Patents', 'China', 'US', start=start, end=end),
+    ]
+
+
+def lead_statistics(year):
+    """China / US patent ratios per technology category, as reported by calculate_growth_rates"""
+    return [Statistic(f'lead_{category}', 'ratio', category, 'China', 'US', end=year)
+            for category in ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']]
+
+
+def funding_figures(panel, start, end, final):
+    """{comparison: per-country Series} of the funding figures compared across countries
+
+    Countries missing a figure are dropped from its Series, so they are
+    neither compared nor reported for it.
+    """
+    row = panel.at_year(final)
+    figures = {
+        'government': row['Government_Cumulative'],
+        'private': row['Private'],
+        'combined': row['Government_Cumulative'] + row['Private'],
+        'gov_cagr': panel.cagr(start, end)['Government'],
+    }
+    return {name: values.dropna() for name, values in figures.items()}
+
+
+def funding_leaders(panel, start, end, final):
+    """Country ahead on each funding comparison: {'government', 'private', 'combined', 'gov_cagr'}"""
+    return {name: values.idxmax() for name, values in funding_figures(panel, start, end, final).items()}
+
+
+def funding_statistics(panel, start, end, final):
+    """The investment ratios and government CAGRs reported by calculate_funding_metrics
+
+    Each ratio compares the leading country with every other country that
+    has the figure and is labelled by the other country, e.g.
+    'government_ratio_US'; each CAGR is labelled by its country, e.g.
+    'gov_cagr_China'.
+    """
+    figures = funding_figures(panel, start, end, final)
+    categories = {'government': 'Government_Cumulative', 'private': 'Private',
+                  'combined': ('Government_Cumulative', 'Private')}
+
+    statistics = []
+    for name, category in categories.items():
+        leader = figures[name].idxmax()
+        statistics += [Statistic(f'{name}_ratio_{other}', 'ratio', category, leader, other, end=final)
+                       for other in figures[name].index if other != leader]
+    leader = figures['gov_cagr'].idxmax()
+    for country in figures['gov_cagr'].index:
+        statistics.append(Statistic(f'gov_cagr_{country}', 'cagr', 'Government', country, start=start, end=end))
+    statistics += [Statistic(f'gov_cagr_ratio_{other}', 'cagr_ratio', 'Government', leader, other,
+                             start=start, end=end)
+                   for other in figures['gov_cagr'].index if other != leader]
+    return statistics
+
+
+def interval_text(row, fmt='.1f', suffix='', confidence=DEFAULT_CONFIDENCE):
+    """'95% CI low-high' for one row of intervals(), plus the publication-delay adjusted estimate where it differs"""
+    text = f"{confidence:g}% CI {row['Low']:{fmt}}-{row['High']:{fmt}}{suffix}"
+    if f"{row['Adjusted']:{fmt}}" != f"{row['Estimate']:{fmt}}":
+        text += f"; {row['Adjusted']:{fmt}}{suffix} with unpublished filings"
+    return text
+
+
+def main(argv=None):
+    """Print intervals for every headline statistic of both datasets"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=100_000, help='perturbed panels drawn')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE, help='interval width in percent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+
+    from data_access import load_funding_tables, load_patent_tables
+    from metrics import build_panel
+
+    patents = build_panel(patents=load_patent_tables())
+    funding = build_panel(funding=load_funding_tables())
+    first, last = funding.years[0], funding.years[-1]
+    jobs = [('PATENTS', patents, growth_statistics(2014, 2023) + lead_statistics(2023)),
+            ('FUNDING', funding, funding_statistics(funding, first, last, last))]
+
+    for title, panel, statistics in jobs:
+        start = time.perf_counter()
+        table = intervals(panel, statistics, args.samples, args.confidence, args.seed, args.workers)
+        print(f"=== {title} ({args.confidence:g}% INTERVALS, {args.samples:,} samples, "
+              f"{time.perf_counter() - start:.2f}s) ===\n")
+        print(f"{'Statistic':<28} {'Estimate':>10} {'Low':>10} {'High':>10} {'Adjusted':>10}")
+        for label, row in table.iterrows():
+            print(f"{label:<28} {row['Estimate']:>10.3f} {row['Low']:>10.3f} {row['High']:>10.3f} "
+                  f"{row['Adjusted']:>10.3f}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Dataset Validation
+Declarative integrity rules checked column-wise over whole tables at load time
+"""
+
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+
+# Offending rows quoted per rule in an error message; the count is always exact
+MAX_REPORTED = 5
+
+# Columns that identify a row in an error message, when the table has them
+KEY_COLUMNS = ['Date', 'Year']
+
+
+class ValidationError(ValueError):
+    """Raised when a table breaks one of its rules; violations holds every failure found"""
+
+    def __init__(self, name, violations):
+        self.name = name
+        self.violations = violations
+        lines = [f"{name}: {len(violations)} rule(s) failed"]
+        lines += [f"  {violation}" for violation in violations]
+        super().__init__('\n'.join(lines))
+
+
+class Violation:
+    """One rule failing on one table: the offending row positions and a few of them quoted"""
+
+    def __init__(self, rule, rows, examples):
+        self.rule = rule
+        self.rows = rows
+        self.examples = examples
+
+    def __str__(self):
+        if not len(self.rows):
+            return f"{self.rule}: {self.examples[0]}"
+        shown = '; '.join(self.examples)
+        more = f" (first {len(self.examples)} shown)" if len(self.rows) > len(self.examples) else ""
+        return f"{self.rule}: {len(self.rows):,} row(s) fail{more}: {shown}"
+
+
+class Rule:
+    """An invariant of a table, checked over whole columns in one array operation
+
+    kind is 'sum' (column equals the sum of inputs), 'running_sum' (column
+    equals the running total of inputs[0] in row order), 'ratio' (column is
+    within tolerance of scale * inputs[0] / inputs[1]), 'non_negative' or
+    'sorted' (never decreases). Column names may contain '{country}', in
+    which case the rule applies to every country whose column the table has.
+    """
+
+    def __init__(self, kind, column, inputs=(), tolerance=0.0, scale=1.0):
+        self.kind = kind
+        self.column = column
+        self.inputs = (inputs,) if isinstance(inputs, str) else tuple(inputs)
+        self.tolerance = tolerance
+        self.scale = scale
+
+    def __str__(self):
+        if self.kind == 'sum':
+            return f"{self.column} = {' + '.join(self.inputs)}"
+        if self.kind == 'running_sum':
+            return f"{self.column} = running sum of {self.inputs[0]}"
+        if self.kind == 'ratio':
+            scale = f"{self.scale:g} * " if self.scale != 1 else ""
+            return f"{self.column} ~ {scale}{self.inputs[0]} / {self.inputs[1]} (+/- {self.tolerance:g})"
+        return f"{self.column} {self.kind.replace('_', '-')}"
+
+    def bind(self, columns):
+        """The rule once per country for '{country}' templates, matched against a table's columns"""
+        if '{country}' not in self.column:
+            return [self]
+        pattern = re.compile(re.escape(self.column).replace(re.escape('{country}'), '(?P<country>.+)') + '$')
+        countries = [match['country'] for match in map(pattern.match, columns) if match]
+        return [Rule(self.kind, self.column.format(country=country),
+                     [column.format(country=country) for column in self.inputs], self.tolerance, self.scale)
+                for country in countries]
+
+    def expected(self, data):
+        """(rows,) values the column should hold, or None for kinds without an expected value"""
+        inputs = [data[column].to_numpy() for column in self.inputs]
+        if self.kind == 'sum':
+            return np.sum(inputs, axis=0)
+        if self.kind == 'running_sum':
+            return np.cumsum(inputs[0])
+        if self.kind == 'ratio':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return self.scale * inputs[0] / inputs[1]
+        if self.kind in ('non_negative', 'sorted'):
+            return None
+        raise ValueError(f"Unknown rule kind {self.kind!r}")
+
+    def failures(self, data):
+        """(rows,) mask of the rows breaking the rule, and the expected values if any"""
+        actual = data[self.column].to_numpy()
+        expected = self.expected(data)
+        if self.kind == 'non_negative':
+            return ~(actual >= 0), expected
+        if self.kind == 'sorted':
+            return np.concatenate([[False], actual[1:] < actual[:-1]]), expected
+        return ~(np.abs(actual - expected) <= self.tolerance), expected
+
+
+def row_label(data, row):
+    """'row 12 (Year=2021)': a row's position and its key columns"""
+    keys = []
+    for column in KEY_COLUMNS:
+        if column in data:
+            value = data[column].iat[row]
+            keys.append(f"{column}={value:%Y-%m-%d}" if hasattr(value, 'strftime') else f"{column}={value}")
+    return f"row {row} ({', '.join(keys)})" if keys else f"row {row}"
+
+
+def check(data, rules):
+    """Every Violation of rules in a table; an empty list means the table is valid"""
+    violations = []
+    for template in rules:
+        for rule in template.bind(data.columns):
+            missing = [column for column in (rule.column, *rule.inputs) if column not in data]
+            if missing:
+                violations.append(Violation(rule, np.array([], dtype='int64'), [f"missing column(s) {missing}"]))
+                continue
+
+            failed, expected = rule.failures(data)
+            rows = np.flatnonzero(failed)
+            if not len(rows):
+                continue
+            actual = data[rule.column].to_numpy()
+            examples = []
+            for row in rows[:MAX_REPORTED]:
+                found = f"{rule.column}={actual[row]:g}"
+                if expected is not None:
+                    found += f", expected {expected[row]:g}"
+                examples.append(f"{row_label(data, row)}: {found}")
+            violations.append(Violation(rule, rows, examples))
+    return violations
+
+
+def validate(name, data, rules):
+    """Raise ValidationError if a table breaks any of its rules; returns the table otherwise"""
+    violations = check(data, rules)
+    if violations:
+        raise ValidationError(name, violations)
+    return data
+
+
+PATENT_RULES = [
+    Rule('sorted', 'Year'),
+    Rule('non_negative', 'Quantum_Computing'),
+    Rule('non_negative', 'Quantum_Communications'),
+    Rule('non_negative', 'Quantum_Sensing'),
+    Rule('sum', 'Total_Patents', ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']),
+]
+
+GOVERNMENT_RULES = [
+    Rule('sorted', 'Year'),
+    Rule('non_negative', '{country}_Government_Millions'),
+    Rule('running_sum', '{country}_Cumulative_Millions', '{country}_Government_Millions'),
+]
+
+# Share columns are published rounded to 0.1 percentage points
+PRIVATE_RULES = [
+    Rule('sorted', 'Year'),
+    Rule('non_negative', '{country}_Private_Millions'),
+    Rule('ratio', '{country}_Share_Percent', ['{country}_Private_Millions', 'Global_Private_Total'],
+         tolerance=0.1, scale=100),
+]
+
+
+def main(argv=None):
+    """Validate every registered dataset and print the rules checked and the time taken"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--no-cache', action='store_true', help='parse the CSVs rather than the columnar cache')
+    args = parser.parse_args(argv)
+
+    from data_access import DATASETS, country_patent_datasets, load_dataset
+
+    country_patent_datasets()
+    failed = 0
+    for name, spec in DATASETS.items():
+        data = load_dataset(name, use_cache=not args.no_cache, validated=False)
+        start = time.perf_counter()
+        violations = check(data, spec['rules'])
+        elapsed = time.perf_counter() - start
+        rules = sum(len(rule.bind(data.columns)) for rule in spec['rules'])
+        status = 'ok' if not violations else f"{len(violations)} failed"
+        print(f"  {name:<20} {len(data):>10,} rows {rules:>3} rules {elapsed * 1000:8.2f}ms  {status}")
+        for violation in violations:
+            print(f"    {violation}")
+        failed += bool(violations)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
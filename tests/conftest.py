@@ -0,0 +1,9 @@
+"""
+Test Setup
+Makes the analysis modules importable the way the scripts import each other
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "analysis"))
@@ -0,0 +1,28 @@
+"""
+Instrumentation Tests
+Stage records stay bounded and can be handed between processes
+"""
+
+import instrumentation
+from instrumentation import Recorder, stage
+
+
+def test_recorder_keeps_only_the_newest_records():
+    recorder = Recorder()
+    for i in range(instrumentation.MAX_RECORDS + 5):
+        recorder.add({'stage': f's{i}'})
+
+    assert len(recorder.records) == instrumentation.MAX_RECORDS
+    assert recorder.records[0]['stage'] == 's5'
+
+
+def test_drained_records_merge_into_another_recorder():
+    instrumentation.drain()
+    with stage('worker_step', 'metrics'):
+        pass
+    handed_back = instrumentation.drain()
+
+    assert instrumentation.records() == []
+    instrumentation.merge(handed_back)
+    assert [record['stage'] for record in instrumentation.records()] == ['worker_step']
+    instrumentation.drain()
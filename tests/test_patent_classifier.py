@@ -0,0 +1,80 @@
+"""
+Patent Classifier Tests
+CPC prefix matching, the keyword fallback and first-category-wins on small frames
+"""
+
+import numpy as np
+import pandas as pd
+
+from patent_classifier import CPCTrie, KeywordMatcher, classify, cpc_matrix
+
+
+def records(cpc, abstracts=None, index=None):
+    data = {'CPC': cpc}
+    if abstracts is not None:
+        data['Abstract'] = abstracts
+    return pd.DataFrame(data, index=index)
+
+
+def test_trie_matches_the_longest_prefix():
+    trie = CPCTrie([{'cpc': ['G06N']}, {'cpc': ['G06N10']}])
+
+    assert trie.lookup('G06N10/00') == 1
+    assert trie.lookup('G06N3/08') == 0
+    assert trie.lookup('G06F') == -1
+    assert trie.lookup('') == -1
+
+
+def test_cpc_matrix_normalizes_and_splits_codes():
+    hits = cpc_matrix(pd.Series(['g06n 10/40', 'A01B1/00;G01R33/035', None, 'H04L9/06']))
+
+    assert hits.tolist() == [
+        [True, False, False],
+        [False, False, True],
+        [False, False, False],
+        [False, False, False],
+    ]
+
+
+def test_cpc_hit_without_abstract():
+    assert classify(records(['G06N10/00', 'H04L9/0852', 'G01R33/12'])).tolist() == [
+        'Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']
+
+
+def test_ambiguous_cpc_needs_quantum_in_the_abstract():
+    labels = classify(records(['H04L9/0852', 'H04L9/0852', 'H04L9/0852', 'G01R33/44'],
+                              ['Classical Diffie-Hellman key exchange', 'Entangled photon QUANTUM link', '',
+                               'Magnetic resonance imaging coil']))
+
+    assert labels.tolist() == [None, 'Quantum_Communications', 'Quantum_Communications', None]
+
+
+def test_keyword_fallback_without_cpc_hit():
+    labels = classify(records(['', 'A61B5/00', None],
+                              ['A Quantum Key Distribution network', 'A wearable quantum sensor', None]))
+
+    assert labels.tolist() == ['Quantum_Communications', 'Quantum_Sensing', None]
+
+
+def test_first_category_wins():
+    # CPC says communications and the abstract says computing; computing comes first
+    labels = classify(records(['H04L9/0852', 'G01R33/035;G06N10/00'],
+                              ['Quantum link between qubit registers', 'quantum magnetometer']))
+
+    assert labels.tolist() == ['Quantum_Computing', 'Quantum_Computing']
+
+
+def test_labels_keep_the_input_index():
+    labels = classify(records(['G06N10/00', ''], index=[10, 3]))
+
+    assert labels.index.tolist() == [10, 3]
+    assert labels.tolist() == ['Quantum_Computing', None]
+
+
+def test_keyword_matcher_maps_repeated_abstracts_back():
+    text = pd.Series(['Qubit readout', None, 'qubit readout', 'Qubit readout', 'quantum cryptography'])
+    hits = KeywordMatcher().match(text)
+
+    assert hits.shape == (5, 3)
+    np.testing.assert_array_equal(hits[:, 0], [True, False, True, True, False])
+    assert hits[4].tolist() == [False, True, False]
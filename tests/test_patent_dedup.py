@@ -0,0 +1,102 @@
+"""
+Patent Dedup Tests
+Family-ID collapse, near-duplicate collapse and cross-source family counting on small frames
+"""
+
+import pandas as pd
+
+from patent_dedup import deduplicate
+
+ABSTRACT = ("A superconducting quantum processor couples transmon qubits through tunable resonators so that "
+            "two-qubit gates run with low crosstalk, while a cryogenic control chip multiplexes the microwave "
+            "drive lines and reads out every qubit in parallel with a shared amplifier chain")
+
+
+def chunk(rows):
+    """Records of (year, category, family ID, abstract)"""
+    frame = pd.DataFrame(rows, columns=['Year', 'Label', 'Family_ID', 'Abstract'])
+    frame['Title'] = ''
+    return frame
+
+
+def by_label(records):
+    return records['Label']
+
+
+def counts_by_year(table):
+    """{(year, category): count} of the non-zero cells of a counts table"""
+    cells = table.stack()
+    return {key: int(value) for key, value in cells[cells > 0].items()}
+
+
+def test_family_members_count_once_at_the_earliest_filing(tmp_path):
+    records = chunk([
+        (2021, 'Quantum_Computing', 'F1', ''),
+        (2020, 'Quantum_Sensing', 'F1', ''),
+        (2022, 'Quantum_Computing', ' F1 ', ''),
+        (2022, 'Quantum_Computing', 'F2', ''),
+    ])
+    counts, stats = deduplicate({'us': [records]}, by_label, workdir=tmp_path)
+
+    assert counts_by_year(counts['us']) == {(2020, 'Quantum_Sensing'): 1, (2022, 'Quantum_Computing'): 1}
+    assert stats['family_duplicates'] == 2
+    assert stats['unique'] == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_near_duplicate_texts_collapse(tmp_path):
+    records = chunk([
+        (2021, 'Quantum_Computing', None, ABSTRACT),
+        (2020, 'Quantum_Computing', '', ABSTRACT + ' chain'),
+        (2021, 'Quantum_Communications', None, 'Entanglement swapping relays photons between distant nodes'),
+        (2021, 'Quantum_Sensing', None, ''),
+        (2021, 'Quantum_Sensing', None, ''),
+    ])
+    counts, stats = deduplicate({'us': [records]}, by_label, workdir=tmp_path)
+
+    # Records without any text are never near-duplicates of each other
+    assert counts_by_year(counts['us']) == {(2020, 'Quantum_Computing'): 1, (2021, 'Quantum_Communications'): 1,
+                                            (2021, 'Quantum_Sensing'): 2}
+    assert stats['near_duplicates'] == 1
+
+
+def test_unmatched_records_are_dropped_before_dedup(tmp_path):
+    records = chunk([
+        (2021, 'Quantum_Computing', 'F1', ''),
+        (2021, None, 'F2', ''),
+    ])
+    counts, stats = deduplicate({'us': [records]}, by_label, workdir=tmp_path)
+
+    assert stats['read'] == 2
+    assert stats['records'] == 1
+    assert counts_by_year(counts['us']) == {(2021, 'Quantum_Computing'): 1}
+
+
+def test_families_are_counted_in_every_source(tmp_path):
+    us = chunk([
+        (2020, 'Quantum_Computing', 'F1', ''),
+        (2021, 'Quantum_Computing', 'F1', ''),
+        (2021, 'Quantum_Sensing', 'F2', ''),
+        (2021, 'Quantum_Computing', None, ABSTRACT),
+    ])
+    china = chunk([
+        (2022, 'Quantum_Computing', 'F1', ''),
+        (2022, 'Quantum_Communications', 'F3', ''),
+        (2021, 'Quantum_Computing', None, ABSTRACT),
+    ])
+    counts, stats = deduplicate({'us': [us], 'china': [china]}, by_label, workdir=tmp_path)
+
+    # F1 and the shared text count once in each source; F1 is the one family in both
+    assert counts_by_year(counts['us']) == {(2020, 'Quantum_Computing'): 1, (2021, 'Quantum_Computing'): 1,
+                                            (2021, 'Quantum_Sensing'): 1}
+    assert counts_by_year(counts['china']) == {(2021, 'Quantum_Computing'): 1, (2022, 'Quantum_Computing'): 1,
+                                               (2022, 'Quantum_Communications'): 1}
+    assert stats['cross_source_families'] == 1
+    assert stats['families'] == 4
+
+
+def test_sources_without_quantum_records_get_empty_counts(tmp_path):
+    counts, _ = deduplicate({'us': [chunk([(2021, None, 'F1', '')])]}, by_label, workdir=tmp_path)
+
+    assert counts['us'].empty
+    assert list(counts['us'].columns) == ['Quantum_Computing', 'Quantum_Communications', 'Quantum_Sensing']
@@ -0,0 +1,93 @@
+"""
+Process Executor Tests
+Runs the in-process suite on a process pool end to end, in a scratch copy of the tree
+"""
+
+import json
+import multiprocessing
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# spawn is the default on macOS and Windows and forkserver on Linux from Python 3.14;
+# workers started either way can only import what the parent names by file
+START_METHODS = [method for method in ('fork', 'spawn', 'forkserver')
+                 if method in multiprocessing.get_all_start_methods()]
+
+
+def scratch_tree(tmp_path):
+    """Copy of the analysis scripts and data, so charts and caches are written outside the repo"""
+    analysis = tmp_path / "analysis"
+    analysis.mkdir()
+    for script in (ROOT / "analysis").glob("*.py"):
+        shutil.copy(script, analysis)
+    (analysis / "visualizations").mkdir()
+    shutil.copytree(ROOT / "data", tmp_path / "data", ignore=shutil.ignore_patterns('.cache'))
+    return analysis
+
+
+@pytest.mark.parametrize('start_method', START_METHODS)
+def test_process_executor_runs_suite(tmp_path, start_method):
+    analysis = scratch_tree(tmp_path)
+    result = subprocess.run(
+        [sys.executable, str(analysis / "run_analysis.py"), '--in-process', '--workers', '3',
+         '--executor', 'process', '--start-method', start_method, '--report', str(tmp_path / "run_report.json")],
+        capture_output=True, text=True, timeout=600)
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Error in in-process run" not in result.stdout
+    assert "leaked shared_memory" not in result.stderr
+    assert "Traceback" not in result.stderr
+    assert (analysis / "visualizations" / "investment_strategy_comparison.png").exists()
+    # Stages run inside the workers are handed back to the run report
+    stages = json.loads((tmp_path / "run_report.json").read_text())['stages']
+    assert {'metrics', 'figure', 'savefig'} <= {record['kind'] for record in stages}
+
+
+@pytest.mark.parametrize('start_method', START_METHODS)
+def test_workers_started_before_publish_keep_segments(tmp_path, start_method):
+    # Workers that start before the store publishes may run a resource tracker of their
+    # own; attaching must not hand it the parent's segments to unlink when they exit
+    script = tmp_path / "started_first.py"
+    script.write_text(f"""
+import sys
+sys.path.insert(0, {str(ROOT / 'analysis')!r})
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+import numpy as np
+from shared_data import SharedStore, attach
+
+def total(handle):
+    return float(attach(handle).sum())
+
+def tracker_calls(handle):
+    calls = []
+    resource_tracker.register = lambda name, rtype: calls.append('register')
+    resource_tracker.unregister = lambda name, rtype: calls.append('unregister')
+    attach(handle)
+    return calls
+
+if __name__ == '__main__':
+    context = multiprocessing.get_context(sys.argv[1])
+    with SharedStore() as store:
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            pool.submit(int).result()
+            handle = store.publish(np.arange(10.0))
+            print(list(pool.map(total, [handle] * 4)))
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            print(list(pool.map(total, [handle] * 2)))
+            print(pool.submit(tracker_calls, store.publish(np.ones(3))).result())
+""")
+    result = subprocess.run([sys.executable, str(script), start_method], capture_output=True, text=True,
+                            timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split('\n')[:3] == ["[45.0, 45.0, 45.0, 45.0]", "[45.0, 45.0]", "[]"]
+    assert "leaked shared_memory" not in result.stderr
+    assert "Traceback" not in result.stderr
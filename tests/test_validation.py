@@ -0,0 +1,101 @@
+"""
+Validation Tests
+Each rule kind passes a valid frame and raises ValidationError on a deliberately broken one
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation import Rule, ValidationError, validate
+
+
+def frame():
+    """A small government-style table that satisfies every rule below"""
+    return pd.DataFrame({
+        'Year': [2020, 2021, 2022, 2023],
+        'A': [1.0, 2.0, 3.0, 4.0],
+        'B': [10.0, 20.0, 30.0, 40.0],
+        'Total': [11.0, 22.0, 33.0, 44.0],
+        'Running': [1.0, 3.0, 6.0, 10.0],
+        'Share': [10.0, 10.0, 10.0, 10.0],
+    })
+
+
+RULES = {
+    'sum': Rule('sum', 'Total', ['A', 'B']),
+    'running_sum': Rule('running_sum', 'Running', 'A'),
+    'ratio': Rule('ratio', 'Share', ['A', 'B'], tolerance=0.1, scale=100),
+    'non_negative': Rule('non_negative', 'A'),
+    'sorted': Rule('sorted', 'Year'),
+}
+
+# (column, row, broken value) per rule kind
+BREAKS = {
+    'sum': ('Total', 1, 23.0),
+    'running_sum': ('Running', 2, 7.0),
+    'ratio': ('Share', 3, 10.5),
+    'non_negative': ('A', 0, -1.0),
+    'sorted': ('Year', 2, 2020),
+}
+
+
+@pytest.mark.parametrize('kind', list(RULES))
+def test_valid_frame_passes(kind):
+    data = frame()
+    assert validate('table', data, [RULES[kind]]) is data
+
+
+@pytest.mark.parametrize('kind', list(RULES))
+def test_broken_frame_raises(kind):
+    data = frame()
+    column, row, value = BREAKS[kind]
+    data.loc[row, column] = value
+
+    with pytest.raises(ValidationError) as error:
+        validate('table', data, [RULES[kind]])
+
+    (violation,) = error.value.violations
+    assert violation.rule is RULES[kind]
+    assert violation.rows.tolist() == [row]
+    assert f"Year={data['Year'].iat[row]}" in str(error.value)
+
+
+def test_ratio_within_tolerance_passes():
+    data = frame()
+    data['Share'] = [10.05, 9.95, 10.1, 9.9]
+    validate('table', data, [RULES['ratio']])
+
+
+def test_non_negative_rejects_missing_values():
+    data = frame()
+    data.loc[1, 'A'] = np.nan
+
+    with pytest.raises(ValidationError):
+        validate('table', data, [RULES['non_negative']])
+
+
+def test_country_template_binds_every_country():
+    data = pd.DataFrame({'US_Gov': [1, 2], 'US_Cum': [1, 3], 'China_Gov': [5, 5], 'China_Cum': [5, 11]})
+
+    with pytest.raises(ValidationError) as error:
+        validate('government', data, [Rule('running_sum', '{country}_Cum', '{country}_Gov')])
+
+    (violation,) = error.value.violations
+    assert violation.rule.column == 'China_Cum'
+
+
+def test_missing_column_is_a_violation():
+    with pytest.raises(ValidationError, match='missing column'):
+        validate('table', frame(), [Rule('sum', 'Total', ['A', 'C'])])
+
+
+def test_every_failure_is_reported():
+    data = frame()
+    data.loc[0, 'Total'] = 0.0
+    data.loc[3, 'Year'] = 2000
+
+    with pytest.raises(ValidationError) as error:
+        validate('table', data, list(RULES.values()))
+
+    assert [violation.rule.kind for violation in error.value.violations] == ['sum', 'sorted']